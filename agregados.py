@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Agregados de desempenho mantidos incrementalmente para o dashboard.
+
+``finalizar_simulado`` grava o resultado bruto (``resultados`` e
+``desempenho_materia``) e, na mesma transação, soma os números nas tabelas
+de resumo abaixo. O dashboard lê só esses poucos registros pré-calculados.
+
+Para reconstruir os agregados a partir das tabelas brutas:
+
+    python agregados.py            (usa DATABASE_PATH ou database.db)
+"""
+import os
+import sqlite3
+from collections import defaultdict
+
+
+def criar_tabelas(conn):
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS estatisticas_gerais (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_simulados INTEGER NOT NULL DEFAULT 0,
+        soma_percentual REAL NOT NULL DEFAULT 0,
+        total_acertos INTEGER NOT NULL DEFAULT 0,
+        total_questoes INTEGER NOT NULL DEFAULT 0,
+        melhor_percentual REAL,
+        melhor_data TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS desempenho_agregado (
+        area TEXT NOT NULL,
+        disciplina TEXT NOT NULL,
+        materia TEXT NOT NULL,
+        banca TEXT NOT NULL,
+        dificuldade TEXT NOT NULL,
+        acertos INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (area, disciplina, materia, banca, dificuldade)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS desempenho_area (
+        area TEXT PRIMARY KEY,
+        acertos INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_resultados_data ON resultados (data);
+    """)
+
+
+def preparar(conn, area_da_disciplina):
+    """Cria as tabelas e faz o backfill na primeira execução."""
+    criar_tabelas(conn)
+    if conn.execute("SELECT 1 FROM estatisticas_gerais WHERE id = 1").fetchone() is None:
+        reconstruir(conn, area_da_disciplina)
+
+
+def _chave(area, disciplina, materia, banca, dificuldade):
+    return (area or '', disciplina or '', materia or '', banca or '', dificuldade or '')
+
+
+def registrar_resultado(cursor, resultado_id, total_questoes, total_acertos, percentual, desempenho):
+    """Soma um simulado finalizado aos agregados (sem commit).
+
+    ``desempenho``: dict {(area, disciplina, materia, banca, dificuldade):
+    [acertos, total]}.
+    """
+    registrar_lote(cursor, [(resultado_id, total_questoes, total_acertos, percentual, desempenho)])
+
+
+def registrar_lote(cursor, resultados):
+    """Soma vários simulados de uma vez: um UPDATE e dois executemany.
+
+    ``resultados``: lista de (resultado_id, total_questoes, total_acertos,
+    percentual, desempenho), como em ``registrar_resultado``.
+    """
+    if not resultados:
+        return
+    soma_percentual = sum(r[3] for r in resultados)
+    soma_acertos = sum(r[2] for r in resultados)
+    soma_questoes = sum(r[1] for r in resultados)
+    melhor_id, _, _, melhor_percentual, _ = max(resultados, key=lambda r: r[3])
+
+    cursor.execute("INSERT OR IGNORE INTO estatisticas_gerais (id) VALUES (1)")
+    cursor.execute("""
+        UPDATE estatisticas_gerais SET
+            total_simulados = total_simulados + ?,
+            soma_percentual = soma_percentual + ?,
+            total_acertos = total_acertos + ?,
+            total_questoes = total_questoes + ?,
+            melhor_data = CASE WHEN melhor_percentual IS NULL OR ? > melhor_percentual
+                               THEN (SELECT data FROM resultados WHERE id = ?) ELSE melhor_data END,
+            melhor_percentual = CASE WHEN melhor_percentual IS NULL OR ? > melhor_percentual
+                                     THEN ? ELSE melhor_percentual END
+        WHERE id = 1
+    """, (len(resultados), soma_percentual, soma_acertos, soma_questoes,
+          melhor_percentual, melhor_id, melhor_percentual, melhor_percentual))
+
+    desempenho = defaultdict(lambda: [0, 0])
+    for *_, desempenho_simulado in resultados:
+        for chave, (acertos, total) in desempenho_simulado.items():
+            chave = _chave(*chave)
+            desempenho[chave][0] += acertos
+            desempenho[chave][1] += total
+
+    cursor.executemany("""
+        INSERT INTO desempenho_agregado (area, disciplina, materia, banca, dificuldade, acertos, total)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (area, disciplina, materia, banca, dificuldade) DO UPDATE SET
+            acertos = acertos + excluded.acertos,
+            total = total + excluded.total
+    """, [chave + (acertos, total) for chave, (acertos, total) in desempenho.items()])
+
+    por_area = defaultdict(lambda: [0, 0])
+    for (area, *_), (acertos, total) in desempenho.items():
+        por_area[area][0] += acertos
+        por_area[area][1] += total
+    cursor.executemany("""
+        INSERT INTO desempenho_area (area, acertos, total) VALUES (?, ?, ?)
+        ON CONFLICT (area) DO UPDATE SET
+            acertos = acertos + excluded.acertos,
+            total = total + excluded.total
+    """, [(area, acertos, total) for area, (acertos, total) in por_area.items()])
+
+
+def reconstruir(conn, area_da_disciplina):
+    """Recalcula todos os agregados a partir de resultados/desempenho_materia.
+
+    ``desempenho_materia`` guarda apenas a matéria; a disciplina vem da
+    tabela ``questoes`` e banca/dificuldade ficam vazias para esse histórico.
+    """
+    with conn:
+        conn.execute("DELETE FROM estatisticas_gerais")
+        conn.execute("DELETE FROM desempenho_agregado")
+        conn.execute("DELETE FROM desempenho_area")
+
+        conn.execute("""
+            INSERT INTO estatisticas_gerais (id, total_simulados, soma_percentual, total_acertos, total_questoes)
+            SELECT 1, COUNT(*), COALESCE(SUM(percentual), 0), COALESCE(SUM(total_acertos), 0),
+                   COALESCE(SUM(total_questoes), 0)
+            FROM resultados
+        """)
+        melhor = conn.execute("SELECT data, percentual FROM resultados ORDER BY percentual DESC LIMIT 1").fetchone()
+        if melhor is not None:
+            conn.execute("UPDATE estatisticas_gerais SET melhor_data = ?, melhor_percentual = ? WHERE id = 1",
+                         (melhor[0], melhor[1]))
+
+        disciplina_da_materia = dict(conn.execute(
+            "SELECT materia, MIN(disciplina) FROM questoes GROUP BY materia"
+        ).fetchall())
+        desempenho = defaultdict(lambda: [0, 0])
+        for materia, acertos, total in conn.execute(
+            "SELECT materia, SUM(acertos), SUM(total) FROM desempenho_materia GROUP BY materia"
+        ):
+            # Histórico antigo às vezes gravou o nome da disciplina como matéria
+            disciplina = disciplina_da_materia.get(materia, materia)
+            area = area_da_disciplina.get(disciplina, '')
+            chave = (area, disciplina, materia, '', '')
+            desempenho[chave][0] += acertos
+            desempenho[chave][1] += total
+
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO desempenho_agregado (area, disciplina, materia, banca, dificuldade, acertos, total)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [chave + tuple(valores) for chave, valores in desempenho.items()])
+        cursor.execute("""
+            INSERT INTO desempenho_area (area, acertos, total)
+            SELECT area, SUM(acertos), SUM(total) FROM desempenho_agregado GROUP BY area
+        """)
+
+
+def ler_estatisticas(conn):
+    gerais = conn.execute("""
+        SELECT total_simulados, soma_percentual, total_acertos, total_questoes, melhor_percentual, melhor_data
+        FROM estatisticas_gerais WHERE id = 1
+    """).fetchone()
+    por_area = {area: (acertos, total) for area, acertos, total in
+                conn.execute("SELECT area, acertos, total FROM desempenho_area")}
+    return gerais, por_area
+
+
+if __name__ == '__main__':
+    from taxonomia import carregar_taxonomia
+
+    caminho = os.environ.get('DATABASE_PATH', 'database.db')
+    conn = sqlite3.connect(caminho)
+    criar_tabelas(conn)
+    reconstruir(conn, carregar_taxonomia(conn).area_da_disciplina)
+    total = conn.execute("SELECT total_simulados FROM estatisticas_gerais").fetchone()[0]
+    print(f"Agregados reconstruídos a partir de {total} simulados.")
+    conn.close()
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""Sorteio de questões sem ``ORDER BY RANDOM()``.
+
+Os ids ficam pré-agrupados em baldes por (disciplina, banca). Um filtro do
+simulado é a união de alguns baldes; sorteamos k posições distintas dessa
+união (uniformes, sem reposição) e só então buscamos as k questões.
+
+Para não guardar a lista sorteada na sessão, ``SequenciaSorteada`` usa uma
+permutação pseudoaleatória (rede de Feistel com cycle-walking) derivada de
+uma semente: a i-ésima questão do simulado é recalculada em O(1) a partir de
+(filtro, semente), e o caminho inverso (id -> posição) também.
+"""
+import bisect
+import hashlib
+import random
+from array import array
+
+MASCARA_64 = (1 << 64) - 1
+RODADAS_FEISTEL = 6
+MAXIMO_SELECOES_EM_CACHE = 256
+
+
+class IndiceAmostragem:
+    """Arrays de ids por (disciplina, banca), em ordem crescente de id."""
+
+    def __init__(self, baldes):
+        self.baldes = baldes
+        self._ordenados = sorted(baldes.items(), key=_chave_ordenacao)
+        self._selecoes = {}
+        # Muda só quando a distribuição de ids entre baldes muda; edições de
+        # texto nas questões não invalidam simulados em andamento.
+        assinatura = hashlib.blake2b(digest_size=8)
+        for chave, balde in self._ordenados:
+            assinatura.update(repr(chave).encode('utf-8'))
+            assinatura.update(balde.tobytes())
+        self.versao = assinatura.hexdigest()
+
+    @classmethod
+    def de_linhas(cls, linhas):
+        # linhas: iterável de (id, disciplina, banca)
+        baldes = {}
+        for questao_id, disciplina, banca in linhas:
+            chave = (disciplina, banca)
+            balde = baldes.get(chave)
+            if balde is None:
+                balde = baldes[chave] = array('q')
+            balde.append(questao_id)
+        for balde in baldes.values():
+            if any(balde[i] > balde[i + 1] for i in range(len(balde) - 1)):
+                balde[:] = array('q', sorted(balde))
+        return cls(baldes)
+
+    def selecionar(self, disciplinas, banca=None):
+        chave_cache = (frozenset(disciplinas), banca)
+        uniao = self._selecoes.get(chave_cache)
+        if uniao is None:
+            uniao = UniaoBaldes([
+                (chave, balde) for chave, balde in self._ordenados
+                if chave[0] in chave_cache[0] and (banca is None or chave[1] == banca)
+            ])
+            if len(self._selecoes) >= MAXIMO_SELECOES_EM_CACHE:
+                self._selecoes.clear()
+            self._selecoes[chave_cache] = uniao
+        return uniao
+
+
+def uniao_de_ids(ids, chave_de):
+    """União de baldes com exatamente ``ids`` (ex.: o resultado de uma busca).
+
+    ``chave_de(id)`` dá o (disciplina, banca) da questão, como em
+    ``Gabarito.chave``; ids sem chave são ignorados.
+    """
+    baldes = {}
+    for questao_id in sorted(set(ids)):
+        chave = chave_de(questao_id)
+        if chave is not None:
+            baldes.setdefault(chave, array('q')).append(questao_id)
+    return UniaoBaldes(sorted(baldes.items(), key=_chave_ordenacao))
+
+
+def _chave_ordenacao(item):
+    # Ordem canônica dos baldes (None não é comparável com str)
+    (disciplina, banca), _ = item
+    return (disciplina or '', banca or '')
+
+
+class UniaoBaldes:
+    """Visão concatenada de vários baldes, endereçável por posição global."""
+
+    def __init__(self, baldes):
+        # baldes: lista de ((disciplina, banca), array de ids)
+        baldes = [(chave, balde) for chave, balde in baldes if len(balde)]
+        self.chaves = {chave: k for k, (chave, _) in enumerate(baldes)}
+        self.baldes = [balde for _, balde in baldes]
+        self.limites = []
+        total = 0
+        for balde in self.baldes:
+            total += len(balde)
+            self.limites.append(total)
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, posicao):
+        if not 0 <= posicao < self.total:
+            raise IndexError(posicao)
+        k = bisect.bisect_right(self.limites, posicao)
+        inicio = self.limites[k - 1] if k else 0
+        return self.baldes[k][posicao - inicio]
+
+    def posicao_de(self, questao_id, chave):
+        # chave: (disciplina, banca) da questão, que diz em qual balde procurar
+        k = self.chaves.get(chave)
+        if k is None:
+            return None
+        balde = self.baldes[k]
+        j = bisect.bisect_left(balde, questao_id)
+        if j == len(balde) or balde[j] != questao_id:
+            return None
+        return (self.limites[k - 1] if k else 0) + j
+
+    def amostrar(self, k, rng=random):
+        k = min(k, self.total)
+        # random.sample sobre um range não materializa a população
+        return [self[posicao] for posicao in rng.sample(range(self.total), k)]
+
+
+def _misturar(x):
+    # Finalizador do splitmix64: espalha bem os bits de x
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASCARA_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASCARA_64
+    return x ^ (x >> 31)
+
+
+class PermutacaoEmbaralhada:
+    """Permutação pseudoaleatória de range(n) definida por uma semente."""
+
+    def __init__(self, n, semente):
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        self.meio = (bits + 1) // 2
+        self.mascara = (1 << self.meio) - 1
+        self.chaves = [_misturar((semente + (r + 1) * 0x9E3779B97F4A7C15) & MASCARA_64)
+                       for r in range(RODADAS_FEISTEL)]
+
+    def _cifrar(self, x):
+        esquerda, direita = x >> self.meio, x & self.mascara
+        for chave in self.chaves:
+            esquerda, direita = direita, esquerda ^ (_misturar(direita ^ chave) & self.mascara)
+        return (esquerda << self.meio) | direita
+
+    def _decifrar(self, y):
+        esquerda, direita = y >> self.meio, y & self.mascara
+        for chave in reversed(self.chaves):
+            esquerda, direita = direita ^ (_misturar(esquerda ^ chave) & self.mascara), esquerda
+        return (esquerda << self.meio) | direita
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        # Cycle-walking: o domínio da rede é potência de 4 >= n; saídas fora de
+        # range(n) são cifradas de novo até cair dentro (média < 4 passos).
+        x = self._cifrar(i)
+        while x >= self.n:
+            x = self._cifrar(x)
+        return x
+
+    def indice_de(self, valor):
+        y = self._decifrar(valor)
+        while y >= self.n:
+            y = self._decifrar(y)
+        return y
+
+
+class SequenciaSorteada:
+    """As ``total`` primeiras posições de uma permutação da união de baldes.
+
+    É uma amostra uniforme sem reposição quando ``total < len(uniao)`` e o
+    embaralhamento completo quando ``total == len(uniao)``.
+    """
+
+    def __init__(self, uniao, semente, total):
+        self.uniao = uniao
+        self.total = min(total, len(uniao))
+        self.permutacao = PermutacaoEmbaralhada(len(uniao), semente)
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, indice):
+        if not 0 <= indice < self.total:
+            raise IndexError(indice)
+        return self.uniao[self.permutacao[indice]]
+
+    def __iter__(self):
+        for indice in range(self.total):
+            yield self[indice]
+
+    def indice_de(self, questao_id, chave):
+        """Posição da questão no simulado, ou None se ela não faz parte dele."""
+        posicao = self.uniao.posicao_de(questao_id, chave)
+        if posicao is None:
+            return None
+        indice = self.permutacao.indice_de(posicao)
+        return indice if indice < self.total else None
@@ -1,33 +1,255 @@
 ﻿# -*- coding: utf-8 -*-
 import sqlite3
+import hmac
 import json
-import random
 import os
-from flask import Flask, render_template, jsonify, request, session
-from collections import defaultdict
+import queue
+import time
+from flask import Flask, Response, render_template, jsonify, request, session, g, url_for
+from conexoes import GerenciadorConexoes
+from banco_questoes import FonteBancoQuestoes, criar_controle_versao, preparar_controle_conteudo
+from sessao_simulado import TTL_PADRAO, EstadoSimulado, Varredor, criar_armazem, novo_sid
+from amostragem import SequenciaSorteada, uniao_de_ids
+import agregados
+import busca
+import cache_correcoes
+import clientes_llm
+import correcao
+import fila_resultados
+import gateway_llm
+import jobs_redacao
+import pre_corretor
+import questoes_publicadas
+import redacao
+import taxonomia
+from cache_http import CACHE_CONTROL_ESTATICO, CacheFragmentos, CacheRespostas, resposta_emendada
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'chave-secreta-concursoia-2024')
-DATABASE = 'database.db'
-
-MAPA_AREAS = {
-    "Língua Portuguesa": ["Língua Portuguesa"],
-    "Exatas e Raciocínio Lógico": ["Matemática", "Raciocínio Lógico", "Matemática Financeira"],
-    "Conhecimentos Jurídicos": ["Direito Administrativo", "Direito Constitucional"],
-    "Conhecimentos Bancários e Vendas": ["Conhecimentos Bancários", "Vendas e Negociação", "Atualidades do Mercado Financeiro"],
-    "Psicologia Clínica e Saúde": ["Psicologia", "Psicologia (Saúde)"],
-    "Gestão de Pessoas": ["Psicologia (Gestão)"],
-    "Informática": ["Informática"],
-    "Atualidades Gerais": ["Atualidades"]
-}
+DATABASE = os.environ.get('DATABASE_PATH', 'database.db')
+# Cópia somente leitura das questões, republicada a cada importação
+QUESTOES_DB = questoes_publicadas.caminho_publicado(DATABASE)
+
+# "Todas as questões que casam com o filtro". "295" é o valor que versões
+# antigas do frontend enviavam para o mesmo modo.
+QUANTIDADE_TODAS = ("todas", "295")
+
+# Máximo de questões devolvidas por /api/simulado/questoes (prefetch)
+MAXIMO_PREFETCH = 50
+
+# Máximo de questões de uma busca usadas para montar um simulado
+MAXIMO_SIMULADO_BUSCA = 500
+
+# Máximo de simulados aceitos por /api/simulado/finalizar-lote
+MAXIMO_LOTE_FINALIZACAO = 1000
+
+# Bytes de JSON de questões pré-codificadas mantidos por processo
+LIMITE_CACHE_QUESTOES = int(os.environ.get('CACHE_QUESTOES_BYTES', 32 * 1024 * 1024))
+
+TEMAS_REDACAO = [
+    {"id": 1, "titulo": "Os desafios da educação pública brasileira no século XXI"},
+    {"id": 2, "titulo": "Impactos da inteligência artificial no mercado de trabalho"},
+    {"id": 3, "titulo": "Crise hídrica e gestão sustentável dos recursos naturais"},
+    {"id": 4, "titulo": "Violência urbana e políticas de segurança pública"},
+    {"id": 5, "titulo": "Desafios do sistema de saúde pública no Brasil"},
+    {"id": 6, "titulo": "A importância da preservação da Amazônia para o equilíbrio climático"},
+    {"id": 7, "titulo": "Os efeitos das fake news na democracia brasileira"},
+    {"id": 8, "titulo": "Mobilidade urbana e qualidade de vida nas grandes cidades"},
+    {"id": 9, "titulo": "Desigualdade social e seus impactos no acesso à educação"},
+    {"id": 10, "titulo": "Tecnologia e privacidade: os limites da exposição digital"},
+    {"id": 11, "titulo": "Esporte como ferramenta de inclusão social"},
+    {"id": 12, "titulo": "Desafios da alimentação saudável na sociedade contemporânea"},
+    {"id": 13, "titulo": "Representatividade racial nos espaços de poder"},
+    {"id": 14, "titulo": "Sustentabilidade e consumo consciente"},
+    {"id": 15, "titulo": "Os impactos da pandemia COVID-19 na educação brasileira"},
+    {"id": 16, "titulo": "Envelhecimento populacional e previdência social"},
+    {"id": 17, "titulo": "Democratização do acesso à cultura no Brasil"},
+    {"id": 18, "titulo": "Desafios da inclusão de pessoas com deficiência no mercado de trabalho"},
+    {"id": 19, "titulo": "Violência doméstica durante o isolamento social"},
+    {"id": 20, "titulo": "Importância do investimento em ciência e tecnologia"},
+    {"id": 21, "titulo": "Crise habitacional e direito à moradia"},
+    {"id": 22, "titulo": "Preconceito linguístico na sociedade brasileira"},
+    {"id": 23, "titulo": "Desafios da produção agrícola sustentável"},
+    {"id": 24, "titulo": "Saúde mental no ambiente de trabalho"},
+    {"id": 25, "titulo": "Terceirização e direitos trabalhistas"},
+    {"id": 26, "titulo": "Desafios da educação à distância no Brasil"},
+    {"id": 27, "titulo": "Protagonismo juvenil na política nacional"},
+    {"id": 28, "titulo": "Impactos do agrotóxico na saúde e meio ambiente"},
+    {"id": 29, "titulo": "Democratização do acesso à internet no Brasil"},
+    {"id": 30, "titulo": "Desafios da gestão do lixo urbano"},
+    {"id": 31, "titulo": "Importância da vacinação para a saúde pública"},
+    {"id": 32, "titulo": "Bullying e suas consequências no ambiente escolar"},
+    {"id": 33, "titulo": "Desafios da mobilidade elétrica no Brasil"},
+    {"id": 34, "titulo": "Cultura do cancelamento nas redes sociais"},
+    {"id": 35, "titulo": "Desafios da educação sexual nas escolas"},
+    {"id": 36, "titulo": "Impactos do turismo no desenvolvimento regional"},
+    {"id": 37, "titulo": "Desafios da preservação do patrimônio histórico"},
+    {"id": 38, "titulo": "Trabalho escravo contemporâneo no Brasil"},
+    {"id": 39, "titulo": "Desafios do sistema prisional brasileiro"},
+    {"id": 40, "titulo": "Importância do aleitamento materno"},
+    {"id": 41, "titulo": "Desafios da erradicação do trabalho infantil"},
+    {"id": 42, "titulo": "Impactos das queimadas no bioma Pantanal"},
+    {"id": 43, "titulo": "Desafios da mobilidade para pessoas com deficiência"},
+    {"id": 44, "titulo": "Importância da doação de órgãos"},
+    {"id": 45, "titulo": "Desafios da produção cultural independente"},
+    {"id": 46, "titulo": "Impactos dos aplicativos de transporte na economia"},
+    {"id": 47, "titulo": "Desafios da proteção aos refugiados no Brasil"},
+    {"id": 48, "titulo": "Importância da educação financeira nas escolas"},
+    {"id": 49, "titulo": "Desafios do envelhecimento com dignidade"},
+    {"id": 50, "titulo": "Impactos do desmatamento na biodiversidade"},
+    {"id": 51, "titulo": "Desafios da segurança no trânsito brasileiro"},
+    {"id": 52, "titulo": "Importância do esporte para o desenvolvimento infantil"},
+    {"id": 53, "titulo": "Desafios da valorização dos profissionais da educação"},
+    {"id": 54, "titulo": "Impactos da mineração em terras indígenas"},
+    {"id": 55, "titulo": "Desafios do combate à evasão escolar"},
+    {"id": 56, "titulo": "Importância da preservação dos oceanos"},
+    {"id": 57, "titulo": "Desafios da agricultura familiar no Brasil"},
+    {"id": 58, "titulo": "Impactos da automação nos empregos tradicionais"},
+    {"id": 59, "titulo": "Desafios do acesso à justiça para populações vulneráveis"},
+    {"id": 60, "titulo": "Importância do voluntariado para a sociedade"},
+    {"id": 61, "titulo": "Desafios da produção de energia limpa no Brasil"},
+    {"id": 62, "titulo": "Impactos da globalização na cultura brasileira"},
+    {"id": 63, "titulo": "Desafios do ensino profissionalizante no Brasil"},
+    {"id": 64, "titulo": "Importância da amamentação para o desenvolvimento infantil"},
+    {"id": 65, "titulo": "Desafios da segurança alimentar nas periferias"},
+    {"id": 66, "titulo": "Impactos da poluição sonora nas grandes cidades"},
+    {"id": 67, "titulo": "Desafios da educação no campo"},
+    {"id": 68, "titulo": "Importância do brincar para o desenvolvimento infantil"},
+    {"id": 69, "titulo": "Desafios do combate à depressão na adolescência"},
+    {"id": 70, "titulo": "Impactos do plástico nos ecossistemas marinhos"},
+    {"id": 71, "titulo": "Desafios da inclusão digital da terceira idade"},
+    {"id": 72, "titulo": "Importância da educação ambiental nas escolas"},
+    {"id": 73, "titulo": "Desafios do transporte público nas metrópoles"},
+    {"id": 74, "titulo": "Impactos da inteligência artificial na educação"},
+    {"id": 75, "titulo": "Desafios da preservação das línguas indígenas"},
+    {"id": 76, "titulo": "Importância da atividade física para a saúde mental"},
+    {"id": 77, "titulo": "Desafios do saneamento básico no Brasil"},
+    {"id": 78, "titulo": "Impactos da indústria da moda no meio ambiente"},
+    {"id": 79, "titulo": "Desafios da educação para o trânsito"},
+    {"id": 80, "titulo": "Importância da preservação dos rios urbanos"},
+    {"id": 81, "titulo": "Desafios do combate à corrupção no Brasil"},
+    {"id": 82, "titulo": "Impactos dos games no desenvolvimento cognitivo"},
+    {"id": 83, "titulo": "Desafios da medicina preventiva no SUS"},
+    {"id": 84, "titulo": "Importância da leitura na formação crítica"},
+    {"id": 85, "titulo": "Desafios da mobilidade rural"},
+    {"id": 86, "titulo": "Impactos do home office na sociedade"},
+    {"id": 87, "titulo": "Desafios da preservação da fauna silvestre"},
+    {"id": 88, "titulo": "Importância do teatro na educação"},
+    {"id": 89, "titulo": "Desafios da reciclagem no Brasil"},
+    {"id": 90, "titulo": "Impactos da música na saúde mental"},
+    {"id": 91, "titulo": "Desafios do acesso à universidade pública"},
+    {"id": 92, "titulo": "Importância do cooperativismo para o desenvolvimento"},
+    {"id": 93, "titulo": "Desafios da segurança cibernética no Brasil"},
+    {"id": 94, "titulo": "Impactos do veganismo no meio ambiente"},
+    {"id": 95, "titulo": "Desafios da educação patrimonial"},
+    {"id": 96, "titulo": "Importância dos museus para a cultura nacional"},
+    {"id": 97, "titulo": "Desafios do combate ao assédio moral"},
+    {"id": 98, "titulo": "Impactos da moda sustentável"},
+    {"id": 99, "titulo": "Desafios da educação para relações étnico-raciais"},
+    {"id": 100, "titulo": "Importância da filosofia na formação cidadã"}
+]
+
+conexoes = GerenciadorConexoes(DATABASE)
+# QUESTOES_MMAP=0 desliga o questoes.bin mapeado em memória (banco_binario.py)
+banco_questoes = FonteBancoQuestoes(QUESTOES_DB, imutavel=True, binario=os.environ.get('QUESTOES_MMAP', '1') == '1')
+respostas_catalogo = CacheRespostas()
+fragmentos_questoes = CacheFragmentos(LIMITE_CACHE_QUESTOES)
+busca_questoes = busca.BuscaQuestoes(QUESTOES_DB)
+
+# Gravação write-behind dos resultados (RESULTADOS_WRITE_BEHIND=1): a rota de
+# finalização só anexa ao journal e uma thread grava em lotes
+escritora_resultados = None
+if os.environ.get('RESULTADOS_WRITE_BEHIND') == '1':
+    if fila_resultados.DISPONIVEL:
+        escritora_resultados = fila_resultados.FilaResultados(
+            conexoes, os.environ.get('RESULTADOS_JOURNAL_DIR', 'journal_resultados'))
+    else:
+        print("Aviso: RESULTADOS_WRITE_BEHIND requer fcntl; resultados serão gravados diretamente.")
 
 def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row 
-    return conn
+    # Conexão persistente da thread, emprestada durante o contexto da requisição
+    if 'db' not in g:
+        g.db = conexoes.obter()
+    return g.db
+
+@app.teardown_appcontext
+def liberar_db(exc):
+    conn = g.pop('db', None)
+    if conn is not None:
+        conexoes.liberar(conn)
+
+# Estado dos simulados fica no servidor; o cookie só carrega 'simulado_sid'
+armazem_sessoes = criar_armazem(os.environ.get('SIMULADO_SESSAO_BACKEND', 'sqlite'), conexoes,
+                                ttl=int(os.environ.get('SIMULADO_SESSAO_TTL', TTL_PADRAO)))
+varredor_sessoes = Varredor(armazem_sessoes)
+
+# Correções de redação rodam num pool de threads por processo; a rota só
+# registra o job (jobs_redacao.py). O cliente do modelo, atrás do gateway com
+# limite de concorrência, prazo e disjuntor (gateway_llm.py), é criado no primeiro job.
+# Correções já feitas vêm do cache (cache_correcoes.py) sem chamar o modelo.
+cache_redacao = cache_correcoes.CacheCorrecoes(
+    conexoes, int(os.environ.get('CACHE_CORRECOES_MEMORIA', cache_correcoes.LIMITE_MEMORIA)))
+correcoes_redacao = jobs_redacao.PoolCorrecoes(
+    conexoes, gateway_llm.criar_gateway,
+    trabalhadores=int(os.environ.get('REDACAO_TRABALHADORES', jobs_redacao.TRABALHADORES)),
+    capacidade=int(os.environ.get('REDACAO_CAPACIDADE', jobs_redacao.CAPACIDADE)),
+    cache=cache_redacao)
+varredor_correcoes = Varredor(correcoes_redacao)
+ESPERA_MAXIMA_CORRECAO = 25
+INTERVALO_KEEPALIVE_SSE = 15
+# Cada stream ocupa uma thread do worker (Procfile: -k gthread --threads 8)
+# e fica abaixo do timeout padrão do gunicorn (30s), para não derrubar um
+# worker síncrono; passado o prazo o cliente segue por polling em 'acompanhar'
+DURACAO_MAXIMA_SSE = float(os.environ.get('SSE_DURACAO_MAXIMA', 25))
+
+def carregar_simulado():
+    sid = session.get('simulado_sid')
+    if not sid:
+        return None
+    varredor_sessoes.garantir_ativo()
+    dados = armazem_sessoes.obter(sid)
+    return EstadoSimulado.de_bytes(dados) if dados else None
+
+def salvar_simulado(estado, novo=False):
+    sid = session.get('simulado_sid')
+    if novo or not sid:
+        if sid:
+            armazem_sessoes.remover(sid)
+        sid = session['simulado_sid'] = novo_sid()
+    armazem_sessoes.salvar(sid, estado.para_bytes())
+
+def sequencia_do_simulado(banco, estado):
+    # Regenera a ordem das questões a partir do filtro e da semente; se a
+    # distribuição de ids do banco mudou desde o início, a ordem não é mais
+    # reproduzível e o simulado precisa ser reiniciado.
+    if estado.versao != versao_do_filtro(banco, estado.filtro):
+        return None
+    return SequenciaSorteada(candidatos_do_filtro(banco, estado.filtro), estado.semente, estado.total)
+
+def versao_do_filtro(banco, filtro):
+    # O resultado de uma busca depende do texto das questões: qualquer
+    # mudança no banco o invalida, não só a distribuição de ids
+    return banco.versao if 'busca' in filtro else banco.amostragem.versao
+
+def candidatos_do_filtro(banco, filtro):
+    # Simulado montado de uma busca guarda a consulta já normalizada e refaz
+    # a busca (em cache por publicação); os demais, as disciplinas e a banca
+    if 'busca' in filtro:
+        busca_filtro = filtro['busca']
+        ids = busca_questoes.ids(busca_filtro['q'], busca_filtro['area'], busca_filtro['banca'],
+                                 maximo=MAXIMO_SIMULADO_BUSCA)
+        return uniao_de_ids(ids, banco.gabarito.chave)
+    return banco.amostragem.selecionar(filtro['disciplinas'], filtro['banca'])
+
+RESPOSTA_BANCO_ATUALIZADO = ({"success": False, "error": "O banco de questões foi atualizado. Inicie um novo simulado."}, 409)
+
+def encerrar_simulado():
+    sid = session.pop('simulado_sid', None)
+    if sid:
+        armazem_sessoes.remover(sid)
 
 def setup_db():
-    conn = get_db()
+    conn = conexoes.obter()
     cursor = conn.cursor()
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS questoes (
@@ -41,7 +263,11 @@ def setup_db():
         justificativa TEXT,
         dica TEXT,
         formula TEXT,
-        banca TEXT
+        banca TEXT,
+        hash_conteudo TEXT,
+        hash_linha TEXT,
+        ativo INTEGER NOT NULL DEFAULT 1,
+        area_id INTEGER REFERENCES areas (id)
     );
     """)
     
@@ -66,8 +292,28 @@ def setup_db():
     );
     """)
     
+    # Contagens por disciplina/banca resolvidas só pelo índice
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_questoes_disciplina_banca ON questoes (disciplina, banca)")
+    
     conn.commit()
-    conn.close()
+    criar_controle_versao(conn)
+    preparar_controle_conteudo(conn)
+    taxonomia.preparar(conn)
+    agregados.preparar(conn, taxonomia.carregar_taxonomia(conn).area_da_disciplina)
+    fila_resultados.preparar(conn)
+    armazem_sessoes.preparar()
+    correcoes_redacao.preparar()
+    cache_redacao.preparar()
+    questoes_publicadas.publicar_se_desatualizado(conn, QUESTOES_DB)
+
+@app.errorhandler(questoes_publicadas.BancoIndisponivel)
+def banco_indisponivel(e):
+    # questoes.db/questoes.bin ausente ou ilegível (ex.: antes da primeira
+    # publicação): JSON como nas demais falhas, para o cliente tentar de novo
+    print(f"Banco de questões indisponível: {e}")
+    resposta = jsonify({"success": False, "error": "Banco de questões indisponível. Tente novamente em instantes."})
+    resposta.headers['Retry-After'] = '5'
+    return resposta, 503
 
 @app.route('/')
 def index():
@@ -76,46 +322,73 @@ def index():
 @app.route('/api/areas')
 def get_areas():
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        areas_com_contagem = []
-        
-        for area_nome, disciplinas_lista in MAPA_AREAS.items():
-            if not disciplinas_lista:
-                continue
-                
-            placeholders = ','.join('?' * len(disciplinas_lista))
-            query = "SELECT COUNT(*) as total FROM questoes WHERE disciplina IN ({})".format(placeholders)
-            cursor.execute(query, disciplinas_lista)
-            row = cursor.fetchone()
-            total_questoes = row['total'] if row else 0
-            
-            if total_questoes > 0:
-                areas_com_contagem.append({
-                    "nome_area": area_nome,
-                    "disciplinas_incluidas": disciplinas_lista,
-                    "total_questoes": total_questoes
-                })
-                
-        conn.close()
-        areas_com_contagem.sort(key=lambda x: x['total_questoes'], reverse=True)
-        return jsonify({"success": True, "areas": areas_com_contagem})
-        
+        banco = banco_questoes.atual()
+        # Contagens do cubo do snapshot (mesmo arquivo publicado que serve as
+        # questões); calculado uma vez por snapshot, repetições recebem 304
+        return respostas_catalogo.responder(
+            'areas', banco, lambda: {"success": True, "areas": banco.catalogo.como_dict()['areas']})
+    except questoes_publicadas.BancoIndisponivel:
+        raise
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/bancas')
 def get_bancas():
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT banca, COUNT(*) as total_questoes FROM questoes WHERE banca IS NOT NULL AND banca != '' GROUP BY banca ORDER BY total_questoes DESC")
-        bancas_list = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return jsonify({"success": True, "bancas": bancas_list})
+        banco = banco_questoes.atual()
+        return respostas_catalogo.responder(
+            'bancas', banco, lambda: {"success": True, "bancas": banco.catalogo.como_dict()['bancas']})
+    except questoes_publicadas.BancoIndisponivel:
+        raise
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/catalogo')
+def get_catalogo():
+    # Áreas, bancas, dificuldades e temas de uma vez, a partir do cubo de
+    # facetas do snapshot (nenhuma consulta ao banco)
+    try:
+        banco = banco_questoes.atual()
+        return respostas_catalogo.responder(
+            'catalogo', banco, lambda: {"success": True, **banco.catalogo.como_dict(), "temas": TEMAS_REDACAO})
+    except questoes_publicadas.BancoIndisponivel:
+        raise
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/questoes/busca')
+def buscar_questoes():
+    consulta = busca.montar_consulta(request.args.get('q', ''))
+    if consulta is None:
+        return jsonify({"success": False, "error": "Informe o texto da busca."}), 400
+    try:
+        limite = min(max(int(request.args.get('limite', busca.LIMITE_PADRAO)), 1), busca.LIMITE_MAXIMO)
+        apos = request.args.get('apos')
+        apos = busca.decodificar_cursor(apos) if apos else None
+    except ValueError:
+        return jsonify({"success": False, "error": "Parâmetros de paginação inválidos."}), 400
+
+    try:
+        banco = banco_questoes.atual()
+        linhas, proximo = busca_questoes.buscar(consulta, request.args.get('area') or None,
+                                                request.args.get('banca') or None, limite, apos)
+        resultados = []
+        for questao_id, _, trecho in linhas:
+            q = banco.questao(questao_id)
+            if q is None:
+                continue
+            resultados.append({
+                "id": q.id,
+                "disciplina": q.disciplina,
+                "materia": q.materia,
+                "banca": q.banca,
+                "dificuldade": q.dificuldade,
+                "trecho": trecho,
+            })
+        return jsonify({"success": True, "resultados": resultados, "proximo": proximo})
+    except sqlite3.Error as e:
+        return jsonify({"success": False, "error": f"Erro na busca: {e}"}), 500
+
 @app.route('/api/simulado/iniciar', methods=['POST'])
 def iniciar_simulado():
     try:
@@ -123,96 +396,89 @@ def iniciar_simulado():
         areas_selecionadas = data.get('areas', [])
         banca_selecionada = data.get('banca', '')
         quantidade_str = data.get('quantidade', '10')
+        busca_simulado = data.get('busca')
+
+        banco = banco_questoes.atual()
+
+        if busca_simulado:
+            # Simulado com as questões de uma busca (/api/questoes/busca)
+            if not isinstance(busca_simulado, dict) or not all(
+                    isinstance(busca_simulado.get(campo) or '', str) for campo in ('q', 'area', 'banca')):
+                return jsonify({"success": False, "error": "Busca inválida."}), 400
+            consulta = busca.montar_consulta(busca_simulado.get('q'))
+            if consulta is None:
+                return jsonify({"success": False, "error": "Informe o texto da busca."}), 400
+            filtro = {"busca": {"q": consulta, "area": busca_simulado.get('area') or None,
+                                "banca": busca_simulado.get('banca') or None}}
+        else:
+            if not areas_selecionadas:
+                return jsonify({"success": False, "error": "Nenhuma área selecionada."}), 400
 
-        if not areas_selecionadas:
-            return jsonify({"success": False, "error": "Nenhuma área selecionada."}), 400
-
-        disciplinas_para_buscar = []
-        for area_nome in areas_selecionadas:
-            if area_nome in MAPA_AREAS:
-                disciplinas_para_buscar.extend(MAPA_AREAS[area_nome])
-        
-        disciplinas_unicas = list(set(disciplinas_para_buscar))
-        
-        if not disciplinas_unicas:
-            return jsonify({"success": False, "error": "Nenhuma disciplina correspondente às áreas selecionadas."}), 400
+            disciplinas_para_buscar = []
+            for area_nome in areas_selecionadas:
+                disciplinas_para_buscar.extend(banco.taxonomia.disciplinas(area_nome))
+            
+            disciplinas_unicas = list(set(disciplinas_para_buscar))
+            
+            if not disciplinas_unicas:
+                return jsonify({"success": False, "error": "Nenhuma disciplina correspondente às áreas selecionadas."}), 400
 
-        conn = get_db()
-        cursor = conn.cursor()
-        placeholders = ','.join('?' * len(disciplinas_unicas))
-        query_parts = ["SELECT * FROM questoes WHERE disciplina IN ({})".format(placeholders)]
-        query_params = disciplinas_unicas
-        
-        if banca_selecionada and banca_selecionada != 'todas':
-            query_parts.append("AND banca = ?")
-            query_params.append(banca_selecionada)
+            banca = banca_selecionada if banca_selecionada and banca_selecionada != 'todas' else None
+            filtro = {"disciplinas": sorted(disciplinas_unicas), "banca": banca}
+        candidatos = candidatos_do_filtro(banco, filtro)
         
-        if quantidade_str == "295":
-            query = " ".join(query_parts)
-            cursor.execute(query, query_params)
-            questoes_raw = cursor.fetchall()
-            random.shuffle(questoes_raw)
+        if str(quantidade_str).lower() in QUANTIDADE_TODAS:
+            total = len(candidatos)
         else:
-            limite = int(quantidade_str)
-            query = " ".join(query_parts) + " ORDER BY RANDOM() LIMIT ?"
-            query_params.append(limite)
-            cursor.execute(query, query_params)
-            questoes_raw = cursor.fetchall()
+            total = min(int(quantidade_str), len(candidatos))
         
-        conn.close()
-        
-        if not questoes_raw:
+        if total <= 0:
              return jsonify({"success": False, "error": "Nenhuma questão encontrada para os filtros selecionados."}), 404
 
-        questoes = []
-        for q in questoes_raw:
-            questao_dict = dict(q)
-            questao_dict['alternativas'] = json.loads(q['alternativas'])
-            questoes.append(questao_dict)
-
-        session['simulado_ids'] = [q['id'] for q in questoes]
-        session['simulado_respostas'] = {} 
-        session['indice_atual'] = 0
+        estado = EstadoSimulado.novo(filtro, versao_do_filtro(banco, filtro), total)
+        salvar_simulado(estado, novo=True)
         
-        primeira_questao = questoes[0]
+        sequencia = SequenciaSorteada(candidatos, estado.semente, total)
+        primeira_questao = banco.questao(sequencia[0]).como_dict()
         
         return jsonify({
             "success": True,
-            "total_questoes": len(questoes),
+            "total_questoes": total,
             "indice_atual": 0,
             "questao": primeira_questao,
             "resposta_anterior": None
         })
 
+    except questoes_publicadas.BancoIndisponivel:
+        raise
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/simulado/questao/<int:indice>')
 def get_questao(indice):
-    questoes_ids = session.get('simulado_ids')
-    if not questoes_ids:
+    estado = carregar_simulado()
+    if not estado:
         return jsonify({"success": False, "error": "Simulado não encontrado na sessão."}), 404
         
-    total_questoes = len(questoes_ids)
+    banco = banco_questoes.atual()
+    sequencia = sequencia_do_simulado(banco, estado)
+    if sequencia is None:
+        return jsonify(RESPOSTA_BANCO_ATUALIZADO[0]), RESPOSTA_BANCO_ATUALIZADO[1]
+    total_questoes = len(sequencia)
     
     if 0 <= indice < total_questoes:
-        session['indice_atual'] = indice
-        questao_id = questoes_ids[indice]
         try:
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM questoes WHERE id = ?", (questao_id,))
-            q_raw = cursor.fetchone()
-            conn.close()
+            q = banco.questao(sequencia[indice])
             
-            if not q_raw:
+            if not q:
                 return jsonify({"success": False, "error": "Questão não encontrada no DB."}), 404
             
-            questao_atual = dict(q_raw)
-            questao_atual['alternativas'] = json.loads(q_raw['alternativas'])
-            resposta_anterior = session.get('simulado_respostas', {}).get(str(questao_atual['id']))
+            # A questão já vem codificada do cache; só os campos da sessão
+            # são serializados a cada requisição
+            questao_atual = fragmentos_questoes.obter(banco.versao, q)
+            resposta_anterior = estado.resposta(indice)
             
-            return jsonify({
+            return resposta_emendada({
                 "success": True,
                 "total_questoes": total_questoes,
                 "indice_atual": indice,
@@ -224,109 +490,140 @@ def get_questao(indice):
     else:
         return jsonify({"success": False, "error": "Índice da questão fora dos limites."}), 404
 
+@app.route('/api/simulado/questoes')
+def get_questoes_janela():
+    # Janela de questões do simulado em uma só resposta, na ordem da sessão,
+    # para o frontend pré-carregar as próximas enquanto o usuário lê a atual.
+    estado = carregar_simulado()
+    if not estado:
+        return jsonify({"success": False, "error": "Simulado não encontrado na sessão."}), 404
+
+    try:
+        inicio = int(request.args.get('from', 0))
+        quantidade = int(request.args.get('count', 10))
+    except ValueError:
+        return jsonify({"success": False, "error": "Parâmetros 'from' e 'count' devem ser inteiros."}), 400
+    if inicio < 0 or quantidade < 1:
+        return jsonify({"success": False, "error": "Parâmetros 'from' e 'count' fora dos limites."}), 400
+    quantidade = min(quantidade, MAXIMO_PREFETCH)
+
+    banco = banco_questoes.atual()
+    sequencia = sequencia_do_simulado(banco, estado)
+    if sequencia is None:
+        return jsonify(RESPOSTA_BANCO_ATUALIZADO[0]), RESPOSTA_BANCO_ATUALIZADO[1]
+
+    total_questoes = len(sequencia)
+    if inicio >= total_questoes:
+        return jsonify({"success": False, "error": "Índice da questão fora dos limites."}), 404
+
+    questoes = []
+    for indice in range(inicio, min(inicio + quantidade, total_questoes)):
+        q = banco.questao(sequencia[indice])
+        questoes.append({
+            "indice": indice,
+            "questao": fragmentos_questoes.obter(banco.versao, q) if q else None,
+            "resposta_anterior": estado.resposta(indice)
+        })
+
+    resposta = resposta_emendada({
+        "success": True,
+        "total_questoes": total_questoes,
+        "inicio": inicio,
+        "questoes": questoes
+    })
+    # A janela depende das respostas da sessão: o ETag cobre o corpo inteiro
+    # e o navegador sempre revalida (If-None-Match -> 304 sem corpo).
+    resposta.add_etag()
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta.make_conditional(request)
+
 @app.route('/api/simulado/responder', methods=['POST'])
 def responder_questao():
     data = request.json
     questao_id = str(data.get('questao_id')) 
     alternativa_escolhida = data.get('alternativa', '').lower()
     
-    questoes_ids = session.get('simulado_ids')
-    respostas = session.get('simulado_respostas', {})
+    estado = carregar_simulado()
 
-    if not questoes_ids:
+    if not estado:
         return jsonify({"success": False, "error": "Simulado não encontrado."}), 404
         
-    if questao_id in respostas:
-        return jsonify({"success": False, "error": "Esta questão já foi respondida."}), 400
-
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM questoes WHERE id = ?", (int(questao_id),))
-        q_raw = cursor.fetchone()
-        conn.close()
-        
-        if not q_raw:
+        banco = banco_questoes.atual()
+        sequencia = sequencia_do_simulado(banco, estado)
+        if sequencia is None:
+            return jsonify(RESPOSTA_BANCO_ATUALIZADO[0]), RESPOSTA_BANCO_ATUALIZADO[1]
+
+        # Correção pelo gabarito do snapshot (array indexado por id), sem
+        # montar a questão inteira
+        questao_id = int(questao_id)
+        gabarito = banco.gabarito
+        chave = gabarito.chave(questao_id)
+        
+        if chave is None:
              return jsonify({"success": False, "error": "ID da questão não encontrado no DB."}), 404
+
+        indice = sequencia.indice_de(questao_id, chave)
+        if indice is None:
+            return jsonify({"success": False, "error": "Esta questão não faz parte do simulado."}), 404
+
+        if estado.respondida(indice):
+            return jsonify({"success": False, "error": "Esta questão já foi respondida."}), 400
              
-        questao_correta = dict(q_raw)
-        resposta_certa = questao_correta['resposta_correta'].lower()
+        resposta_certa = gabarito.resposta(questao_id)
         acertou = (alternativa_escolhida == resposta_certa)
 
-        respostas[questao_id] = {
-            "alternativa_escolhida": alternativa_escolhida,
-            "acertou": acertou
-        }
-        session['simulado_respostas'] = respostas
+        estado.registrar(indice, alternativa_escolhida, acertou)
+        salvar_simulado(estado)
+        
+        # Justificativa só é buscada depois da correção, direto do snapshot
+        justificativa = banco.questao(questao_id).justificativa
         
         return jsonify({
             "success": True,
             "acertou": acertou,
             "resposta_correta": resposta_certa.upper(),
-            "justificativa": questao_correta.get('justificativa', 'Sem justificativa detalhada.')
+            "justificativa": justificativa or 'Sem justificativa detalhada.'
         })
+    except questoes_publicadas.BancoIndisponivel:
+        raise
     except Exception as e:
         return jsonify({"success": False, "error": f"Erro ao verificar resposta: {e}"}), 500
 
 @app.route('/api/simulado/finalizar', methods=['POST'])
 def finalizar_simulado():
-    questoes_ids = session.get('simulado_ids')
-    respostas = session.get('simulado_respostas', {})
+    estado = carregar_simulado()
     
-    if not questoes_ids:
+    if not estado:
         return jsonify({"success": False, "error": "Nenhum simulado ativo para finalizar."}), 404
 
-    total_questoes = len(questoes_ids)
-    total_acertos = 0
-    desempenho_por_materia = defaultdict(lambda: {'acertos': 0, 'total': 0})
+    banco = banco_questoes.atual()
+    sequencia = sequencia_do_simulado(banco, estado)
+    if sequencia is None:
+        encerrar_simulado()
+        return jsonify(RESPOSTA_BANCO_ATUALIZADO[0]), RESPOSTA_BANCO_ATUALIZADO[1]
 
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        placeholders = ','.join('?' * len(questoes_ids))
-        query = "SELECT id, materia FROM questoes WHERE id IN ({})".format(placeholders)
-        
-        id_map = {id_val: i for i, id_val in enumerate(questoes_ids)}
-        ordered_params = sorted(questoes_ids, key=lambda x: id_map[x])
-        
-        cursor.execute(query, ordered_params)
-        questoes_raw = cursor.fetchall()
-        questoes = [dict(q) for q in questoes_raw]
-
-        for q in questoes:
-            materia = q['materia']
-            desempenho_por_materia[materia]['total'] += 1
-            
-            resposta = respostas.get(str(q['id']))
-            if resposta and resposta['acertou']:
-                total_acertos += 1
-                desempenho_por_materia[materia]['acertos'] += 1
-
-        percentual_acerto = round((total_acertos / total_questoes) * 100, 2) if total_questoes > 0 else 0
-
-        cursor.execute("INSERT INTO resultados (total_questoes, total_acertos, percentual) VALUES (?, ?, ?)", 
-                       (total_questoes, total_acertos, percentual_acerto))
-        
-        resultado_id = cursor.lastrowid
-
-        for materia, stats in desempenho_por_materia.items():
-            cursor.execute("INSERT INTO desempenho_materia (resultado_id, materia, acertos, total) VALUES (?, ?, ?, ?)",
-                           (resultado_id, materia, stats['acertos'], stats['total']))
-
-        conn.commit()
-        conn.close()
+        # Uma passada sobre os ids e o bytearray de respostas da sessão; a
+        # matéria/área de cada questão vem do mapa em memória do snapshot
+        resultado = correcao.corrigir(banco, list(sequencia), estado.respostas)
+        total_questoes = resultado.total_questoes
+        total_acertos = resultado.total_acertos
+        percentual_acerto = resultado.percentual
+
+        if escritora_resultados is not None:
+            escritora_resultados.enfileirar(resultado)
+        else:
+            conn = get_db()
+            correcao.gravar(conn.cursor(), [resultado])
+            conn.commit()
         
     except Exception as e:
         print(f"Erro ao salvar resultado: {e}")
-        session.pop('simulado_ids', None)
-        session.pop('simulado_respostas', None)
-        session.pop('indice_atual', None)
+        encerrar_simulado()
         return jsonify({"success": False, "error": f"Erro ao salvar dados no banco: {e}"}), 500
 
-    session.pop('simulado_ids', None)
-    session.pop('simulado_respostas', None)
-    session.pop('indice_atual', None)
+    encerrar_simulado()
 
     return jsonify({
         "success": True,
@@ -338,143 +635,207 @@ def finalizar_simulado():
         }
     })
 
+@app.route('/api/simulado/finalizar-lote', methods=['POST'])
+def finalizar_lote():
+    # Corrige e grava vários simulados já concluídos (ex.: feitos offline)
+    # em uma única transação. Corpo: {"simulados": [{"questoes": [ids],
+    # "respostas": ["a", null, ...]}, ...]}
+    data = request.json or {}
+    simulados = data.get('simulados')
+    if not isinstance(simulados, list) or not simulados:
+        return jsonify({"success": False, "error": "Envie a lista 'simulados'."}), 400
+    if len(simulados) > MAXIMO_LOTE_FINALIZACAO:
+        return jsonify({"success": False, "error": f"No máximo {MAXIMO_LOTE_FINALIZACAO} simulados por lote."}), 400
+
+    entradas = []
+    for posicao, simulado in enumerate(simulados):
+        ids = simulado.get('questoes') if isinstance(simulado, dict) else None
+        respostas = simulado.get('respostas') if isinstance(simulado, dict) else None
+        if not isinstance(ids, list) or not isinstance(respostas, list) or len(ids) != len(respostas) or not ids:
+            return jsonify({"success": False, "error": f"Simulado {posicao}: 'questoes' e 'respostas' devem ter o mesmo tamanho."}), 400
+        entradas.append((ids, respostas))
+
+    banco = banco_questoes.atual()
+    try:
+        resultados = correcao.corrigir_lote(banco, entradas)
+    except (ValueError, TypeError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        conn = get_db()
+        resultado_ids = correcao.gravar(conn.cursor(), resultados)
+        conn.commit()
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Erro ao salvar dados no banco: {e}"}), 500
+
+    return jsonify({
+        "success": True,
+        "relatorios": [{
+            "resultado_id": resultado_id,
+            "total_questoes": r.total_questoes,
+            "total_acertos": r.total_acertos,
+            "percentual_acerto": r.percentual,
+            "nota_final": r.percentual
+        } for resultado_id, r in zip(resultado_ids, resultados)]
+    })
+
+@app.route('/api/metricas/fila-resultados')
+def metricas_fila_resultados():
+    if escritora_resultados is None:
+        return jsonify({"success": True, "ativo": False})
+    return jsonify({"success": True, **escritora_resultados.metricas()})
+
 @app.route('/api/redacao/temas')
 def get_temas_redacao():
-    temas = [
-        {"id": 1, "titulo": "Os desafios da educação pública brasileira no século XXI"},
-        {"id": 2, "titulo": "Impactos da inteligência artificial no mercado de trabalho"},
-        {"id": 3, "titulo": "Crise hídrica e gestão sustentável dos recursos naturais"},
-        {"id": 4, "titulo": "Violência urbana e políticas de segurança pública"},
-        {"id": 5, "titulo": "Desafios do sistema de saúde pública no Brasil"},
-        {"id": 6, "titulo": "A importância da preservação da Amazônia para o equilíbrio climático"},
-        {"id": 7, "titulo": "Os efeitos das fake news na democracia brasileira"},
-        {"id": 8, "titulo": "Mobilidade urbana e qualidade de vida nas grandes cidades"},
-        {"id": 9, "titulo": "Desigualdade social e seus impactos no acesso à educação"},
-        {"id": 10, "titulo": "Tecnologia e privacidade: os limites da exposição digital"},
-        {"id": 11, "titulo": "Esporte como ferramenta de inclusão social"},
-        {"id": 12, "titulo": "Desafios da alimentação saudável na sociedade contemporânea"},
-        {"id": 13, "titulo": "Representatividade racial nos espaços de poder"},
-        {"id": 14, "titulo": "Sustentabilidade e consumo consciente"},
-        {"id": 15, "titulo": "Os impactos da pandemia COVID-19 na educação brasileira"},
-        {"id": 16, "titulo": "Envelhecimento populacional e previdência social"},
-        {"id": 17, "titulo": "Democratização do acesso à cultura no Brasil"},
-        {"id": 18, "titulo": "Desafios da inclusão de pessoas com deficiência no mercado de trabalho"},
-        {"id": 19, "titulo": "Violência doméstica durante o isolamento social"},
-        {"id": 20, "titulo": "Importância do investimento em ciência e tecnologia"},
-        {"id": 21, "titulo": "Crise habitacional e direito à moradia"},
-        {"id": 22, "titulo": "Preconceito linguístico na sociedade brasileira"},
-        {"id": 23, "titulo": "Desafios da produção agrícola sustentável"},
-        {"id": 24, "titulo": "Saúde mental no ambiente de trabalho"},
-        {"id": 25, "titulo": "Terceirização e direitos trabalhistas"},
-        {"id": 26, "titulo": "Desafios da educação à distância no Brasil"},
-        {"id": 27, "titulo": "Protagonismo juvenil na política nacional"},
-        {"id": 28, "titulo": "Impactos do agrotóxico na saúde e meio ambiente"},
-        {"id": 29, "titulo": "Democratização do acesso à internet no Brasil"},
-        {"id": 30, "titulo": "Desafios da gestão do lixo urbano"},
-        {"id": 31, "titulo": "Importância da vacinação para a saúde pública"},
-        {"id": 32, "titulo": "Bullying e suas consequências no ambiente escolar"},
-        {"id": 33, "titulo": "Desafios da mobilidade elétrica no Brasil"},
-        {"id": 34, "titulo": "Cultura do cancelamento nas redes sociais"},
-        {"id": 35, "titulo": "Desafios da educação sexual nas escolas"},
-        {"id": 36, "titulo": "Impactos do turismo no desenvolvimento regional"},
-        {"id": 37, "titulo": "Desafios da preservação do patrimônio histórico"},
-        {"id": 38, "titulo": "Trabalho escravo contemporâneo no Brasil"},
-        {"id": 39, "titulo": "Desafios do sistema prisional brasileiro"},
-        {"id": 40, "titulo": "Importância do aleitamento materno"},
-        {"id": 41, "titulo": "Desafios da erradicação do trabalho infantil"},
-        {"id": 42, "titulo": "Impactos das queimadas no bioma Pantanal"},
-        {"id": 43, "titulo": "Desafios da mobilidade para pessoas com deficiência"},
-        {"id": 44, "titulo": "Importância da doação de órgãos"},
-        {"id": 45, "titulo": "Desafios da produção cultural independente"},
-        {"id": 46, "titulo": "Impactos dos aplicativos de transporte na economia"},
-        {"id": 47, "titulo": "Desafios da proteção aos refugiados no Brasil"},
-        {"id": 48, "titulo": "Importância da educação financeira nas escolas"},
-        {"id": 49, "titulo": "Desafios do envelhecimento com dignidade"},
-        {"id": 50, "titulo": "Impactos do desmatamento na biodiversidade"},
-        {"id": 51, "titulo": "Desafios da segurança no trânsito brasileiro"},
-        {"id": 52, "titulo": "Importância do esporte para o desenvolvimento infantil"},
-        {"id": 53, "titulo": "Desafios da valorização dos profissionais da educação"},
-        {"id": 54, "titulo": "Impactos da mineração em terras indígenas"},
-        {"id": 55, "titulo": "Desafios do combate à evasão escolar"},
-        {"id": 56, "titulo": "Importância da preservação dos oceanos"},
-        {"id": 57, "titulo": "Desafios da agricultura familiar no Brasil"},
-        {"id": 58, "titulo": "Impactos da automação nos empregos tradicionais"},
-        {"id": 59, "titulo": "Desafios do acesso à justiça para populações vulneráveis"},
-        {"id": 60, "titulo": "Importância do voluntariado para a sociedade"},
-        {"id": 61, "titulo": "Desafios da produção de energia limpa no Brasil"},
-        {"id": 62, "titulo": "Impactos da globalização na cultura brasileira"},
-        {"id": 63, "titulo": "Desafios do ensino profissionalizante no Brasil"},
-        {"id": 64, "titulo": "Importância da amamentação para o desenvolvimento infantil"},
-        {"id": 65, "titulo": "Desafios da segurança alimentar nas periferias"},
-        {"id": 66, "titulo": "Impactos da poluição sonora nas grandes cidades"},
-        {"id": 67, "titulo": "Desafios da educação no campo"},
-        {"id": 68, "titulo": "Importância do brincar para o desenvolvimento infantil"},
-        {"id": 69, "titulo": "Desafios do combate à depressão na adolescência"},
-        {"id": 70, "titulo": "Impactos do plástico nos ecossistemas marinhos"},
-        {"id": 71, "titulo": "Desafios da inclusão digital da terceira idade"},
-        {"id": 72, "titulo": "Importância da educação ambiental nas escolas"},
-        {"id": 73, "titulo": "Desafios do transporte público nas metrópoles"},
-        {"id": 74, "titulo": "Impactos da inteligência artificial na educação"},
-        {"id": 75, "titulo": "Desafios da preservação das línguas indígenas"},
-        {"id": 76, "titulo": "Importância da atividade física para a saúde mental"},
-        {"id": 77, "titulo": "Desafios do saneamento básico no Brasil"},
-        {"id": 78, "titulo": "Impactos da indústria da moda no meio ambiente"},
-        {"id": 79, "titulo": "Desafios da educação para o trânsito"},
-        {"id": 80, "titulo": "Importância da preservação dos rios urbanos"},
-        {"id": 81, "titulo": "Desafios do combate à corrupção no Brasil"},
-        {"id": 82, "titulo": "Impactos dos games no desenvolvimento cognitivo"},
-        {"id": 83, "titulo": "Desafios da medicina preventiva no SUS"},
-        {"id": 84, "titulo": "Importância da leitura na formação crítica"},
-        {"id": 85, "titulo": "Desafios da mobilidade rural"},
-        {"id": 86, "titulo": "Impactos do home office na sociedade"},
-        {"id": 87, "titulo": "Desafios da preservação da fauna silvestre"},
-        {"id": 88, "titulo": "Importância do teatro na educação"},
-        {"id": 89, "titulo": "Desafios da reciclagem no Brasil"},
-        {"id": 90, "titulo": "Impactos da música na saúde mental"},
-        {"id": 91, "titulo": "Desafios do acesso à universidade pública"},
-        {"id": 92, "titulo": "Importância do cooperativismo para o desenvolvimento"},
-        {"id": 93, "titulo": "Desafios da segurança cibernética no Brasil"},
-        {"id": 94, "titulo": "Impactos do veganismo no meio ambiente"},
-        {"id": 95, "titulo": "Desafios da educação patrimonial"},
-        {"id": 96, "titulo": "Importância dos museus para a cultura nacional"},
-        {"id": 97, "titulo": "Desafios do combate ao assédio moral"},
-        {"id": 98, "titulo": "Impactos da moda sustentável"},
-        {"id": 99, "titulo": "Desafios da educação para relações étnico-raciais"},
-        {"id": 100, "titulo": "Importância da filosofia na formação cidadã"}
-    ]
-    return jsonify({"success": True, "temas": temas})
+    return respostas_catalogo.responder('temas', None, lambda: {"success": True, "temas": TEMAS_REDACAO},
+                                        cache_control=CACHE_CONTROL_ESTATICO)
+
+def validar_redacao(data):
+    """Mensagem de erro para o corpo de uma correção, ou None se estiver válido."""
+    if not isinstance(data, dict) or not data.get('tema') or not data.get('texto'):
+        return "Tema e texto são obrigatórios."
+    if not isinstance(data['tema'], str) or not isinstance(data['texto'], str):
+        return "Tema e texto devem ser textos."
+    return None
 
 @app.route('/api/redacao/corrigir-gemini', methods=['POST'])
 def corrigir_gemini():
-    data = request.json
-    tema = data.get('tema')
-    texto = data.get('texto')
-    
-    if not tema or not texto:
-        return jsonify({"success": False, "error": "Tema e texto são obrigatórios."}), 400
+    data = request.get_json(silent=True) or {}
+    erro = validar_redacao(data)
+    if erro:
+        return jsonify({"success": False, "error": erro}), 400
+    tema = data['tema']
+    texto = data['texto']
+
+    # A pré-correção local (pre_corretor.py) leva menos de 1 ms: vai como
+    # primeira resposta enquanto o modelo corrige
+    previa = pre_corretor.avaliar(tema, texto)
+
+    # A correção leva segundos no modelo: responde já com o id do job e o
+    # cliente acompanha em /api/redacao/correcoes/<job_id>
+    varredor_correcoes.garantir_ativo()
+    try:
+        job_id, do_cache = correcoes_redacao.submeter(tema, texto)
+    except jobs_redacao.FilaCheia:
+        resposta = jsonify({"success": False, "error": "Muitas correções em andamento. Tente novamente em instantes."})
+        resposta.headers['Retry-After'] = '5'
+        return resposta, 503
+    except (clientes_llm.ErroLLM, ValueError) as e:
+        return jsonify({"success": False, "error": f"Erro ao processar correção com IA: {e}"}), 500
+    except sqlite3.Error as e:
+        return jsonify({"success": False, "error": f"Erro ao registrar correção: {e}"}), 500
+
+    if do_cache:
+        # Mesma redação já corrigida: o job nasce concluído
+        return jsonify({"success": True, "cache": True, **correcoes_redacao.obter(job_id)})
 
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "estado": jobs_redacao.PENDENTE,
+        "acompanhar": url_for('obter_correcao_redacao', job_id=job_id),
+        "previa": previa
+    }), 202
+
+def evento_sse(nome, dados):
+    return "event: {}\ndata: {}\n\n".format(nome, json.dumps(dados, ensure_ascii=False))
+
+@app.route('/api/redacao/corrigir-gemini/stream', methods=['POST'])
+def corrigir_gemini_stream():
+    # Mesma correção, em Server-Sent Events: cada competência sai assim que é
+    # interpretada da resposta do modelo; o resumo vem no fim
+    data = request.get_json(silent=True) or {}
+    erro = validar_redacao(data)
+    if erro:
+        return jsonify({"success": False, "error": erro}), 400
+    tema = data['tema']
+    texto = data['texto']
+
+    previa = pre_corretor.avaliar(tema, texto)
+    eventos = queue.Queue()
+    varredor_correcoes.garantir_ativo()
     try:
-        nota_simulada = random.randint(60, 95) 
-        
-        correcao_data = {
-            "nota_final": nota_simulada,
-            "analise_competencias": [
-                {"competencia": "Competência 1: Domínio da norma culta", "nota": round(nota_simulada * 0.18), "comentario": "Bom domínio da norma padrão, com poucos desvios gramaticais."},
-                {"competencia": "Competência 2: Compreensão do tema e estrutura", "nota": round(nota_simulada * 0.20), "comentario": "Tema compreendido adequadamente com estrutura dissertativa clara."},
-                {"competencia": "Competência 3: Argumentação e repertório", "nota": round(nota_simulada * 0.19), "comentario": "Argumentos consistentes, poderia usar mais repertório sociocultural."},
-                {"competencia": "Competência 4: Coesão e coerência", "nota": round(nota_simulada * 0.20), "comentario": "Texto coeso com boa progressão argumentativa."},
-                {"competencia": "Competência 5: Proposta de intervenção", "nota": round(nota_simulada * 0.23), "comentario": "Proposta concreta e detalhada, respeitando os direitos humanos."}
-            ],
-            "pontos_fortes": ["Estrutura organizada", "Argumentação clara", "Proposta de intervenção completa"],
-            "pontos_fracos": ["Poderia usar mais exemplos concretos", "Repertório sociocultural limitado"],
-            "sugestoes_melhoria": ["Ampliar o repertório de citações", "Desenvolver mais os exemplos"],
-            "dicas_concursos": ["Mantenha a estrutura dissertativa", "Use conectivos variados", "Revise a concordância verbal"]
-        }
-        
-        return jsonify({"success": True, "correcao": correcao_data})
-        
-    except Exception as e:
-        return jsonify({"success": False, "error": f"Erro ao processar correção: {e}"}), 500
+        job_id, do_cache = correcoes_redacao.submeter(
+            tema, texto, ouvinte=lambda evento, dados: eventos.put((evento, dados)))
+    except jobs_redacao.FilaCheia:
+        resposta = jsonify({"success": False, "error": "Muitas correções em andamento. Tente novamente em instantes."})
+        resposta.headers['Retry-After'] = '5'
+        return resposta, 503
+    except (clientes_llm.ErroLLM, ValueError) as e:
+        return jsonify({"success": False, "error": f"Erro ao processar correção com IA: {e}"}), 500
+    except sqlite3.Error as e:
+        return jsonify({"success": False, "error": f"Erro ao registrar correção: {e}"}), 500
+
+    if do_cache:
+        correcao_pronta = correcoes_redacao.obter(job_id)["correcao"]
+        for evento in redacao.eventos_da_correcao(correcao_pronta):
+            eventos.put(evento)
+        eventos.put(("concluido", correcao_pronta))
+    acompanhar = url_for('obter_correcao_redacao', job_id=job_id)
+
+    def transmitir():
+        yield evento_sse("job", {"job_id": job_id, "acompanhar": acompanhar, "cache": do_cache})
+        if not do_cache:
+            yield evento_sse("previa", previa)
+        limite = time.monotonic() + DURACAO_MAXIMA_SSE
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                # O job continua; o cliente passa a consultar 'acompanhar'
+                # (com ?aguardar=N) até ele terminar
+                yield evento_sse("acompanhar", {"job_id": job_id, "acompanhar": acompanhar})
+                return
+            try:
+                evento, dados = eventos.get(timeout=min(INTERVALO_KEEPALIVE_SSE, restante))
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if evento == "concluido":
+                yield evento_sse("resumo", redacao.resumo(dados))
+                return
+            yield evento_sse(evento, dados)
+            if evento == "erro":
+                return
+
+    return Response(transmitir(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/redacao/correcoes/<job_id>')
+def obter_correcao_redacao(job_id):
+    # ?aguardar=N segura a resposta até N segundos esperando o job terminar
+    try:
+        aguardar = min(max(float(request.args.get('aguardar', 0)), 0), ESPERA_MAXIMA_CORRECAO)
+    except ValueError:
+        return jsonify({"success": False, "error": "Parâmetro 'aguardar' inválido."}), 400
+
+    try:
+        job = correcoes_redacao.aguardar(job_id, aguardar) if aguardar else correcoes_redacao.obter(job_id)
+    except sqlite3.Error as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    if job is None:
+        return jsonify({"success": False, "error": "Correção não encontrada ou expirada."}), 404
+    if job["estado"] == jobs_redacao.ERRO:
+        return jsonify({"success": False, **job})
+    return jsonify({"success": True, **job})
+
+@app.route('/api/metricas/correcoes-redacao')
+def metricas_correcoes_redacao():
+    return jsonify({"success": True, **correcoes_redacao.metricas()})
+
+@app.route('/api/admin/cache-correcoes', methods=['DELETE'])
+def invalidar_cache_correcoes():
+    # Protegido por ADMIN_TOKEN (cabeçalho X-Admin-Token); sem ele configurado, desativado
+    token = os.environ.get('ADMIN_TOKEN')
+    if not token or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        return jsonify({"success": False, "error": "Acesso negado."}), 403
+    rubrica = request.args.get('rubrica')
+    if not rubrica:
+        return jsonify({"success": False, "error": "Informe a versão da rubrica."}), 400
+    try:
+        removidas = cache_redacao.invalidar(rubrica)
+    except sqlite3.Error as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({"success": True, "rubrica": rubrica, "removidas": removidas})
 
 @app.route('/api/dashboard/estatisticas-areas')
 def get_dashboard_stats_areas():
@@ -482,53 +843,32 @@ def get_dashboard_stats_areas():
         conn = get_db()
         cursor = conn.cursor()
         
-        # Estatísticas gerais
-        cursor.execute("SELECT COUNT(*) FROM questoes")
-        total_questoes = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM resultados")
-        total_simulados_feitos = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT AVG(percentual) FROM resultados")
-        media_geral_percentual = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT SUM(total_acertos) FROM resultados")
-        total_acertos_geral = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT SUM(total_questoes) FROM resultados")
-        total_questoes_geral = cursor.fetchone()[0] or 0
-        
-        # Melhor desempenho
-        cursor.execute("SELECT data, percentual FROM resultados ORDER BY percentual DESC LIMIT 1")
-        melhor_desempenho_row = cursor.fetchone()
-        melhor_desempenho = dict(melhor_desempenho_row) if melhor_desempenho_row else None
+        banco = banco_questoes.atual()
+        total_questoes = len(banco)
+        
+        # Estatísticas gerais e por área vêm dos agregados mantidos pelo
+        # finalizar_simulado (agregados.py), não das tabelas brutas
+        gerais, desempenho_area = agregados.ler_estatisticas(conn)
+        if gerais is not None:
+            total_simulados_feitos = gerais['total_simulados']
+            media_geral_percentual = gerais['soma_percentual'] / total_simulados_feitos if total_simulados_feitos else 0
+            total_acertos_geral = gerais['total_acertos']
+            total_questoes_geral = gerais['total_questoes']
+            melhor_desempenho = ({"data": gerais['melhor_data'], "percentual": gerais['melhor_percentual']}
+                                 if gerais['melhor_percentual'] is not None else None)
+        else:
+            total_simulados_feitos = media_geral_percentual = total_acertos_geral = total_questoes_geral = 0
+            melhor_desempenho = None
         
-        # Estatísticas por área (SIMPLIFICADO - sem matérias individuais)
         desempenho_por_area = []
         
-        for area_nome, disciplinas in MAPA_AREAS.items():
+        for area_nome in banco.taxonomia.areas:
+            disciplinas = banco.taxonomia.disciplinas(area_nome)
             if not disciplinas:
                 continue
                 
-            # Total de questões na área
-            placeholders = ','.join('?' * len(disciplinas))
-            query_total = "SELECT COUNT(*) as total FROM questoes WHERE disciplina IN ({})".format(placeholders)
-            cursor.execute(query_total, disciplinas)
-            total_questoes_area = cursor.fetchone()[0]
-            
-            # Desempenho na área
-            query_desempenho = """
-                SELECT 
-                    COALESCE(SUM(dm.acertos), 0) as acertos,
-                    COALESCE(SUM(dm.total), 0) as total_respondidas
-                FROM desempenho_materia dm
-                WHERE dm.materia IN ({})
-            """.format(placeholders)
-            cursor.execute(query_desempenho, disciplinas)
-            result = cursor.fetchone()
-            
-            total_acertos_area = result['acertos'] if result else 0
-            total_respondidas_area = result['total_respondidas'] if result else 0
+            total_questoes_area = sum(len(banco.ids_por('disciplina', disciplina)) for disciplina in disciplinas)
+            total_acertos_area, total_respondidas_area = desempenho_area.get(area_nome, (0, 0))
             
             if total_respondidas_area > 0:
                 percentual = round((total_acertos_area / total_respondidas_area) * 100, 2)
@@ -547,7 +887,6 @@ def get_dashboard_stats_areas():
         cursor.execute("SELECT id, data, total_questoes, total_acertos, percentual FROM resultados ORDER BY data DESC LIMIT 5")
         historico_recente = [dict(row) for row in cursor.fetchall()]
         
-        conn.close()
         
         return jsonify({
             "success": True,
@@ -563,9 +902,24 @@ def get_dashboard_stats_areas():
             "historico_recente": historico_recente
         })
 
+    except questoes_publicadas.BancoIndisponivel:
+        raise
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+# Cria as tabelas e carrega o snapshot de questões já na importação do módulo,
+# que é o que o gunicorn (Procfile: app:app) executa em cada worker.
+try:
+    setup_db()
+    banco_questoes.atual()
+except (sqlite3.Error, questoes_publicadas.BancoIndisponivel) as e:
+    print(f"Aviso: banco de questões não carregado na inicialização: {e}")
+
+# A escritora sobe já aqui, e não no primeiro resultado, para reaplicar logo
+# os journals de workers que morreram
+if escritora_resultados is not None:
+    escritora_resultados.garantir_ativo()
+
 if __name__ == '__main__':
     setup_db()
     # Configuração correta para deploy (Gunicorn vai lidar com isso)
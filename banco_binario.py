@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""Banco de questões compilado num arquivo binário lido por ``mmap``.
+
+O snapshot montado por ``carregar_banco`` guarda cada texto como objeto
+Python, uma cópia por worker do gunicorn. Aqui o arquivo publicado
+(``questoes.bin``, gerado junto com ``questoes.db``) é mapeado na memória:
+todos os processos compartilham as mesmas páginas do page cache e cada
+campo só é decodificado quando alguém o lê.
+
+Layout (little-endian, seções alinhadas em 8 bytes)::
+
+    cabeçalho   mágica, formato, posição e tamanho dos metadados
+    heap        textos UTF-8 de cada questão, em sequência
+    registros   um REGISTRO de tamanho fixo por questão, em ordem de id
+    ids         uint32 em ordem crescente (a posição de cada registro)
+    posicoes    uint32 indexado por id - base -> posição do registro
+    facetas     uint32: ids de cada valor de disciplina/matéria/dificuldade/banca
+    metadados   JSON: versões, taxonomia, valores das facetas e as seções
+
+Disciplina, matéria, dificuldade e banca ficam como códigos no registro
+(índices na tabela de valores dos metadados), então montar o gabarito e os
+índices do snapshot não precisa tocar no heap além da resposta correta.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import banco_questoes
+
+MAGICA = b"QBANCO\x00\x01"
+FORMATO = 1
+CABECALHO = struct.Struct("<8sIIQQ")
+
+# id, início no heap, códigos (disciplina, matéria, dificuldade, banca) e
+# tamanho em bytes de cada texto (NULO para NULL)
+REGISTRO = struct.Struct("<IQ4I6I")
+NULO = 0xFFFFFFFF
+
+FACETAS = ("disciplina", "materia", "dificuldade", "banca")
+
+# Ordem das colunas esperada por ``compilar`` (a de banco_questoes.COLUNAS)
+COLUNAS = ("id", "disciplina", "materia", "dificuldade", "enunciado", "alternativas",
+           "resposta_correta", "justificativa", "dica", "formula", "banca")
+
+# O formato usa arrays nativos de uint32 direto sobre o mmap
+SUPORTADO = sys.byteorder == "little" and array("I").itemsize == 4
+
+
+def _alinhar(f):
+    resto = f.tell() % 8
+    if resto:
+        f.write(bytes(8 - resto))
+    return f.tell()
+
+
+def compilar(linhas, taxonomia, versao_banco, destino):
+    """Grava ``destino`` a partir de ``linhas`` (tuplas na ordem de COLUNAS, por id).
+
+    ``taxonomia``: lista de (área, disciplinas). A assinatura do conteúdo é
+    calculada como em ``banco_questoes.carregar_banco``, então o snapshot
+    mapeado tem a mesma ``versao`` que o carregado do SQLite.
+    """
+    temporario = "{}.{}.tmp".format(destino, os.getpid())
+    assinatura = hashlib.blake2b(digest_size=8)
+    registros = bytearray()
+    ids = array("I")
+    codigos = {campo: {} for campo in FACETAS}
+    membros = {campo: [] for campo in FACETAS}
+
+    with open(temporario, "wb") as f:
+        f.write(bytes(CABECALHO.size))
+        inicio_heap = _alinhar(f)
+        tamanho_heap = 0
+        for row in linhas:
+            row = tuple(row)
+            assinatura.update(repr(row).encode("utf-8"))
+            questao_id, disciplina, materia, dificuldade, enunciado, alternativas, resposta, justificativa, dica, \
+                formula, banca = row
+            codigos_faceta = []
+            for campo, valor in zip(FACETAS, (disciplina, materia, dificuldade, banca)):
+                codigo = codigos[campo].get(valor)
+                if codigo is None:
+                    codigo = codigos[campo][valor] = len(membros[campo])
+                    membros[campo].append(array("I"))
+                membros[campo][codigo].append(questao_id)
+                codigos_faceta.append(codigo)
+            tamanhos = []
+            inicio = tamanho_heap
+            for texto in (enunciado, alternativas, resposta, justificativa, dica, formula):
+                if texto is None:
+                    tamanhos.append(NULO)
+                    continue
+                dados = str(texto).encode("utf-8")
+                f.write(dados)
+                tamanho_heap += len(dados)
+                tamanhos.append(len(dados))
+            registros += REGISTRO.pack(questao_id, inicio, *codigos_faceta, *tamanhos)
+            ids.append(questao_id)
+
+        base = ids[0] if ids else 0
+        posicoes = array("I", [NULO]) * ((ids[-1] - base + 1) if ids else 0)
+        for posicao, questao_id in enumerate(ids):
+            posicoes[questao_id - base] = posicao
+
+        secoes = {"heap": inicio_heap}
+        secoes["registros"] = _alinhar(f)
+        f.write(registros)
+        secoes["ids"] = _alinhar(f)
+        f.write(ids.tobytes())
+        secoes["posicoes"] = _alinhar(f)
+        f.write(posicoes.tobytes())
+        secoes["facetas"] = _alinhar(f)
+        diretorio_facetas = {}
+        inicio_ids = 0
+        for campo in FACETAS:
+            diretorio_facetas[campo] = []
+            for lista in membros[campo]:
+                f.write(lista.tobytes())
+                diretorio_facetas[campo].append([inicio_ids, len(lista)])
+                inicio_ids += len(lista)
+
+        metadados = json.dumps({
+            "assinatura": assinatura.hexdigest(),
+            "versao_banco": versao_banco,
+            "total": len(ids),
+            "base": base,
+            "tamanho_posicoes": len(posicoes),
+            "taxonomia": [[area, list(disciplinas)] for area, disciplinas in taxonomia],
+            "valores": {campo: list(codigos[campo]) for campo in FACETAS},
+            "facetas": diretorio_facetas,
+            "secoes": secoes,
+        }, ensure_ascii=False).encode("utf-8")
+        inicio_metadados = _alinhar(f)
+        f.write(metadados)
+        f.seek(0)
+        f.write(CABECALHO.pack(MAGICA, FORMATO, 0, inicio_metadados, len(metadados)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, destino)
+
+
+class QuestaoMapeada:
+    """Mesma interface de ``banco_questoes.Questao``; os textos são lidos do
+    mmap a cada acesso."""
+
+    __slots__ = ("_arquivo", "_registro")
+
+    def __init__(self, arquivo, registro):
+        self._arquivo = arquivo
+        self._registro = registro
+
+    def _texto(self, k):
+        registro = self._registro
+        tamanho = registro[6 + k]
+        if tamanho == NULO:
+            return None
+        inicio = self._arquivo.inicio_heap + registro[1]
+        for anterior in registro[6:6 + k]:
+            if anterior != NULO:
+                inicio += anterior
+        return str(self._arquivo.mm[inicio:inicio + tamanho], "utf-8")
+
+    @property
+    def id(self):
+        return self._registro[0]
+
+    @property
+    def disciplina(self):
+        return self._arquivo.valores["disciplina"][self._registro[2]]
+
+    @property
+    def materia(self):
+        return self._arquivo.valores["materia"][self._registro[3]]
+
+    @property
+    def dificuldade(self):
+        return self._arquivo.valores["dificuldade"][self._registro[4]]
+
+    @property
+    def banca(self):
+        return self._arquivo.valores["banca"][self._registro[5]]
+
+    @property
+    def enunciado(self):
+        return self._texto(0)
+
+    @property
+    def alternativas(self):
+        return banco_questoes.decodificar_alternativas(self.id, self._texto(1))
+
+    @property
+    def resposta_correta(self):
+        return self._texto(2)
+
+    @property
+    def justificativa(self):
+        return self._texto(3)
+
+    @property
+    def dica(self):
+        return self._texto(4)
+
+    @property
+    def formula(self):
+        return self._texto(5)
+
+    def como_dict(self):
+        registro, arquivo = self._registro, self._arquivo
+        textos = []
+        inicio = arquivo.inicio_heap + registro[1]
+        for tamanho in registro[6:]:
+            if tamanho == NULO:
+                textos.append(None)
+                continue
+            textos.append(str(arquivo.mm[inicio:inicio + tamanho], "utf-8"))
+            inicio += tamanho
+        enunciado, alternativas, resposta, justificativa, dica, formula = textos
+        valores = arquivo.valores
+        return {
+            "id": registro[0],
+            "disciplina": valores["disciplina"][registro[2]],
+            "materia": valores["materia"][registro[3]],
+            "dificuldade": valores["dificuldade"][registro[4]],
+            "enunciado": enunciado,
+            "alternativas": banco_questoes.decodificar_alternativas(registro[0], alternativas),
+            "resposta_correta": resposta,
+            "justificativa": justificativa,
+            "dica": dica,
+            "formula": formula,
+            "banca": valores["banca"][registro[5]],
+        }
+
+
+class ArquivoQuestoes:
+    """Leitura de um arquivo gerado por ``compilar``; nada é copiado na abertura
+    além dos metadados."""
+
+    def __init__(self, caminho):
+        with open(caminho, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magica, formato, _, inicio_metadados, tamanho_metadados = CABECALHO.unpack_from(self.mm, 0)
+        if magica != MAGICA or formato != FORMATO:
+            raise ValueError("{} não é um banco de questões compilado (formato {}).".format(caminho, FORMATO))
+        metadados = json.loads(self.mm[inicio_metadados:inicio_metadados + tamanho_metadados])
+        secoes = metadados["secoes"]
+        self.versao = metadados["assinatura"]
+        self.versao_banco = metadados["versao_banco"]
+        self.taxonomia = [(area, tuple(disciplinas)) for area, disciplinas in metadados["taxonomia"]]
+        self.valores = {campo: tuple(sys.intern(v) if isinstance(v, str) else v for v in lista)
+                        for campo, lista in metadados["valores"].items()}
+        self.base = metadados["base"]
+        self.tamanho_posicoes = metadados["tamanho_posicoes"]
+        self.inicio_heap = secoes["heap"]
+        self._inicio_registros = secoes["registros"]
+
+        total = metadados["total"]
+        buffer = memoryview(self.mm)
+        self.ids = buffer[secoes["ids"]:secoes["ids"] + 4 * total].cast("I")
+        self._posicoes = buffer[secoes["posicoes"]:secoes["posicoes"] + 4 * self.tamanho_posicoes].cast("I")
+        self._registros = buffer[self._inicio_registros:self._inicio_registros + REGISTRO.size * total]
+        fim_facetas = secoes["facetas"] + 4 * sum(quantidade for diretorio in metadados["facetas"].values()
+                                                  for _, quantidade in diretorio)
+        ids_facetas = buffer[secoes["facetas"]:fim_facetas].cast("I")
+        # valor -> memoryview dos ids (em ordem crescente), sem cópia
+        self.indices = {
+            campo: {valor: ids_facetas[inicio:inicio + quantidade]
+                    for valor, (inicio, quantidade) in zip(self.valores[campo], metadados["facetas"][campo])}
+            for campo in FACETAS
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def questao(self, questao_id):
+        i = questao_id - self.base
+        if not 0 <= i < len(self._posicoes):
+            return None
+        posicao = self._posicoes[i]
+        if posicao == NULO:
+            return None
+        return QuestaoMapeada(self, REGISTRO.unpack_from(self.mm, self._inicio_registros + REGISTRO.size * posicao))
+
+    def linhas_indice(self):
+        """(id, disciplina, materia, dificuldade, banca, resposta_correta) em ordem de id."""
+        disciplinas, materias = self.valores["disciplina"], self.valores["materia"]
+        dificuldades, bancas = self.valores["dificuldade"], self.valores["banca"]
+        mm, inicio_heap = self.mm, self.inicio_heap
+        for (questao_id, inicio, disciplina, materia, dificuldade, banca, tamanho_enunciado, tamanho_alternativas,
+             tamanho_resposta, _, _, _) in REGISTRO.iter_unpack(self._registros):
+            if tamanho_resposta == NULO:
+                resposta = None
+            else:
+                inicio += inicio_heap + (tamanho_enunciado if tamanho_enunciado != NULO else 0) \
+                    + (tamanho_alternativas if tamanho_alternativas != NULO else 0)
+                resposta = str(mm[inicio:inicio + tamanho_resposta], "utf-8")
+            yield (questao_id, disciplinas[disciplina], materias[materia], dificuldades[dificuldade],
+                   bancas[banca], resposta)
+
+
+def versao_compilada(caminho):
+    """``versao_banco`` gravada no arquivo, ou None se ausente/ilegível."""
+    try:
+        with open(caminho, "rb") as f:
+            magica, formato, _, inicio_metadados, tamanho_metadados = CABECALHO.unpack(f.read(CABECALHO.size))
+            if magica != MAGICA or formato != FORMATO:
+                return None
+            f.seek(inicio_metadados)
+            return json.loads(f.read(tamanho_metadados))["versao_banco"]
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
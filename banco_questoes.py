@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""Snapshot imutável do banco de questões, compartilhado pelo processo.
+
+O snapshot é carregado uma vez e as rotas de leitura consultam apenas
+memória. Quando o banco muda (contador ``versao_banco`` mantido por
+triggers, ``PRAGMA data_version`` como alternativa, ou inode do arquivo),
+um novo snapshot é montado por inteiro e trocado atomicamente; quem já
+tinha a referência antiga continua usando-a até o fim da requisição.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from functools import cached_property
+from typing import NamedTuple, Optional
+
+import banco_binario
+import questoes_publicadas
+from amostragem import IndiceAmostragem
+from catalogo import CuboFacetas
+from correcao import MapaDesempenho
+from gabarito import Gabarito
+from taxonomia import Taxonomia, carregar_taxonomia
+
+COLUNAS = ("id", "disciplina", "materia", "dificuldade", "enunciado", "alternativas",
+           "resposta_correta", "justificativa", "dica", "formula", "banca")
+
+SQL_CARGA = "SELECT {} FROM questoes WHERE ativo = 1 ORDER BY id".format(", ".join(COLUNAS))
+
+# Campos com índice secundário (valor -> tupla de ids em ordem crescente)
+FACETAS = ("disciplina", "materia", "banca", "dificuldade")
+
+# Colunas gravadas pelas tuplas de importação (mesma ordem de COLUNAS, sem id)
+COLUNAS_REGISTRO = COLUNAS[1:]
+
+# Colunas de controle da importação incremental, criadas em bancos antigos
+COLUNAS_CONTROLE = (
+    ("hash_conteudo", "TEXT"),
+    ("hash_linha", "TEXT"),
+    ("ativo", "INTEGER NOT NULL DEFAULT 1"),
+)
+
+# Intervalo mínimo entre duas verificações de mudança no arquivo
+INTERVALO_VERIFICACAO = 1.0
+
+# mmap da conexão de leitura do arquivo publicado (questoes_publicadas.py)
+MMAP_PUBLICADO = 256 * 1024 * 1024
+
+
+class Questao(NamedTuple):
+    id: int
+    disciplina: str
+    materia: str
+    dificuldade: Optional[str]
+    enunciado: str
+    alternativas: dict
+    resposta_correta: str
+    justificativa: Optional[str]
+    dica: Optional[str]
+    formula: Optional[str]
+    banca: Optional[str]
+
+    def como_dict(self):
+        return self._asdict()
+
+
+def _texto_faceta(valor):
+    return sys.intern(valor) if isinstance(valor, str) else valor
+
+
+def decodificar_alternativas(questao_id, bruto):
+    try:
+        return json.loads(bruto)
+    except (TypeError, ValueError):
+        print(f"Aviso: alternativas inválidas na questão {questao_id}")
+        return {}
+
+
+class BancoQuestoes:
+    """Conjunto imutável de questões indexado por id e por faceta."""
+
+    def __init__(self, questoes, versao, taxonomia=None):
+        self.por_id = {q.id: q for q in questoes}
+        ids = tuple(sorted(self.por_id))
+        indices = {campo: {} for campo in FACETAS}
+        for questao_id in ids:
+            q = self.por_id[questao_id]
+            for campo in FACETAS:
+                indices[campo].setdefault(getattr(q, campo), []).append(questao_id)
+        indices = {
+            campo: {valor: tuple(ids) for valor, ids in valores.items()}
+            for campo, valores in indices.items()
+        }
+        self._montar(versao, taxonomia, ids, indices)
+
+    def _montar(self, versao, taxonomia, ids, indices):
+        self.versao = versao
+        self.taxonomia = taxonomia if taxonomia is not None else Taxonomia([])
+        self.ids = ids
+        self.indices = indices
+        self.gabarito = Gabarito(
+            ((questao_id, resposta, (disciplina, banca))
+             for questao_id, disciplina, _, _, banca, resposta in self.linhas_indice()),
+            ids)
+        self.amostragem = IndiceAmostragem.de_linhas(
+            (questao_id, disciplina, banca) for questao_id, disciplina, _, _, banca, _ in self.linhas_indice())
+
+    def __len__(self):
+        return len(self.ids)
+
+    def questao(self, questao_id):
+        return self.por_id.get(questao_id)
+
+    def linhas_indice(self):
+        """(id, disciplina, materia, dificuldade, banca, resposta_correta) em ordem de id."""
+        for questao_id in self.ids:
+            q = self.por_id[questao_id]
+            yield questao_id, q.disciplina, q.materia, q.dificuldade, q.banca, q.resposta_correta
+
+    def ids_por(self, campo, valor):
+        return self.indices[campo].get(valor, ())
+
+    def valores(self, campo):
+        return self.indices[campo].keys()
+
+    @cached_property
+    def mapa_desempenho(self):
+        return MapaDesempenho(self)
+
+    @cached_property
+    def catalogo(self):
+        # Montado no primeiro uso de cada snapshot
+        return CuboFacetas.de_banco(self)
+
+
+class BancoQuestoesMapeado(BancoQuestoes):
+    """Snapshot sobre um arquivo de ``banco_binario``: ids e índices por faceta
+    são views do mmap e cada questão é lida do arquivo quando pedida."""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self._montar(arquivo.versao, Taxonomia(arquivo.taxonomia), arquivo.ids, arquivo.indices)
+
+    def questao(self, questao_id):
+        return self.arquivo.questao(questao_id)
+
+    def linhas_indice(self):
+        return self.arquivo.linhas_indice()
+
+
+def carregar_banco(conn):
+    cursor = conn.execute(SQL_CARGA)
+    assinatura = hashlib.blake2b(digest_size=8)
+    questoes = []
+    for row in cursor:
+        row = tuple(row)
+        assinatura.update(repr(row).encode("utf-8"))
+        questao_id, disciplina, materia, dificuldade, enunciado, alternativas, resposta, justificativa, dica, formula, banca = row
+        questoes.append(Questao(
+            questao_id,
+            _texto_faceta(disciplina),
+            _texto_faceta(materia),
+            _texto_faceta(dificuldade),
+            enunciado,
+            decodificar_alternativas(questao_id, alternativas),
+            resposta,
+            justificativa,
+            dica,
+            formula,
+            _texto_faceta(banca),
+        ))
+    try:
+        taxonomia = carregar_taxonomia(conn)
+    except sqlite3.OperationalError:
+        # Banco ainda sem as tabelas de taxonomia (criadas pelo setup_db)
+        taxonomia = None
+    return BancoQuestoes(questoes, assinatura.hexdigest(), taxonomia)
+
+
+TRIGGERS_VERSAO = {
+    nome: """
+    CREATE TRIGGER IF NOT EXISTS {} AFTER {} ON questoes
+    BEGIN UPDATE versao_banco SET versao = versao + 1 WHERE id = 1; END
+    """.format(nome, evento)
+    for nome, evento in (('trg_questoes_versao_insert', 'INSERT'),
+                         ('trg_questoes_versao_update', 'UPDATE'),
+                         ('trg_questoes_versao_delete', 'DELETE'))
+}
+
+
+def criar_controle_versao(conn):
+    # Contador incrementado por trigger a cada escrita em ``questoes``. Commits
+    # em outras tabelas (resultados, desempenho_materia) também mudam o
+    # data_version do arquivo, mas não devem reconstruir o snapshot.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS versao_banco (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        versao INTEGER NOT NULL
+    )
+    """)
+    conn.execute("INSERT OR IGNORE INTO versao_banco (id, versao) VALUES (1, 0)")
+    for sql in TRIGGERS_VERSAO.values():
+        conn.execute(sql)
+    conn.commit()
+
+
+def suspender_controle_versao(cursor):
+    """Remove os triggers de versão dentro da transação corrente.
+
+    Para cargas em massa: um único ``incrementar_versao`` substitui um UPDATE
+    por linha. DDL no SQLite é transacional, então um rollback devolve os
+    triggers. Chame ``restaurar_controle_versao`` antes do commit.
+    """
+    for nome in TRIGGERS_VERSAO:
+        cursor.execute("DROP TRIGGER IF EXISTS {}".format(nome))
+
+
+def incrementar_versao(cursor):
+    cursor.execute("UPDATE versao_banco SET versao = versao + 1 WHERE id = 1")
+
+
+def restaurar_controle_versao(cursor):
+    for sql in TRIGGERS_VERSAO.values():
+        cursor.execute(sql)
+
+
+def _normalizar(texto):
+    return " ".join(unicodedata.normalize("NFC", texto or "").split())
+
+
+def hashes_registro(registro):
+    """(hash_conteudo, hash_linha) de uma tupla na ordem de COLUNAS_REGISTRO.
+
+    ``hash_conteudo`` identifica a questão (enunciado, alternativas e resposta
+    normalizados) e não muda com edições de matéria, dica etc.;
+    ``hash_linha`` cobre todas as colunas e detecta essas edições.
+    """
+    _, _, _, enunciado, alternativas, resposta = registro[:6]
+    try:
+        itens = sorted(json.loads(alternativas).items())
+    except (TypeError, ValueError, AttributeError):
+        itens = [("", alternativas)]
+    conteudo = "\x1f".join(
+        [_normalizar(enunciado)]
+        + ["{}={}".format(letra, _normalizar(texto)) for letra, texto in itens]
+        + [_normalizar(resposta).lower()]
+    )
+    return (
+        hashlib.blake2b(conteudo.encode("utf-8"), digest_size=16).hexdigest(),
+        hashlib.blake2b(repr(tuple(registro)).encode("utf-8"), digest_size=16).hexdigest(),
+    )
+
+
+def preparar_controle_conteudo(conn):
+    """Cria as colunas de hash/ativo em bancos antigos e preenche os hashes."""
+    existentes = {row[1] for row in conn.execute("PRAGMA table_info(questoes)")}
+    for nome, definicao in COLUNAS_CONTROLE:
+        if nome not in existentes:
+            conn.execute("ALTER TABLE questoes ADD COLUMN {} {}".format(nome, definicao))
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questoes_hash_conteudo ON questoes (hash_conteudo)")
+    pendentes = conn.execute("SELECT id, {} FROM questoes WHERE hash_conteudo IS NULL".format(
+        ", ".join(COLUNAS_REGISTRO))).fetchall()
+    if pendentes:
+        # Os hashes não aparecem no snapshot: nada de incrementar a versão
+        conn.commit()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        suspender_controle_versao(cursor)
+        cursor.executemany("UPDATE questoes SET hash_conteudo = ?, hash_linha = ? WHERE id = ?",
+                           [hashes_registro(row[1:]) + (row[0],) for row in pendentes])
+        restaurar_controle_versao(cursor)
+    conn.commit()
+
+
+class FonteBancoQuestoes:
+    """Entrega o snapshot atual e o reconstrói quando o arquivo muda.
+
+    Com ``imutavel=True`` o arquivo é um banco publicado, que nunca muda no
+    lugar: é aberto com ``immutable=1`` e só um inode novo indica mudança.
+    Com ``binario=True`` também, o snapshot vem do ``questoes.bin`` mapeado
+    em memória quando ele corresponde à mesma ``versao_banco``.
+    """
+
+    def __init__(self, caminho, intervalo_verificacao=INTERVALO_VERIFICACAO, imutavel=False, binario=False):
+        self.caminho = caminho
+        self.intervalo_verificacao = intervalo_verificacao
+        self.imutavel = imutavel
+        self.binario = binario and imutavel and banco_binario.SUPORTADO
+        self._banco = None
+        self._conn = None
+        self._inode = None
+        self._marca = None
+        self._ultima_verificacao = 0.0
+        self._lock = threading.Lock()
+        self.total_recargas = 0
+
+    def _conexao_observadora(self):
+        try:
+            inode = os.stat(self.caminho).st_ino
+        except OSError:
+            inode = None
+        # Arquivo substituído: a conexão antiga continuaria vendo o inode velho
+        if self._conn is not None and inode != self._inode:
+            self._conn.close()
+            self._conn = None
+        if self._conn is None:
+            if self.imutavel:
+                self._conn = questoes_publicadas.conectar(self.caminho)
+                self._conn.execute("PRAGMA mmap_size = {}".format(MMAP_PUBLICADO))
+            else:
+                self._conn = sqlite3.connect(self.caminho, check_same_thread=False)
+                self._conn.execute("PRAGMA query_only = ON")
+            self._inode = inode
+        return self._conn
+
+    def _marca_atual(self, conn):
+        try:
+            return (self._inode, "versao", conn.execute("SELECT versao FROM versao_banco WHERE id = 1").fetchone()[0])
+        except sqlite3.OperationalError:
+            # Banco sem o contador: qualquer commit no arquivo conta como mudança
+            return (self._inode, "data_version", conn.execute("PRAGMA data_version").fetchone()[0])
+
+    def _carregar_binario(self, marca):
+        caminho = questoes_publicadas.caminho_binario(self.caminho)
+        if marca[1] != "versao" or not os.path.exists(caminho):
+            return None
+        try:
+            arquivo = banco_binario.ArquivoQuestoes(caminho)
+        except (OSError, ValueError) as e:
+            print(f"Aviso: {caminho} ignorado ({e}); carregando do SQLite.")
+            return None
+        # Arquivo de outra publicação (ainda não trocada ou já substituída)
+        if arquivo.versao_banco != marca[2]:
+            return None
+        return BancoQuestoesMapeado(arquivo)
+
+    def _recarregar_se_mudou(self):
+        conn = self._conexao_observadora()
+        marca = self._marca_atual(conn)
+        if self._banco is None or marca != self._marca:
+            banco = self._carregar_binario(marca) if self.binario else None
+            if banco is None:
+                banco = carregar_banco(conn)
+            if conn.in_transaction:
+                conn.rollback()
+            self._banco = banco
+            self.total_recargas += 1
+        self._marca = marca
+        self._ultima_verificacao = time.monotonic()
+
+    def atual(self):
+        banco = self._banco
+        if banco is not None and time.monotonic() - self._ultima_verificacao < self.intervalo_verificacao:
+            return banco
+        if banco is None:
+            with self._lock:
+                if self._banco is None:
+                    try:
+                        self._recarregar_se_mudou()
+                    except (OSError, sqlite3.Error) as e:
+                        # Sem snapshot anterior para continuar servindo
+                        raise questoes_publicadas.BancoIndisponivel(str(e)) from e
+            return self._banco
+        # Só uma thread verifica/reconstrói; as demais seguem com o snapshot atual
+        if self._lock.acquire(blocking=False):
+            try:
+                self._recarregar_se_mudou()
+            except sqlite3.Error as e:
+                print(f"Erro ao recarregar banco de questões: {e}")
+                self._ultima_verificacao = time.monotonic()
+            finally:
+                self._lock.release()
+        return self._banco
+
+    def invalidar(self):
+        self._ultima_verificacao = 0.0
+        self._marca = None
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Escalonamento do sorteio de simulados: ORDER BY RANDOM() versus
+IndiceAmostragem (baldes por disciplina/banca + busca só dos k ids).
+
+Gera bancos sintéticos em um diretório temporário com 400, 100 mil e
+1 milhão de questões (ou os tamanhos passados na linha de comando).
+
+Uso: python benchmark_amostragem.py [tamanho ...]
+"""
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from amostragem import IndiceAmostragem
+
+TAMANHOS_PADRAO = (400, 100_000, 1_000_000)
+DISCIPLINAS = ["Disciplina {:02d}".format(i) for i in range(30)]
+BANCAS = ["", "FGV", "CESPE", "VUNESP", "FCC"]
+FILTRO_DISCIPLINAS = DISCIPLINAS[:6]
+K = 10
+REPETICOES = 20
+
+
+def gerar_banco(caminho, tamanho):
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("""
+    CREATE TABLE questoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        disciplina TEXT NOT NULL,
+        materia TEXT NOT NULL,
+        dificuldade TEXT,
+        enunciado TEXT NOT NULL,
+        alternativas TEXT NOT NULL,
+        resposta_correta TEXT NOT NULL,
+        justificativa TEXT,
+        dica TEXT,
+        formula TEXT,
+        banca TEXT
+    )""")
+    rng = random.Random(42)
+    texto = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 6
+    alternativas = json.dumps({letra: texto[:80] for letra in "abcde"})
+
+    def linhas():
+        for i in range(tamanho):
+            yield (rng.choice(DISCIPLINAS), "Matéria", "Médio", texto + str(i), alternativas,
+                   "a", texto, "", "", rng.choice(BANCAS))
+
+    conn.executemany("""
+    INSERT INTO questoes (disciplina, materia, dificuldade, enunciado, alternativas,
+                          resposta_correta, justificativa, dica, formula, banca)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", linhas())
+    conn.commit()
+    return conn
+
+
+def cronometrar(funcao, repeticoes=REPETICOES):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def medir(conn, tamanho):
+    placeholders = ','.join('?' * len(FILTRO_DISCIPLINAS))
+
+    def order_by_random():
+        conn.execute(
+            "SELECT * FROM questoes WHERE disciplina IN ({}) AND banca = ? ORDER BY RANDOM() LIMIT ?".format(placeholders),
+            FILTRO_DISCIPLINAS + ["FGV", K],
+        ).fetchall()
+
+    inicio = time.perf_counter()
+    indice = IndiceAmostragem.de_linhas(conn.execute("SELECT id, disciplina, banca FROM questoes"))
+    construcao = (time.perf_counter() - inicio) * 1000
+
+    def amostrador():
+        ids = indice.selecionar(FILTRO_DISCIPLINAS, "FGV").amostrar(K)
+        conn.execute("SELECT * FROM questoes WHERE id IN ({})".format(','.join('?' * len(ids))), ids).fetchall()
+
+    def so_sorteio():
+        indice.selecionar(FILTRO_DISCIPLINAS, "FGV").amostrar(K)
+
+    repeticoes = max(3, min(REPETICOES, 2_000_000 // tamanho))
+    print("{:>9} questões | ORDER BY RANDOM() {:9.3f} ms | amostrador+busca {:7.3f} ms | "
+          "só sorteio {:7.3f} ms | construção do índice {:9.1f} ms".format(
+              tamanho,
+              cronometrar(order_by_random, repeticoes),
+              cronometrar(amostrador),
+              cronometrar(so_sorteio),
+              construcao))
+
+
+def main():
+    tamanhos = [int(t) for t in sys.argv[1:]] or TAMANHOS_PADRAO
+    diretorio = tempfile.mkdtemp(prefix='bench_amostragem_')
+    try:
+        for tamanho in tamanhos:
+            caminho = os.path.join(diretorio, "questoes_{}.db".format(tamanho))
+            conn = gerar_banco(caminho, tamanho)
+            medir(conn, tamanho)
+            conn.close()
+            os.remove(caminho)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
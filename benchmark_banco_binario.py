@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Memória por worker e latência de leitura das questões, por tamanho de banco.
+
+Para cada tamanho, gera um banco sintético, publica ``questoes.db`` +
+``questoes.bin`` (questoes_publicadas.py) e mede, cada modo num processo
+novo (como um worker do gunicorn):
+
+* ``snapshot``: ``carregar_banco`` do arquivo publicado (QUESTOES_MMAP=0);
+* ``mmap``: ``BancoQuestoesMapeado`` sobre o ``questoes.bin``;
+* ``consulta``: sem snapshot, um ``SELECT ... WHERE id = ?`` por leitura.
+
+RSS anônimo é a memória privada do processo; as páginas do arquivo mapeado
+(RSS de arquivo) ficam no page cache e são compartilhadas entre workers.
+
+Uso: python benchmark_banco_binario.py [tamanho ...]   (padrão: 400 10000 100000)
+"""
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import questoes_publicadas
+from importar_questoes import carregar_registros, criar_tabelas, gerar_registros
+
+CABECALHO = ['disciplina', 'materia', 'dificuldade', 'enunciado', 'alternativa_a', 'alternativa_b',
+             'alternativa_c', 'alternativa_d', 'alternativa_e', 'resposta_correta', 'justificativa',
+             'dica', 'formula', 'banca']
+
+LEITURAS = 20000
+MODOS = ("snapshot", "mmap", "consulta")
+
+
+def linhas_sinteticas(total):
+    for i in range(total):
+        yield CABECALHO, [
+            "Disciplina {}".format(i % 30), "Matéria {}".format(i % 200), ("Fácil", "Média", "Difícil")[i % 3],
+            "Enunciado sintético da questão número {}: ".format(i) + "texto de apoio " * 40,
+            "Alternativa A da questão {}".format(i), "Alternativa B", "Alternativa C", "Alternativa D",
+            "Alternativa E",
+            "abcde"[i % 5], "Justificativa da questão {}. ".format(i) + "explicação " * 30, "Dica", "",
+            ("FGV", "CESPE", "FCC")[i % 3],
+        ]
+
+
+def preparar_banco(diretorio, total):
+    caminho_db = os.path.join(diretorio, 'database.db')
+    conn = sqlite3.connect(caminho_db)
+    criar_tabelas(conn)
+    carregar_registros(conn, gerar_registros(linhas_sinteticas(total)))
+    destino = os.path.join(diretorio, questoes_publicadas.NOME_ARQUIVO)
+    questoes_publicadas.publicar(conn, destino)
+    conn.close()
+    return destino
+
+
+def memoria_kb():
+    campos = {}
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                nome, _, valor = linha.partition(':')
+                if nome in ('VmRSS', 'RssAnon', 'RssFile'):
+                    campos[nome] = int(valor.split()[0])
+    except OSError:
+        import resource
+        campos['VmRSS'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return campos
+
+
+def medir(modo, caminho):
+    """Roda no processo filho: carrega o banco e faz LEITURAS aleatórias."""
+    from banco_questoes import FonteBancoQuestoes
+    antes = memoria_kb()
+    inicio = time.perf_counter()
+    if modo == 'consulta':
+        conn = questoes_publicadas.conectar(caminho)
+        ids = [row[0] for row in conn.execute("SELECT id FROM questoes")]
+
+        def ler(questao_id):
+            return conn.execute("SELECT * FROM questoes WHERE id = ?", (questao_id,)).fetchone()
+    else:
+        banco = FonteBancoQuestoes(caminho, imutavel=True, binario=(modo == 'mmap')).atual()
+        ids = banco.ids
+
+        def ler(questao_id):
+            return banco.questao(questao_id).como_dict()
+    carga = time.perf_counter() - inicio
+
+    rng = random.Random(7)
+    amostra = [ids[rng.randrange(len(ids))] for _ in range(LEITURAS)]
+    inicio = time.perf_counter()
+    for questao_id in amostra:
+        ler(questao_id)
+    leitura = time.perf_counter() - inicio
+    depois = memoria_kb()
+    return {
+        "carga_s": carga,
+        "leitura_us": leitura / LEITURAS * 1e6,
+        "rss_mb": (depois.get('VmRSS', 0) - antes.get('VmRSS', 0)) / 1024,
+        "anon_mb": (depois.get('RssAnon', 0) - antes.get('RssAnon', 0)) / 1024,
+        "arquivo_mb": (depois.get('RssFile', 0) - antes.get('RssFile', 0)) / 1024,
+    }
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--medir':
+        print(json.dumps(medir(sys.argv[2], sys.argv[3])))
+        return
+
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [400, 10000, 100000]
+    print("{:>9} {:>9} {:>8} {:>10} {:>9} {:>9} {:>10}".format(
+        "questões", "modo", "carga s", "leitura µs", "RSS MB", "anon MB", "arquivo MB"))
+    for total in tamanhos:
+        diretorio = tempfile.mkdtemp(prefix='bench_binario_')
+        try:
+            caminho = preparar_banco(diretorio, total)
+            for modo in MODOS:
+                saida = subprocess.run([sys.executable, os.path.abspath(__file__), '--medir', modo, caminho],
+                                       check=True, capture_output=True, text=True).stdout
+                r = json.loads(saida.strip().splitlines()[-1])
+                print("{:>9} {:>9} {:>8.2f} {:>10.1f} {:>9.1f} {:>9.1f} {:>10.1f}".format(
+                    total, modo, r['carga_s'], r['leitura_us'], r['rss_mb'], r['anon_mb'], r['arquivo_mb']))
+        finally:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
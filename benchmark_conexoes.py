@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Compara a latência por requisição de get_questao e responder_questao
+abrindo uma conexão nova a cada requisição (get_db() antigo) versus o
+GerenciadorConexoes com conexões persistentes.
+
+Uso: python benchmark_conexoes.py [repeticoes]
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from conexoes import ConexoesPorRequisicao, GerenciadorConexoes
+from sessao_simulado import EstadoSimulado
+
+# Importado em main(), depois de apontar DATABASE_PATH para uma cópia do banco
+aplicacao = None
+
+
+def medir(cliente, metodo, url, repeticoes, payload=None):
+    tempos = []
+    for i in range(repeticoes):
+        corpo = payload(i) if callable(payload) else payload
+        inicio = time.perf_counter()
+        if metodo == 'GET':
+            resposta = cliente.get(url)
+        else:
+            resposta = cliente.post(url, json=corpo)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        if resposta.status_code >= 500:
+            raise RuntimeError(resposta.get_json())
+    tempos.sort()
+    return statistics.mean(tempos), tempos[len(tempos) // 2], tempos[int(len(tempos) * 0.99) - 1]
+
+
+def rodar_cenario(nome, gerenciador, repeticoes):
+    aplicacao.conexoes = gerenciador
+    if hasattr(aplicacao.armazem_sessoes, 'conexoes'):
+        aplicacao.armazem_sessoes.conexoes = gerenciador
+    cliente = aplicacao.app.test_client()
+    areas = list(aplicacao.banco_questoes.atual().taxonomia.areas)
+    inicio = cliente.post('/api/simulado/iniciar', json={"areas": areas, "quantidade": "10"}).get_json()
+    total = inicio["total_questoes"]
+
+    resultado_get = medir(cliente, 'GET', '/api/simulado/questao/{}'.format(total // 2), repeticoes)
+
+    # responder_questao recusa respostas repetidas, então cada iteração
+    # reinicia as respostas do simulado no armazém antes de medir.
+    questao_id = inicio['questao']['id']
+    with cliente.session_transaction() as sessao:
+        sid = sessao['simulado_sid']
+
+    def payload(_):
+        estado = EstadoSimulado.de_bytes(aplicacao.armazem_sessoes.obter(sid))
+        estado.respostas = bytearray(estado.total)
+        aplicacao.armazem_sessoes.salvar(sid, estado.para_bytes())
+        return {"questao_id": questao_id, "alternativa": "a"}
+
+    resultado_responder = medir(cliente, 'POST', '/api/simulado/responder', repeticoes, payload)
+    gerenciador.fechar_todas()
+
+    print("\n== {} ({} aberturas de conexão) ==".format(nome, gerenciador.total_aberturas))
+    for rota, (media, p50, p99) in (("get_questao", resultado_get), ("responder_questao", resultado_responder)):
+        print("{:<20} média {:7.3f} ms | p50 {:7.3f} ms | p99 {:7.3f} ms".format(rota, media, p50, p99))
+
+
+def main():
+    global aplicacao
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    diretorio = tempfile.mkdtemp(prefix='bench_conexoes_')
+    try:
+        caminho = os.path.join(diretorio, 'database.db')
+        shutil.copy(os.environ.get('DATABASE_PATH', 'database.db'), caminho)
+        os.environ['DATABASE_PATH'] = caminho
+        import app as aplicacao
+        rodar_cenario("conexão por requisição", ConexoesPorRequisicao(caminho, pragmas=(), cached_statements=128), repeticoes)
+        rodar_cenario("conexões persistentes", GerenciadorConexoes(caminho), repeticoes)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Vazão da finalização de simulados, em simulados/s.
+
+Compara, numa cópia do banco:
+
+* o caminho antigo: ``SELECT ... WHERE id IN (...)`` por simulado, contagem
+  em Python e um INSERT por matéria, com commit a cada simulado;
+* ``correcao.corrigir`` + ``correcao.gravar`` por simulado (o que
+  ``/api/simulado/finalizar`` faz hoje);
+* ``correcao.corrigir_lote`` + um único ``gravar`` para todos (a API de
+  ``/api/simulado/finalizar-lote``).
+
+Uso: python benchmark_correcao.py [simulados] [questoes_por_simulado]
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import agregados
+import correcao
+import taxonomia
+from banco_questoes import carregar_banco, criar_controle_versao, preparar_controle_conteudo
+
+
+def finalizar_antigo(conn, ids, alternativas, gabarito, area_da_disciplina):
+    cursor = conn.cursor()
+    placeholders = ','.join('?' * len(ids))
+    cursor.execute("SELECT id, disciplina, materia, banca, dificuldade FROM questoes WHERE id IN ({})"
+                   .format(placeholders), ids)
+    acertos_por_id = {questao_id: alternativa == gabarito.resposta(questao_id)
+                      for questao_id, alternativa in zip(ids, alternativas)}
+    total_acertos = 0
+    por_materia = defaultdict(lambda: {'acertos': 0, 'total': 0})
+    desempenho = defaultdict(lambda: [0, 0])
+    for questao_id, disciplina, materia, banca, dificuldade in cursor.fetchall():
+        chave = (area_da_disciplina.get(disciplina, ''), disciplina, materia, banca, dificuldade)
+        por_materia[materia]['total'] += 1
+        desempenho[chave][1] += 1
+        if acertos_por_id[questao_id]:
+            total_acertos += 1
+            por_materia[materia]['acertos'] += 1
+            desempenho[chave][0] += 1
+    percentual = round(total_acertos / len(ids) * 100, 2)
+    cursor.execute("INSERT INTO resultados (total_questoes, total_acertos, percentual) VALUES (?, ?, ?)",
+                   (len(ids), total_acertos, percentual))
+    resultado_id = cursor.lastrowid
+    for materia, stats in por_materia.items():
+        cursor.execute("INSERT INTO desempenho_materia (resultado_id, materia, acertos, total) VALUES (?, ?, ?, ?)",
+                       (resultado_id, materia, stats['acertos'], stats['total']))
+    agregados.registrar_resultado(cursor, resultado_id, len(ids), total_acertos, percentual, desempenho)
+    conn.commit()
+
+
+def medir(nome, simulados, funcao):
+    inicio = time.perf_counter()
+    funcao()
+    segundos = time.perf_counter() - inicio
+    print("{:<34} {:8.3f} s  {:10,.0f} simulados/s".format(nome, segundos, len(simulados) / segundos))
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    por_simulado = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    diretorio = tempfile.mkdtemp(prefix='bench_correcao_')
+    try:
+        caminho = os.path.join(diretorio, 'database.db')
+        shutil.copy(os.environ.get('DATABASE_PATH', 'database.db'), caminho)
+        conn = sqlite3.connect(caminho)
+        # Mesmas migrações que o setup_db() do app aplica
+        criar_controle_versao(conn)
+        preparar_controle_conteudo(conn)
+        taxonomia.preparar(conn)
+        area_da_disciplina = taxonomia.carregar_taxonomia(conn).area_da_disciplina
+        agregados.preparar(conn, area_da_disciplina)
+        banco = carregar_banco(conn)
+        rng = random.Random(42)
+        letras = "abcde"
+        simulados = []
+        for _ in range(quantidade):
+            ids = rng.sample(banco.ids, min(por_simulado, len(banco)))
+            simulados.append((ids, [rng.choice(letras) for _ in ids]))
+        print("{} simulados de {} questões, banco com {} questões\n".format(quantidade, por_simulado, len(banco)))
+
+        def antigo():
+            for ids, alternativas in simulados:
+                finalizar_antigo(conn, ids, alternativas, banco.gabarito, area_da_disciplina)
+
+        def um_a_um():
+            for ids, alternativas in simulados:
+                resultado = correcao.corrigir(banco, ids, correcao.empacotar_respostas(banco.gabarito, ids, alternativas))
+                correcao.gravar(conn.cursor(), [resultado])
+                conn.commit()
+
+        def em_lote():
+            resultados = correcao.corrigir_lote(banco, simulados)
+            correcao.gravar(conn.cursor(), resultados)
+            conn.commit()
+
+        medir("caminho antigo (SQL por simulado)", simulados, antigo)
+        medir("corrigir + gravar por simulado", simulados, um_a_um)
+        medir("corrigir_lote + gravar único", simulados, em_lote)
+        conn.close()
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
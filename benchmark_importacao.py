@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Importa um CSV sintético (1 milhão de linhas por padrão) com o motor de
+importar_questoes.py e mostra linhas/s e o pico de memória do processo.
+Depois reimporta o mesmo arquivo no modo incremental, que não deve alterar
+nenhuma linha nem a versão do banco.
+
+Uso: python benchmark_importacao.py [linhas]
+"""
+import csv
+import os
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from importar_questoes import (carregar_registros, criar_tabelas, gerar_registros, ler_csv, relatar,
+                               relatar_sincronizacao, sincronizar_registros)
+
+CABECALHO = ['disciplina', 'materia', 'dificuldade', 'enunciado', 'alternativa_a', 'alternativa_b',
+             'alternativa_c', 'alternativa_d', 'alternativa_e', 'resposta_correta', 'justificativa',
+             'dica', 'formula', 'banca']
+
+
+def gerar_csv(caminho, linhas):
+    with open(caminho, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.writer(f, delimiter=';')
+        escritor.writerow(CABECALHO)
+        for i in range(linhas):
+            escritor.writerow([
+                "Disciplina {}".format(i % 30), "Matéria {}".format(i % 200), "Médio",
+                "Enunciado sintético da questão número {} sobre concordância verbal.".format(i),
+                "Alternativa A", "Alternativa B", "Alternativa C", "Alternativa D", "",
+                "abcd"[i % 4], "Justificativa da questão {}.".format(i), "", "", "FGV" if i % 3 else "",
+            ])
+
+
+def memoria_pico_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    diretorio = tempfile.mkdtemp(prefix='bench_importacao_')
+    try:
+        caminho_csv = os.path.join(diretorio, 'questoes.csv')
+        caminho_db = os.path.join(diretorio, 'database.db')
+        gerar_csv(caminho_csv, linhas)
+        print("CSV sintético: {} linhas, {:.1f} MB".format(linhas, os.path.getsize(caminho_csv) / 2**20))
+        memoria_antes = memoria_pico_mb()
+
+        conn = sqlite3.connect(caminho_db)
+        criar_tabelas(conn)
+        total, segundos = carregar_registros(conn, gerar_registros(ler_csv(caminho_csv)))
+        relatar(total, segundos, caminho_csv, caminho_db)
+        print("Pico de memória do processo: {:.1f} MB (antes da importação: {:.1f} MB)".format(
+            memoria_pico_mb(), memoria_antes))
+
+        print("\nReimportação incremental do mesmo arquivo:")
+        versao_antes = conn.execute("SELECT versao FROM versao_banco").fetchone()[0]
+        alteracoes_antes = conn.total_changes
+        contagens, segundos = sincronizar_registros(conn, gerar_registros(ler_csv(caminho_csv)))
+        relatar_sincronizacao(contagens, segundos, caminho_csv, caminho_db)
+        versao_depois = conn.execute("SELECT versao FROM versao_banco").fetchone()[0]
+        print("Linhas alteradas: {}; versão do banco: {} -> {}".format(
+            conn.total_changes - alteracoes_antes, versao_antes, versao_depois))
+        conn.close()
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Busca textual nas questões com FTS5.
+
+O índice ``questoes_busca`` (enunciado, alternativas, justificativa e
+matéria) é montado por ``questoes_publicadas.publicar`` dentro do arquivo
+publicado, então acompanha cada importação sem triggers no banco de
+trabalho. O tokenizador ``unicode61 remove_diacritics 2`` ignora acentos e
+maiúsculas: "crase", "Crase" e "CRASE" casam, assim como "licitação" e
+"licitacao".
+
+Os resultados vêm ordenados por bm25 e paginados por cursor (pontuação, id)
+em vez de OFFSET, então páginas seguintes não repetem nem pulam questões.
+"""
+import html
+import os
+import re
+import threading
+import unicodedata
+
+import questoes_publicadas
+
+TABELA = "questoes_busca"
+TOKENIZADOR = "unicode61 remove_diacritics 2"
+
+# Peso de cada coluna no bm25: enunciado, alternativas, justificativa, matéria
+PESOS = (4.0, 1.0, 2.0, 6.0)
+
+MARCA_INICIO, MARCA_FIM = "<mark>", "</mark>"
+# O snippet() marca os termos com caracteres de controle; o trecho é escapado
+# para HTML e só depois as marcas viram <mark>, então o texto da questão nunca
+# chega ao cliente como markup
+_SENTINELA_INICIO, _SENTINELA_FIM = "\x02", "\x03"
+TOKENS_TRECHO = 16
+MAXIMO_CONSULTAS_EM_CACHE = 256
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+
+# Palavras que só atrapalham numa busca como "questões sobre crase"
+PALAVRAS_VAZIAS = frozenset("""
+    a o as os um uma uns umas de da do das dos e ou em no na nos nas ao aos
+    para por pela pelo com sem sobre que qual quais questao questoes
+""".split())
+
+
+def indexar(cursor, esquema="main"):
+    """Cria e preenche o índice a partir de ``{esquema}.questoes`` (sem commit)."""
+    cursor.execute("CREATE VIRTUAL TABLE {0}.{1} USING fts5(enunciado, alternativas, justificativa, materia, "
+                   "tokenize = '{2}')".format(esquema, TABELA, TOKENIZADOR))
+    # Alternativas indexadas como texto corrido, sem as chaves do JSON
+    cursor.execute("""
+        INSERT INTO {0}.{1} (rowid, enunciado, alternativas, justificativa, materia)
+        SELECT id, enunciado,
+               CASE WHEN json_valid(alternativas)
+                    THEN (SELECT group_concat(value, ' ') FROM json_each(alternativas))
+                    ELSE alternativas END,
+               justificativa, materia
+        FROM {0}.questoes
+    """.format(esquema, TABELA))
+    cursor.execute("INSERT INTO {0}.{1} ({1}) VALUES ('optimize')".format(esquema, TABELA))
+
+
+def _sem_acentos(texto):
+    return "".join(c for c in unicodedata.normalize("NFD", texto) if not unicodedata.combining(c)).lower()
+
+
+def montar_consulta(texto):
+    """Converte o texto digitado numa consulta FTS5, ou None se não sobrar termo.
+
+    Cada palavra vira uma frase entre aspas (pontuação como em "14.133" não
+    quebra a sintaxe e casa com os tokens vizinhos "14 133"); a última também
+    casa por prefixo.
+    """
+    termos = []
+    for palavra in (texto or "").split():
+        palavra = palavra.strip(".,;:!?()[]{}'\"")
+        if not re.search(r"\w", palavra) or _sem_acentos(palavra) in PALAVRAS_VAZIAS:
+            continue
+        termos.append('"{}"'.format(palavra.replace('"', '""')))
+    if not termos:
+        return None
+    termos[-1] += "*"
+    return " ".join(termos)
+
+
+def trecho_html(trecho):
+    """Trecho do ``snippet()`` escapado, com os termos entre <mark>."""
+    if trecho is None:
+        return None
+    return html.escape(trecho).replace(_SENTINELA_INICIO, MARCA_INICIO).replace(_SENTINELA_FIM, MARCA_FIM)
+
+
+def _filtros(area, banca):
+    filtros, parametros = [], []
+    if area:
+        filtros.append("AND q.area_id = (SELECT id FROM areas WHERE nome = ?)")
+        parametros.append(area)
+    if banca:
+        filtros.append("AND q.banca = ?")
+        parametros.append(banca)
+    return " ".join(filtros), parametros
+
+
+def codificar_cursor(pontuacao, questao_id):
+    return "{!r}:{}".format(pontuacao, questao_id)
+
+
+def decodificar_cursor(cursor):
+    """(pontuação, id) de um cursor devolvido por ``buscar``; ValueError se inválido."""
+    pontuacao, _, questao_id = cursor.rpartition(":")
+    return float(pontuacao), int(questao_id)
+
+
+class BuscaQuestoes:
+    """Consultas no índice do arquivo publicado, uma conexão por thread.
+
+    A conexão é reaberta quando o arquivo é trocado por uma nova publicação
+    (inode diferente).
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ids_em_cache = {}
+
+    def _conexao(self):
+        try:
+            chave = (os.getpid(), os.stat(self.caminho).st_ino)
+        except FileNotFoundError as e:
+            raise questoes_publicadas.BancoIndisponivel(str(e)) from e
+        atual = getattr(self._local, "atual", None)
+        if atual is None or atual[0] != chave:
+            if atual is not None and atual[0][0] == chave[0]:
+                atual[1].close()
+            self._local.atual = atual = (chave, questoes_publicadas.conectar(self.caminho))
+        return atual[1]
+
+    def buscar(self, consulta, area=None, banca=None, limite=LIMITE_PADRAO, apos=None):
+        """Devolve ([(id, pontuação, trecho)], cursor da próxima página ou None).
+
+        ``consulta`` já no formato de ``montar_consulta``; ``apos`` é o cursor
+        recebido na página anterior.
+        """
+        filtros, parametros = _filtros(area, banca)
+        pontuacao, ultimo_id = apos if apos is not None else (float("-inf"), 0)
+        parametros = [consulta] + parametros + [pontuacao, pontuacao, ultimo_id, limite + 1]
+
+        linhas = self._conexao().execute("""
+            SELECT id, pontuacao, trecho FROM (
+                SELECT q.id AS id,
+                       bm25({tabela}, {pesos}) AS pontuacao,
+                       snippet({tabela}, -1, ?, ?, '…', {tokens}) AS trecho
+                FROM {tabela} JOIN questoes q ON q.id = {tabela}.rowid
+                WHERE {tabela} MATCH ? {filtros}
+            )
+            WHERE pontuacao > ? OR (pontuacao = ? AND id > ?)
+            ORDER BY pontuacao, id
+            LIMIT ?
+        """.format(tabela=TABELA, pesos=", ".join(map(str, PESOS)), tokens=TOKENS_TRECHO, filtros=filtros),
+            [_SENTINELA_INICIO, _SENTINELA_FIM] + parametros).fetchall()
+
+        proximo = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo = codificar_cursor(linhas[-1][1], linhas[-1][0])
+        return [(questao_id, pontuacao, trecho_html(trecho)) for questao_id, pontuacao, trecho in linhas], proximo
+
+    def ids(self, consulta, area=None, banca=None, maximo=LIMITE_MAXIMO):
+        """Ids dos ``maximo`` resultados mais relevantes.
+
+        Simulados montados de uma busca refazem a consulta a cada questão, então
+        o resultado fica em cache por publicação (inode do arquivo).
+        """
+        conn = self._conexao()
+        chave = (self._local.atual[0], consulta, area, banca, maximo)
+        ids = self._ids_em_cache.get(chave)
+        if ids is None:
+            filtros, parametros = _filtros(area, banca)
+            ids = tuple(row[0] for row in conn.execute("""
+                SELECT q.id FROM {tabela} JOIN questoes q ON q.id = {tabela}.rowid
+                WHERE {tabela} MATCH ? {filtros}
+                ORDER BY bm25({tabela}, {pesos}), q.id
+                LIMIT ?
+            """.format(tabela=TABELA, pesos=", ".join(map(str, PESOS)), filtros=filtros),
+                [consulta] + parametros + [maximo]))
+            with self._lock:
+                if len(self._ids_em_cache) >= MAXIMO_CONSULTAS_EM_CACHE:
+                    self._ids_em_cache.clear()
+                self._ids_em_cache[chave] = ids
+        return ids
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Cache de correções de redação endereçado pelo conteúdo.
+
+A chave é um hash de (tema, texto normalizado, versão da rubrica, modelo):
+reenviar a mesma redação, ainda que com espaços ou quebras de linha
+diferentes, devolve a correção já feita sem nova chamada ao modelo. Mudar o
+prompt (``redacao.VERSAO_RUBRICA``) ou o modelo muda a chave.
+
+As correções ficam na tabela ``correcoes_cache`` do ``database.db``, com
+um LRU em memória na frente. ``invalidar`` apaga por versão da rubrica e
+incrementa uma geração no banco; os outros processos a releem a cada
+``INTERVALO_GERACAO`` segundos e descartam o LRU quando ela muda.
+"""
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+LIMITE_MEMORIA = 256
+INTERVALO_GERACAO = 1.0
+
+
+def normalizar(texto):
+    """Texto em NFC com qualquer sequência de espaços reduzida a um espaço."""
+    return " ".join(unicodedata.normalize("NFC", texto).split())
+
+
+def chave(tema, texto, rubrica, modelo):
+    h = hashlib.blake2b(digest_size=20)
+    for parte in (normalizar(tema), normalizar(texto), rubrica, modelo):
+        h.update(parte.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class CacheCorrecoes:
+    def __init__(self, conexoes, limite_memoria=LIMITE_MEMORIA):
+        self.conexoes = conexoes
+        self.limite_memoria = limite_memoria
+        self._entradas = OrderedDict()      # chave -> (correção, duração da chamada original)
+        self._lock = threading.Lock()
+        self._geracao = None
+        self._geracao_lida_em = 0.0
+        self.acertos_memoria = 0
+        self.acertos_banco = 0
+        self.faltas = 0
+        self.segundos_poupados = 0.0
+
+    def preparar(self):
+        conn = self.conexoes.obter()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS correcoes_cache (
+            chave TEXT PRIMARY KEY,
+            rubrica TEXT NOT NULL,
+            modelo TEXT NOT NULL,
+            resultado TEXT NOT NULL,
+            duracao REAL NOT NULL,
+            criado_em REAL NOT NULL
+        ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_correcoes_cache_rubrica ON correcoes_cache (rubrica)")
+        conn.execute("CREATE TABLE IF NOT EXISTS correcoes_cache_geracao (id INTEGER PRIMARY KEY CHECK (id = 1), geracao INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO correcoes_cache_geracao (id, geracao) VALUES (1, 0)")
+        conn.commit()
+
+    def _conferir_geracao(self):
+        agora = time.monotonic()
+        if agora - self._geracao_lida_em < INTERVALO_GERACAO:
+            return
+        geracao = self.conexoes.obter().execute("SELECT geracao FROM correcoes_cache_geracao WHERE id = 1").fetchone()[0]
+        with self._lock:
+            if geracao != self._geracao:
+                self._entradas.clear()
+                self._geracao = geracao
+            self._geracao_lida_em = agora
+
+    def obter(self, chave):
+        """Correção guardada para a chave, ou None."""
+        self._conferir_geracao()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self._entradas.move_to_end(chave)
+                self.acertos_memoria += 1
+                self.segundos_poupados += entrada[1]
+                return entrada[0]
+
+        row = self.conexoes.obter().execute(
+            "SELECT resultado, duracao FROM correcoes_cache WHERE chave = ?", (chave,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.faltas += 1
+                return None
+            self.acertos_banco += 1
+            self.segundos_poupados += row[1]
+        correcao = json.loads(row[0])
+        self._lembrar(chave, correcao, row[1])
+        return correcao
+
+    def guardar(self, chave, rubrica, modelo, correcao, duracao):
+        conn = self.conexoes.obter()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO correcoes_cache (chave, rubrica, modelo, resultado, duracao, criado_em) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (chave, rubrica, modelo, json.dumps(correcao, ensure_ascii=False), duracao, time.time()))
+        self._lembrar(chave, correcao, duracao)
+
+    def _lembrar(self, chave, correcao, duracao):
+        with self._lock:
+            self._entradas[chave] = (correcao, duracao)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.limite_memoria:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, rubrica):
+        """Apaga as correções da versão de rubrica; devolve quantas."""
+        conn = self.conexoes.obter()
+        with conn:
+            removidas = conn.execute("DELETE FROM correcoes_cache WHERE rubrica = ?", (rubrica,)).rowcount
+            conn.execute("UPDATE correcoes_cache_geracao SET geracao = geracao + 1 WHERE id = 1")
+        with self._lock:
+            self._entradas.clear()
+            self._geracao_lida_em = 0.0
+        return removidas
+
+    def metricas(self):
+        por_rubrica = dict(self.conexoes.obter().execute(
+            "SELECT rubrica, COUNT(*) FROM correcoes_cache GROUP BY rubrica").fetchall())
+        with self._lock:
+            acertos = self.acertos_memoria + self.acertos_banco
+            consultas = acertos + self.faltas
+            return {
+                "entradas_memoria": len(self._entradas),
+                "limite_memoria": self.limite_memoria,
+                "entradas_por_rubrica": por_rubrica,
+                "acertos_memoria": self.acertos_memoria,
+                "acertos_banco": self.acertos_banco,
+                "faltas": self.faltas,
+                "taxa_acerto": round(acertos / consultas, 4) if consultas else None,
+                "latencia_poupada_s": round(self.segundos_poupados, 3),
+            }
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Respostas JSON pré-serializadas.
+
+``CacheRespostas``: o corpo de cada endpoint de catálogo é gerado uma vez
+por snapshot do banco de questões (ou uma vez por processo, para dados
+estáticos) e guardado já em bytes. O ETag é o hash desse corpo, então é o
+mesmo em todos os workers e só muda quando o conteúdo muda; requisições com
+``If-None-Match`` recebem 304 sem corpo.
+
+``CacheFragmentos``: JSON já codificado de cada questão, num LRU limitado
+por bytes, para as rotas do simulado emendarem os campos da sessão em volta
+sem recodificar a questão.
+"""
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+# Dados derivados do banco: navegadores e proxies reaproveitam por pouco
+# tempo e depois revalidam (304 na maioria das vezes)
+CACHE_CONTROL_BANCO = 'public, max-age=60, must-revalidate'
+CACHE_CONTROL_ESTATICO = 'public, max-age=86400'
+
+
+class CorpoPreCalculado:
+    __slots__ = ('corpo', 'etag')
+
+    def __init__(self, dados):
+        self.corpo = current_app.json.dumps(dados).encode('utf-8') + b'\n'
+        self.etag = hashlib.blake2b(self.corpo, digest_size=16).hexdigest()
+
+
+class CacheRespostas:
+    """Um corpo pré-calculado por endpoint, válido enquanto a chave não mudar.
+
+    A chave é o snapshot do banco (comparado por identidade e guardado por
+    weakref, para não segurar snapshots antigos na memória) ou None para
+    dados que nunca mudam durante o processo.
+    """
+
+    def __init__(self):
+        self._entradas = {}
+        self._lock = threading.Lock()
+
+    def _valida(self, entrada, chave):
+        if entrada is None:
+            return False
+        referencia, _ = entrada
+        return (referencia is None and chave is None) or (referencia is not None and referencia() is chave)
+
+    def corpo(self, nome, chave, gerar):
+        entrada = self._entradas.get(nome)
+        if not self._valida(entrada, chave):
+            # Gerado fora do lock: duas threads podem calcular o mesmo corpo
+            # na troca de snapshot, e qualquer um dos dois serve.
+            precalculado = CorpoPreCalculado(gerar())
+            entrada = (weakref.ref(chave) if chave is not None else None, precalculado)
+            with self._lock:
+                self._entradas[nome] = entrada
+        return entrada[1]
+
+    def responder(self, nome, chave, gerar, cache_control=CACHE_CONTROL_BANCO):
+        precalculado = self.corpo(nome, chave, gerar)
+        resposta = Response(precalculado.corpo, mimetype='application/json')
+        resposta.set_etag(precalculado.etag)
+        resposta.headers['Cache-Control'] = cache_control
+        return resposta.make_conditional(request)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+def codificar_emendado(valor):
+    """Codifica ``valor`` como JSON, copiando valores ``bytes`` sem recodificar.
+
+    Dicts e listas são percorridos; qualquer ``bytes`` dentro deles é tratado
+    como JSON já pronto (um fragmento de ``CacheFragmentos``).
+    """
+    if isinstance(valor, bytes):
+        return valor
+    if isinstance(valor, dict):
+        return b'{' + b','.join(
+            current_app.json.dumps(str(chave)).encode('utf-8') + b':' + codificar_emendado(item)
+            for chave, item in valor.items()
+        ) + b'}'
+    if isinstance(valor, list):
+        return b'[' + b','.join(codificar_emendado(item) for item in valor) + b']'
+    return current_app.json.dumps(valor).encode('utf-8')
+
+
+def resposta_emendada(dados):
+    return Response(codificar_emendado(dados) + b'\n', mimetype='application/json')
+
+
+# Custo aproximado de uma entrada além dos bytes do fragmento (chave, nó do
+# OrderedDict, objeto bytes)
+CUSTO_ENTRADA = 160
+
+
+class CacheFragmentos:
+    """LRU de (versão do banco, id da questão) -> JSON da questão em bytes."""
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_usados = 0
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, versao, questao):
+        chave = (versao, questao.id)
+        with self._lock:
+            fragmento = self._entradas.get(chave)
+            if fragmento is not None:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return fragmento
+            self.faltas += 1
+
+        fragmento = current_app.json.dumps(questao.como_dict()).encode('utf-8')
+        custo = len(fragmento) + CUSTO_ENTRADA
+        if custo > self.limite_bytes:
+            return fragmento
+        with self._lock:
+            if chave not in self._entradas:
+                self._entradas[chave] = fragmento
+                self.bytes_usados += custo
+                while self.bytes_usados > self.limite_bytes:
+                    _, antigo = self._entradas.popitem(last=False)
+                    self.bytes_usados -= len(antigo) + CUSTO_ENTRADA
+        return fragmento
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def metricas(self):
+        with self._lock:
+            return {"entradas": len(self._entradas), "bytes": self.bytes_usados,
+                    "limite_bytes": self.limite_bytes, "acertos": self.acertos, "faltas": self.faltas}
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Cubo de contagens de questões por área × disciplina × banca × dificuldade.
+
+O cubo é montado uma vez por snapshot do banco (``BancoQuestoes.catalogo``)
+e, como o snapshot é trocado a cada importação, acompanha o banco sem
+consultas extras. Só as combinações que existem são guardadas.
+
+``/api/catalogo`` envia o cubo em forma compacta (valores de cada dimensão
+mais as células como listas de índices), para o frontend recalcular
+"N questões" localmente conforme os filtros mudam.
+"""
+from collections import Counter
+
+DIMENSOES = ("area", "disciplina", "banca", "dificuldade")
+
+
+class CuboFacetas:
+    def __init__(self, celulas, taxonomia):
+        # celulas: {(area, disciplina, banca, dificuldade): quantidade}
+        self.celulas = dict(celulas)
+        self.taxonomia = taxonomia
+        self.total = sum(self.celulas.values())
+        self._dict = None
+
+    @classmethod
+    def de_banco(cls, banco):
+        taxonomia = banco.taxonomia
+        celulas = Counter(
+            (taxonomia.area(disciplina), disciplina or '', banca or '', dificuldade or '')
+            for _, disciplina, _, dificuldade, banca, _ in banco.linhas_indice()
+        )
+        return cls(celulas, taxonomia)
+
+    def _filtrar(self, filtros):
+        # filtros: {dimensao: conjunto de valores aceitos}; ausente = qualquer valor
+        posicoes = [(DIMENSOES.index(dimensao), set(valores)) for dimensao, valores in filtros.items()
+                    if valores is not None]
+        for chave, quantidade in self.celulas.items():
+            if all(chave[i] in aceitos for i, aceitos in posicoes):
+                yield chave, quantidade
+
+    def contar(self, **filtros):
+        return sum(quantidade for _, quantidade in self._filtrar(filtros))
+
+    def distribuicao(self, dimensao, **filtros):
+        i = DIMENSOES.index(dimensao)
+        contagem = Counter()
+        for chave, quantidade in self._filtrar(filtros):
+            contagem[chave[i]] += quantidade
+        return contagem
+
+    def compacto(self):
+        valores = {dimensao: sorted({chave[i] for chave in self.celulas}) for i, dimensao in enumerate(DIMENSOES)}
+        posicao = {dimensao: {valor: j for j, valor in enumerate(lista)} for dimensao, lista in valores.items()}
+        celulas = [[posicao[dimensao][chave[i]] for i, dimensao in enumerate(DIMENSOES)] + [quantidade]
+                   for chave, quantidade in sorted(self.celulas.items())]
+        return {"dimensoes": list(DIMENSOES), "valores": valores, "celulas": celulas}
+
+    def como_dict(self):
+        # O cubo é imutável: o dicionário é montado uma vez e reaproveitado
+        if self._dict is None:
+            self._dict = self._montar_dict()
+        return self._dict
+
+    def _montar_dict(self):
+        por_area = self.distribuicao("area")
+        areas = [{
+            "nome_area": area,
+            "disciplinas_incluidas": list(self.taxonomia.disciplinas(area)),
+            "total_questoes": total,
+        } for area, total in por_area.items() if area]
+        areas.sort(key=lambda x: x['total_questoes'], reverse=True)
+
+        bancas = [{"banca": banca, "total_questoes": total}
+                  for banca, total in self.distribuicao("banca").most_common() if banca]
+        dificuldades = [{"dificuldade": dificuldade, "total_questoes": total}
+                        for dificuldade, total in self.distribuicao("dificuldade").most_common() if dificuldade]
+
+        # Dificuldade por área e por banca, para os gráficos de distribuição
+        dificuldade_por_area = {}
+        dificuldade_por_banca = {}
+        for (area, _, banca, dificuldade), quantidade in self.celulas.items():
+            if not dificuldade:
+                continue
+            if area:
+                por_dificuldade = dificuldade_por_area.setdefault(area, {})
+                por_dificuldade[dificuldade] = por_dificuldade.get(dificuldade, 0) + quantidade
+            if banca:
+                por_dificuldade = dificuldade_por_banca.setdefault(banca, {})
+                por_dificuldade[dificuldade] = por_dificuldade.get(dificuldade, 0) + quantidade
+
+        return {
+            "total_questoes": self.total,
+            "areas": areas,
+            "bancas": bancas,
+            "dificuldades": dificuldades,
+            "dificuldade_por_area": dificuldade_por_area,
+            "dificuldade_por_banca": dificuldade_por_banca,
+            "cubo": self.compacto(),
+        }
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Cenários de falha do gateway de modelo (gateway_llm.py) com o cliente instável.
+
+Cada cenário monta um ``GatewayLLM`` sobre ``clientes_llm.ClienteInstavel``
+com o corretor local como reserva, dispara chamadas em paralelo e mostra os
+desfechos, o estado do disjuntor e as tentativas feitas:
+
+* ``lento``: toda chamada demora mais que o prazo;
+* ``intermitente``: 30% de erros transitórios, absorvidos pelas novas tentativas;
+* ``queda``: provedor fora do ar; o disjuntor abre, e depois da reabertura
+  a sondagem o fecha de novo;
+* ``saturado``: mais chamadas simultâneas que vagas no compartimento.
+
+Uso: python cenarios_gateway_llm.py [cenário ...]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gateway_llm
+from clientes_llm import ClienteInstavel, ClienteLocal, ErroLLM
+
+
+def disparar(gateway, chamadas, paralelas):
+    def uma(i):
+        try:
+            return gateway.responder("prompt {}".format(i))[1]
+        except ErroLLM as e:
+            return type(e).__name__
+    with ThreadPoolExecutor(paralelas) as executor:
+        return list(executor.map(uma, range(chamadas)))
+
+
+def gateway(nome, cliente, **opcoes):
+    # Cada cenário com seu próprio compartimento
+    cliente.nome = "instavel-{}".format(nome)
+    opcoes.setdefault("espera_base", 0.01)
+    return gateway_llm.GatewayLLM(cliente, ClienteLocal(), **opcoes)
+
+
+def lento():
+    g = gateway("lento", ClienteInstavel(taxa_lentidao=1.0, atraso_lento=1.0, semente=1), prazo=0.2)
+    return g, disparar(g, 8, 4)
+
+
+def intermitente():
+    g = gateway("intermitente", ClienteInstavel(taxa_erro=0.3, semente=2), limiar_falhas=50)
+    return g, disparar(g, 200, 8)
+
+
+def queda():
+    cliente = ClienteInstavel(semente=3)
+    g = gateway("queda", cliente, limiar_falhas=5, reabertura=0.3)
+    cliente.fora_do_ar()
+    respostas = disparar(g, 50, 4)
+    chamadas_na_queda = cliente.chamadas
+    cliente.restabelecer()
+    time.sleep(0.35)
+    respostas += disparar(g, 10, 1)
+    print("  chamadas ao provedor durante a queda: {} de {} pedidos".format(chamadas_na_queda, 50))
+    return g, respostas
+
+
+def saturado():
+    g = gateway("saturado", ClienteInstavel(taxa_lentidao=1.0, atraso_lento=0.5, semente=4),
+                concorrencia=2, prazo=0.3)
+    return g, disparar(g, 8, 8)
+
+
+CENARIOS = {"lento": lento, "intermitente": intermitente, "queda": queda, "saturado": saturado}
+
+
+def main():
+    for nome in sys.argv[1:] or list(CENARIOS):
+        print(nome)
+        g, respostas = CENARIOS[nome]()
+        m = g.metricas()
+        contagem = {}
+        for resposta in respostas:
+            contagem[resposta] = contagem.get(resposta, 0) + 1
+        print("  respostas por modelo: {}".format(contagem))
+        print("  tentativas: {}  disjuntor: {}  motivos da reserva: {}".format(
+            m["tentativas"], m["disjuntor"], m["motivos_reserva"]))
+        for desfecho, h in m["latencia"].items():
+            if h["total"]:
+                print("  {:>15}: {:>4} chamadas, média {:.1f} ms".format(desfecho, h["total"], h["soma_ms"] / h["total"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""Clientes de modelo de linguagem usados na correção de redações.
+
+Todo cliente expõe ``gerar(prompt, prazo=None) -> str`` e, para respostas
+em streaming, ``transmitir(prompt, prazo=None)``. ``ClienteGemini``
+chama a API do Google (pacote ``google-generativeai``, opcional);
+``ClienteHeuristico`` corrige localmente pelos indicadores do texto
+(pre_corretor.py); ``ClienteLocal`` devolve uma correção fixa derivada do
+hash do prompt, para testes e benchmarks;
+``ClienteInstavel`` é o local com lentidão e erros injetados, para exercitar
+o gateway (gateway_llm.py).
+
+    LLM_CLIENTE=gemini|heuristico|local|instavel
+    (padrão: gemini se GEMINI_API_KEY existir, senão heuristico)
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import pre_corretor
+from redacao import COMPETENCIAS
+
+
+class ErroLLM(Exception):
+    """Falha ao obter resposta do modelo.
+
+    ``transitorio`` diz se vale tentar de novo (rede, limite de taxa, 5xx).
+    """
+
+    def __init__(self, mensagem, transitorio=True):
+        super().__init__(mensagem)
+        self.transitorio = transitorio
+
+
+class ClienteLLM:
+    nome = "base"
+
+    @property
+    def identificador(self):
+        """Modelo que gera as respostas; entra na chave do cache de correções."""
+        return self.nome
+
+    def gerar(self, prompt, prazo=None):
+        raise NotImplementedError
+
+    def responder(self, prompt, prazo=None):
+        """(texto, identificador do modelo que respondeu)."""
+        return self.gerar(prompt, prazo), self.identificador
+
+    def transmitir(self, prompt, prazo=None):
+        """(identificador do modelo, iterador dos pedaços de texto da resposta).
+
+        Sem streaming no provedor, a resposta inteira vem num pedaço só.
+        """
+        return self.identificador, iter([self.gerar(prompt, prazo)])
+
+
+class ClienteGemini(ClienteLLM):
+    nome = "gemini"
+
+    def __init__(self, api_key, modelo="gemini-pro"):
+        try:
+            import google.generativeai as genai
+        except ImportError as e:
+            raise ErroLLM("Pacote google-generativeai não instalado.", transitorio=False) from e
+        genai.configure(api_key=api_key)
+        self.nome_modelo = modelo
+        self.modelo = genai.GenerativeModel(modelo)
+
+    @property
+    def identificador(self):
+        return "gemini:{}".format(self.nome_modelo)
+
+    def gerar(self, prompt, prazo=None):
+        try:
+            opcoes = {"timeout": prazo} if prazo is not None else None
+            return self.modelo.generate_content(prompt, request_options=opcoes).text
+        except Exception as e:
+            raise ErroLLM(str(e)) from e
+
+    def transmitir(self, prompt, prazo=None):
+        try:
+            opcoes = {"timeout": prazo} if prazo is not None else None
+            resposta = self.modelo.generate_content(prompt, stream=True, request_options=opcoes)
+        except Exception as e:
+            raise ErroLLM(str(e)) from e
+
+        def pedacos():
+            try:
+                for parte in resposta:
+                    yield parte.text
+            except Exception as e:
+                raise ErroLLM(str(e)) from e
+        return self.identificador, pedacos()
+
+
+class ClienteHeuristico(ClienteLLM):
+    """Pré-corretor local (pre_corretor.py) com a interface de cliente."""
+
+    nome = "heuristico"
+
+    @property
+    def identificador(self):
+        return "heuristico:{}".format(pre_corretor.VERSAO)
+
+    def gerar(self, prompt, prazo=None):
+        tema, texto = getattr(prompt, "tema", None), getattr(prompt, "texto", None)
+        if tema is None or texto is None:
+            raise ErroLLM("O corretor heurístico precisa de um prompt de redacao.montar_prompt.", transitorio=False)
+        return json.dumps(pre_corretor.avaliar(tema, texto), ensure_ascii=False)
+
+
+class ClienteLocal(ClienteLLM):
+    """Resposta no formato pedido pelo prompt, sempre a mesma para o mesmo prompt.
+
+    ``atraso`` (segundos) simula a latência de um modelo remoto; em
+    ``transmitir`` ele é distribuído entre pedaços de ``TAMANHO_PEDACO``
+    caracteres, como tokens chegando aos poucos.
+    """
+
+    nome = "local"
+    TAMANHO_PEDACO = 16
+
+    def __init__(self, atraso=0.0):
+        self.atraso = atraso
+
+    def gerar(self, prompt, prazo=None):
+        if self.atraso:
+            time.sleep(self.atraso)
+        return self._resposta(prompt)
+
+    def transmitir(self, prompt, prazo=None):
+        resposta = self._resposta(prompt)
+        pedacos = [resposta[i:i + self.TAMANHO_PEDACO] for i in range(0, len(resposta), self.TAMANHO_PEDACO)]
+
+        def gerar_pedacos():
+            for pedaco in pedacos:
+                if self.atraso:
+                    time.sleep(self.atraso / len(pedacos))
+                yield pedaco
+        return self.identificador, gerar_pedacos()
+
+    def _resposta(self, prompt):
+        semente = hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest()
+        notas = [12 + semente[i] % 9 for i in range(len(COMPETENCIAS))]
+        return json.dumps({
+            "nota_final": sum(notas),
+            "analise_competencias": [
+                {"competencia": competencia, "nota": nota,
+                 "comentario": "Avaliação automática local (sem modelo de linguagem)."}
+                for competencia, nota in zip(COMPETENCIAS, notas)
+            ],
+            "pontos_fortes": ["Estrutura organizada"],
+            "pontos_fracos": ["Repertório sociocultural limitado"],
+            "sugestoes_melhoria": ["Desenvolver mais os exemplos"],
+            "dicas_concursos": ["Revise a concordância verbal"],
+        }, ensure_ascii=False)
+
+
+class ClienteInstavel(ClienteLocal):
+    """``ClienteLocal`` que às vezes falha ou demora.
+
+    ``taxa_erro`` e ``taxa_lentidao`` são probabilidades por chamada; uma
+    chamada lenta dorme ``atraso_lento`` segundos. ``fora_do_ar()`` faz
+    toda chamada falhar até ``restabelecer()``.
+    """
+
+    nome = "instavel"
+
+    def __init__(self, atraso=0.0, taxa_erro=0.0, taxa_lentidao=0.0, atraso_lento=5.0, semente=None):
+        super().__init__(atraso)
+        self.taxa_erro = taxa_erro
+        self.taxa_lentidao = taxa_lentidao
+        self.atraso_lento = atraso_lento
+        self.fora = False
+        self.chamadas = 0
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+
+    def fora_do_ar(self):
+        self.fora = True
+
+    def restabelecer(self):
+        self.fora = False
+
+    def gerar(self, prompt, prazo=None):
+        self._talvez_falhar()
+        return super().gerar(prompt, prazo)
+
+    def transmitir(self, prompt, prazo=None):
+        self._talvez_falhar()
+        return super().transmitir(prompt, prazo)
+
+    def _talvez_falhar(self):
+        with self._lock:
+            self.chamadas += 1
+            sorteio_erro, sorteio_lento = self._rng.random(), self._rng.random()
+        if sorteio_lento < self.taxa_lentidao:
+            time.sleep(self.atraso_lento)
+        if self.fora or sorteio_erro < self.taxa_erro:
+            raise ErroLLM("Falha injetada pelo cliente instável.")
+
+
+def criar_cliente(tipo=None):
+    api_key = os.environ.get("GEMINI_API_KEY")
+    tipo = tipo or os.environ.get("LLM_CLIENTE") or ("gemini" if api_key else "heuristico")
+    if tipo == "gemini":
+        if not api_key:
+            raise ErroLLM("Chave da API Gemini não configurada no servidor.", transitorio=False)
+        return ClienteGemini(api_key, os.environ.get("GEMINI_MODELO", "gemini-pro"))
+    if tipo == "heuristico":
+        return ClienteHeuristico()
+    if tipo == "local":
+        return ClienteLocal(float(os.environ.get("LLM_LOCAL_ATRASO", 0)))
+    if tipo == "instavel":
+        return ClienteInstavel(float(os.environ.get("LLM_LOCAL_ATRASO", 0)),
+                               taxa_erro=float(os.environ.get("LLM_TAXA_ERRO", 0.2)),
+                               taxa_lentidao=float(os.environ.get("LLM_TAXA_LENTIDAO", 0.1)),
+                               atraso_lento=float(os.environ.get("LLM_ATRASO_LENTO", 5)))
+    raise ValueError("Cliente LLM desconhecido: {}".format(tipo))
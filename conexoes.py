@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Gerenciador de conexões SQLite de longa duração.
+
+Cada thread de cada worker do gunicorn mantém a sua própria conexão aberta,
+configurada uma única vez com o perfil de PRAGMAs abaixo. As rotas pegam a
+conexão emprestada pelo contexto da aplicação Flask (``flask.g``) e a
+devolvem no teardown, sem fechá-la.
+"""
+import os
+import sqlite3
+import threading
+
+# Perfil aplicado uma vez por conexão, logo após abrir o arquivo
+PRAGMAS_PADRAO = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", 5000),          # ms esperando o lock de escrita
+    ("cache_size", -16000),          # ~16MB de page cache por conexão
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+)
+
+# Cache de prepared statements do módulo sqlite3 (padrão do Python: 128)
+TAMANHO_CACHE_STATEMENTS = 256
+
+
+def aplicar_pragmas(conn, pragmas=PRAGMAS_PADRAO):
+    for nome, valor in pragmas:
+        conn.execute("PRAGMA {} = {}".format(nome, valor))
+
+
+class GerenciadorConexoes:
+    """Mantém uma conexão por (processo, thread) para o arquivo ``caminho``."""
+
+    def __init__(self, caminho, pragmas=PRAGMAS_PADRAO, cached_statements=TAMANHO_CACHE_STATEMENTS):
+        self.caminho = caminho
+        self.pragmas = pragmas
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._abertas = {}              # thread -> conexão dela
+        self._pid = os.getpid()
+        self.total_aberturas = 0
+
+    def _abrir(self):
+        conn = sqlite3.connect(
+            self.caminho,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        aplicar_pragmas(conn, self.pragmas)
+        with self._lock:
+            self.total_aberturas += 1
+        return conn
+
+    def _podar(self):
+        # Conexões de threads que já terminaram: ninguém mais as usa, e sem
+        # fechá-las cada thread encerrada deixaria um descritor aberto
+        mortas = [thread for thread in self._abertas if not thread.is_alive()]
+        return [self._abertas.pop(thread) for thread in mortas]
+
+    def _verificar_fork(self):
+        # Conexões herdadas do processo pai (gunicorn --preload) não podem ser
+        # usadas nem fechadas no filho: apenas esquecemos as referências.
+        pid = os.getpid()
+        if pid != self._pid:
+            with self._lock:
+                if pid != self._pid:
+                    self._pid = pid
+                    self._abertas = {}
+                    self._local = threading.local()
+
+    def obter(self):
+        self._verificar_fork()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._abrir()
+            self._local.conn = conn
+            with self._lock:
+                mortas = self._podar()
+                self._abertas[threading.current_thread()] = conn
+            for antiga in mortas:
+                antiga.close()
+        return conn
+
+    def liberar(self, conn):
+        # A conexão continua aberta; só garantimos que nenhuma transação
+        # esquecida por uma rota segure o lock de escrita.
+        if conn.in_transaction:
+            conn.rollback()
+
+    def fechar_todas(self):
+        with self._lock:
+            abertas, self._abertas = self._abertas, {}
+            self._local = threading.local()
+        for conn in abertas.values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+class ConexoesPorRequisicao(GerenciadorConexoes):
+    """Comportamento antigo do ``get_db()``: abre e fecha a cada requisição.
+
+    Mantido para comparação nos benchmarks.
+    """
+
+    def obter(self):
+        return self._abrir()
+
+    def liberar(self, conn):
+        conn.close()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Correção e gravação de simulados finalizados, um ou vários de uma vez.
+
+Cada questão do snapshot recebe um "grupo" (área, disciplina, matéria, banca,
+dificuldade) guardado num array indexado por id (``MapaDesempenho``, montado
+uma vez por snapshot). Corrigir um simulado vira uma passada só sobre os ids
+e o bytearray de respostas (o mesmo formato de ``EstadoSimulado``): os
+totais e acertos por grupo saem de dois ``Counter`` e todo o resto (matéria,
+área, agregados) é derivado desses contadores.
+
+``gravar`` escreve qualquer quantidade de resultados na transação corrente
+com ``executemany``; ``corrigir_lote`` + ``gravar`` é a API em lote usada
+por ``/api/simulado/finalizar-lote`` para submissões offline.
+"""
+from array import array
+from collections import Counter, defaultdict
+from itertools import compress
+from typing import NamedTuple
+
+import agregados
+from sessao_simulado import BIT_ACERTO, RESPOSTA_OUTRA
+
+
+class MapaDesempenho:
+    """id da questão -> índice do grupo (área, disciplina, matéria, banca, dificuldade).
+
+    Usa as mesmas posições do gabarito: direto por ``id - base`` quando os
+    ids são densos, pelo dicionário ``gabarito.indice`` quando não são.
+    """
+
+    def __init__(self, banco):
+        gabarito = banco.gabarito
+        self.base = gabarito.base
+        self.indice = gabarito.indice
+        self.grupos = array('I', bytes(4 * len(gabarito.letras)))
+        self.chaves = []
+        posicao = {}
+        for questao_id, disciplina, materia, dificuldade, banca, _ in banco.linhas_indice():
+            chave = (banco.taxonomia.area(disciplina), disciplina, materia, banca, dificuldade)
+            k = posicao.get(chave)
+            if k is None:
+                k = posicao[chave] = len(self.chaves)
+                self.chaves.append(chave)
+            self.grupos[gabarito.posicao(questao_id)] = k
+
+    def grupos_de(self, ids):
+        grupos = self.grupos
+        if self.indice is not None:
+            indice = self.indice
+            return [grupos[indice[questao_id]] for questao_id in ids]
+        base = self.base
+        return [grupos[questao_id - base] for questao_id in ids]
+
+
+class ResultadoSimulado(NamedTuple):
+    total_questoes: int
+    total_acertos: int
+    percentual: float
+    # (area, disciplina, materia, banca, dificuldade) -> [acertos, total]
+    desempenho: dict
+
+    def por_materia(self):
+        materias = defaultdict(lambda: [0, 0])
+        for (_, _, materia, _, _), (acertos, total) in self.desempenho.items():
+            materias[materia][0] += acertos
+            materias[materia][1] += total
+        return materias
+
+
+def corrigir(banco, ids, respostas):
+    """Tabula um simulado: ``ids`` na ordem do simulado e ``respostas`` com
+    um byte por posição (bit de acerto já gravado, como em EstadoSimulado)."""
+    mapa = banco.mapa_desempenho
+    grupos = mapa.grupos_de(ids)
+    totais = Counter(grupos)
+    acertos = Counter(compress(grupos, [byte & BIT_ACERTO for byte in respostas[:len(grupos)]]))
+
+    total_questoes = len(grupos)
+    total_acertos = sum(acertos.values())
+    percentual = round((total_acertos / total_questoes) * 100, 2) if total_questoes > 0 else 0
+    desempenho = {mapa.chaves[grupo]: [acertos.get(grupo, 0), total] for grupo, total in totais.items()}
+    return ResultadoSimulado(total_questoes, total_acertos, percentual, desempenho)
+
+
+def empacotar_respostas(gabarito, ids, alternativas):
+    """Corrige alternativas escolhidas offline e devolve o bytearray de respostas.
+
+    ``alternativas[i]`` é a letra marcada na questão ``ids[i]`` (None ou ''
+    para não respondida). Ids fora do gabarito levantam ValueError.
+    """
+    respostas = bytearray(len(ids))
+    for posicao, (questao_id, alternativa) in enumerate(zip(ids, alternativas)):
+        correta = gabarito.resposta(questao_id)
+        if correta is None:
+            raise ValueError("Questão {} não existe no banco.".format(questao_id))
+        if not alternativa:
+            continue
+        alternativa = str(alternativa).strip().lower()
+        if len(alternativa) == 1 and 'a' <= alternativa <= 'z':
+            codigo = ord(alternativa) - ord('a') + 1
+        else:
+            codigo = RESPOSTA_OUTRA
+        respostas[posicao] = codigo | (BIT_ACERTO if alternativa == correta else 0)
+    return respostas
+
+
+def corrigir_lote(banco, simulados):
+    """``simulados``: iterável de (ids, alternativas) já concluídos."""
+    return [corrigir(banco, ids, empacotar_respostas(banco.gabarito, ids, alternativas))
+            for ids, alternativas in simulados]
+
+
+def gravar(cursor, resultados, marcas=None):
+    """Grava os resultados e soma os agregados na transação corrente (sem commit).
+
+    ``marcas``: opcional, (entrada_id, data) de cada resultado, usado pela
+    fila write-behind para gravar a data da finalização e a chave de
+    idempotência. Devolve os ids gerados em ``resultados``.
+    """
+    resultado_ids = []
+    linhas_materia = []
+    for posicao, resultado in enumerate(resultados):
+        if marcas is None:
+            cursor.execute("INSERT INTO resultados (total_questoes, total_acertos, percentual) VALUES (?, ?, ?)",
+                           (resultado.total_questoes, resultado.total_acertos, resultado.percentual))
+        else:
+            entrada_id, data = marcas[posicao]
+            cursor.execute("INSERT INTO resultados (data, total_questoes, total_acertos, percentual, entrada_id) "
+                           "VALUES (?, ?, ?, ?, ?)",
+                           (data, resultado.total_questoes, resultado.total_acertos, resultado.percentual, entrada_id))
+        resultado_id = cursor.lastrowid
+        resultado_ids.append(resultado_id)
+        linhas_materia.extend((resultado_id, materia, acertos, total)
+                              for materia, (acertos, total) in resultado.por_materia().items())
+
+    cursor.executemany("INSERT INTO desempenho_materia (resultado_id, materia, acertos, total) VALUES (?, ?, ?, ?)",
+                       linhas_materia)
+    agregados.registrar_lote(cursor, [
+        (resultado_id, r.total_questoes, r.total_acertos, r.percentual, r.desempenho)
+        for resultado_id, r in zip(resultado_ids, resultados)
+    ])
+    return resultado_ids
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""Gravação write-behind dos resultados de simulados (opcional).
+
+Com vários workers do gunicorn no mesmo ``database.db``, cada
+``finalizar_simulado`` disputa o lock de escrita do SQLite. Com
+``RESULTADOS_WRITE_BEHIND=1`` a rota só anexa o resultado já corrigido a um
+journal local (uma linha JSON, com fsync) e responde; uma thread escritora
+por processo junta as entradas em lotes e grava cada lote numa transação
+(``correcao.gravar``), tentando de novo enquanto o banco estiver ocupado
+(até ``TENTATIVAS_MAXIMAS`` vezes).
+
+Cada processo escreve no seu próprio arquivo em ``RESULTADOS_JOURNAL_DIR``,
+travado com ``flock`` enquanto o processo vive. Ao iniciar (``garantir_ativo``,
+chamado pelo app logo depois do ``setup_db``) e depois a cada
+``INTERVALO_REAPLICACAO``, a escritora reaplica os journals cuja trava está
+livre (processos que morreram) e os apaga. Um lote que o banco recusa vai
+para um journal sem trava e entra nessa mesma reaplicação; o journal do
+processo volta a ser truncado normalmente. A reaplicação é idempotente:
+cada entrada tem um ``entrada_id`` único gravado em ``resultados``.
+
+Sem ``fcntl`` (Windows) a fila não fica disponível e o app grava direto.
+"""
+import glob
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import correcao
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DISPONIVEL = fcntl is not None
+
+TAMANHO_LOTE = 200
+ESPERA_LOTE = 0.05            # segundos esperando mais entradas para o lote
+ESPERA_MAXIMA_RETENTATIVA = 2.0
+TENTATIVAS_MAXIMAS = 30       # ~50s com o banco ocupado; depois o lote é separado
+INTERVALO_REAPLICACAO = 60.0  # segundos entre buscas por journals órfãos e lotes recusados
+AMOSTRAS_LATENCIA = 512
+
+
+def preparar(conn):
+    """Coluna ``entrada_id`` em ``resultados`` (chave de idempotência da reaplicação)."""
+    if "entrada_id" not in {row[1] for row in conn.execute("PRAGMA table_info(resultados)")}:
+        conn.execute("ALTER TABLE resultados ADD COLUMN entrada_id TEXT")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_resultados_entrada ON resultados (entrada_id) "
+                 "WHERE entrada_id IS NOT NULL")
+    conn.commit()
+
+
+def _codificar(entrada_id, data, resultado):
+    return json.dumps({
+        "i": entrada_id,
+        "d": data,
+        "q": resultado.total_questoes,
+        "a": resultado.total_acertos,
+        "p": resultado.percentual,
+        "g": [list(chave) + valores for chave, valores in resultado.desempenho.items()],
+    }, separators=(',', ':'), ensure_ascii=False) + "\n"
+
+
+def _decodificar(linha):
+    dados = json.loads(linha)
+    desempenho = {tuple(g[:5]): [g[5], g[6]] for g in dados["g"]}
+    resultado = correcao.ResultadoSimulado(dados["q"], dados["a"], dados["p"], desempenho)
+    return dados["i"], dados["d"], resultado
+
+
+def ler_journal(caminho):
+    """Entradas completas de um journal; uma última linha cortada por queda é ignorada."""
+    entradas = []
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            if not linha.endswith("\n"):
+                break
+            try:
+                entradas.append(_decodificar(linha))
+            except (ValueError, KeyError, IndexError):
+                print(f"Aviso: entrada inválida ignorada no journal {caminho}")
+    return entradas
+
+
+def _ocupado(erro):
+    # Banco travado por outro escritor: vale tentar de novo. Outros
+    # OperationalError (disco cheio, coluna ausente...) não passam sozinhos.
+    codigo = getattr(erro, 'sqlite_errorcode', None)
+    if codigo is not None:
+        return codigo & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return 'locked' in str(erro) or 'busy' in str(erro)
+
+
+def _agora():
+    # Mesmo formato de CURRENT_TIMESTAMP (UTC)
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class FilaResultados:
+    def __init__(self, conexoes, diretorio, sincronizar=True, tamanho_lote=TAMANHO_LOTE):
+        self.conexoes = conexoes
+        self.diretorio = diretorio
+        self.sincronizar = sincronizar
+        self.tamanho_lote = tamanho_lote
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._fila = None
+        self._journal = None
+        self._pendentes = 0
+        self._latencias = deque(maxlen=AMOSTRAS_LATENCIA)
+        self.commits = 0
+        self.entradas_gravadas = 0
+        self.falhas_commit = 0
+        self.reaplicadas = 0
+        self.rejeitadas = 0
+
+    # -- processo atual ----------------------------------------------------
+
+    def garantir_ativo(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Primeiro uso neste processo (ou depois de um fork): journal e
+                # fila próprios; o que for do processo pai é dele.
+                self._journal = open(self._novo_caminho(), 'ab')
+                fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fila = queue.Queue()
+                self._pendentes = 0
+                self._pid = os.getpid()
+            # Sem fork, só a thread é reposta: journal e fila continuam os mesmos
+            self._thread = threading.Thread(target=self._executar, name='escritora-resultados', daemon=True)
+            self._thread.start()
+
+    def _novo_caminho(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        return os.path.join(self.diretorio, "resultados-{}-{}.jsonl".format(os.getpid(), secrets.token_hex(4)))
+
+    def enfileirar(self, resultado):
+        """Registra o resultado no journal (durável) e o entrega à escritora."""
+        self.garantir_ativo()
+        entrada = (secrets.token_hex(12), _agora(), resultado)
+        linha = _codificar(*entrada).encode('utf-8')
+        with self._lock:
+            self._journal.write(linha)
+            self._journal.flush()
+            if self.sincronizar:
+                os.fsync(self._journal.fileno())
+            self._pendentes += 1
+        self._fila.put(entrada)
+        return entrada[0]
+
+    # -- escritora ---------------------------------------------------------
+
+    def _executar(self):
+        proxima_reaplicacao = 0.0
+        while True:
+            if time.monotonic() >= proxima_reaplicacao:
+                # Journals de processos mortos e lotes recusados antes
+                try:
+                    self._reaplicar_orfaos()
+                except Exception as e:
+                    print(f"Erro ao reaplicar journals de resultados: {e!r}")
+                proxima_reaplicacao = time.monotonic() + INTERVALO_REAPLICACAO
+            lote = self._proximo_lote(proxima_reaplicacao - time.monotonic())
+            if not lote:
+                continue
+            try:
+                if self._gravar(lote) is None:
+                    self._rejeitar(lote)
+            except Exception as e:
+                # Nem o arquivo de recusados pôde ser escrito (ex.: disco
+                # cheio): o lote fica só no journal, reaplicado no reinício
+                print(f"Lote de {len(lote)} resultados fica só no journal: {e!r}")
+                continue
+            with self._lock:
+                self._pendentes -= len(lote)
+                if self._pendentes == 0:
+                    # Tudo que está no journal já foi gravado no banco (ou
+                    # separado em um arquivo de recusados)
+                    self._journal.truncate(0)
+
+    def _rejeitar(self, lote):
+        """Move um lote recusado pelo banco para um journal próprio, sem trava.
+
+        Para os outros processos (e para a próxima reaplicação deste) ele é
+        um journal órfão: volta a ser tentado a cada ``INTERVALO_REAPLICACAO``
+        e é apagado quando entrar no banco.
+        """
+        caminho = self._novo_caminho()
+        # Escrito com outro nome e renomeado no fim: um journal pela metade
+        # nunca fica visível para a reaplicação
+        with open(caminho + ".tmp", 'wb') as arquivo:
+            for entrada in lote:
+                arquivo.write(_codificar(*entrada).encode('utf-8'))
+            arquivo.flush()
+            if self.sincronizar:
+                os.fsync(arquivo.fileno())
+        os.replace(caminho + ".tmp", caminho)
+        self.rejeitadas += len(lote)
+        print(f"Lote de {len(lote)} resultados separado em {os.path.basename(caminho)} para nova tentativa")
+
+    def _proximo_lote(self, espera):
+        try:
+            lote = [self._fila.get(timeout=max(espera, 0))]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + ESPERA_LOTE
+        while len(lote) < self.tamanho_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _gravar(self, lote):
+        tentativa = 0
+        while True:
+            conn = self.conexoes.obter()
+            inicio = time.perf_counter()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                ids = [entrada_id for entrada_id, _, _ in lote]
+                ja_gravadas = {row[0] for row in cursor.execute(
+                    "SELECT entrada_id FROM resultados WHERE entrada_id IN ({})".format(','.join('?' * len(ids))), ids)}
+                novas = [entrada for entrada in lote if entrada[0] not in ja_gravadas]
+                if novas:
+                    correcao.gravar(cursor, [resultado for _, _, resultado in novas],
+                                    marcas=[(entrada_id, data) for entrada_id, data, _ in novas])
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                self.falhas_commit += 1
+                if not _ocupado(e) or tentativa + 1 >= TENTATIVAS_MAXIMAS:
+                    print(f"Erro ao gravar lote de {len(lote)} resultados: {e}")
+                    return None
+                espera = min(ESPERA_MAXIMA_RETENTATIVA, 0.05 * (2 ** tentativa))
+                tentativa += 1
+                print(f"Aviso: lote de {len(lote)} resultados não gravado ({e}); nova tentativa em {espera:.2f}s")
+                time.sleep(espera)
+                continue
+            except Exception as e:
+                # sqlite3.Error, ou um resultado malformado em correcao.gravar
+                conn.rollback()
+                self.falhas_commit += 1
+                print(f"Erro ao gravar lote de {len(lote)} resultados: {e!r}")
+                return None
+            self._latencias.append(time.perf_counter() - inicio)
+            self.commits += 1
+            self.entradas_gravadas += len(novas)
+            return len(novas)
+
+    def _reaplicar_orfaos(self):
+        for caminho in sorted(glob.glob(os.path.join(self.diretorio, "resultados-*.jsonl"))):
+            if caminho == self._journal.name:
+                continue
+            try:
+                arquivo = open(caminho, 'rb')
+            except OSError:
+                continue
+            with arquivo:
+                try:
+                    fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # processo dono ainda está vivo
+                entradas = ler_journal(caminho)
+                gravadas = [self._gravar(entradas[inicio:inicio + self.tamanho_lote])
+                            for inicio in range(0, len(entradas), self.tamanho_lote)]
+                if None in gravadas:
+                    continue  # fica para a próxima inicialização
+                self.reaplicadas += sum(gravadas)
+                os.unlink(caminho)
+            if entradas:
+                print(f"Journal {os.path.basename(caminho)} reaplicado: {sum(gravadas)} de {len(entradas)} "
+                      "resultados ainda não gravados.")
+
+    # -- instrumentação ----------------------------------------------------
+
+    def aguardar(self, timeout=10.0):
+        """Espera a fila esvaziar (testes, benchmarks, desligamento)."""
+        limite = time.monotonic() + timeout
+        while self._pendentes and time.monotonic() < limite:
+            time.sleep(0.01)
+        return self._pendentes == 0
+
+    def metricas(self):
+        latencias = sorted(self._latencias)
+        return {
+            "ativo": self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            "profundidade_fila": self._fila.qsize() if self._fila is not None else 0,
+            "pendentes_journal": self._pendentes,
+            "commits": self.commits,
+            "entradas_gravadas": self.entradas_gravadas,
+            "entradas_reaplicadas": self.reaplicadas,
+            "falhas_commit": self.falhas_commit,
+            "entradas_rejeitadas": self.rejeitadas,
+            "latencia_commit_ms": {
+                "ultima": round(self._latencias[-1] * 1000, 3) if latencias else None,
+                "media": round(sum(latencias) / len(latencias) * 1000, 3) if latencias else None,
+                "p95": round(latencias[max(0, int(len(latencias) * 0.95) - 1)] * 1000, 3) if latencias else None,
+                "max": round(latencias[-1] * 1000, 3) if latencias else None,
+            },
+        }
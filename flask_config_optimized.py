@@ -1,14 +1,12 @@
-﻿# CONFIGURAÇÃO FLASK OTIMIZADA PARA COOKIES GRANDES
+﻿# CONFIGURAÇÃO FLASK OTIMIZADA
 import os
 
 class Config:
     # 🍪 CONFIGURAÇÕES DE SESSÃO OTIMIZADAS
+    # O estado do simulado fica no servidor (sessao_simulado.py); o cookie só
+    # carrega o id da sessão, então o limite padrão de 4KB é suficiente.
     SECRET_KEY = os.getenv('FLASK_SECRET_KEY', 'chave-super-secreta-aqui')
     
-    # Aumenta drasticamente o limite de cookies
-    SESSION_COOKIE_MAX_SIZE = 16384  # 16KB (padrão: 4093)
-    MAX_COOKIE_SIZE = 16384
-    
     # Otimizações de performance
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SECURE = False  # True em produção com HTTPS
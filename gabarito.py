@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Gabarito compacto do banco de questões, indexado por id.
+
+Um byte por id (de ``base`` até o maior id) guarda a letra correta; o
+(disciplina, banca) de cada questão, que o simulado usa para localizar a
+posição dela na sequência sorteada, fica num array de índices para uma
+tabela pequena de chaves. Corrigir uma resposta é um acesso a array, sem
+tocar nos textos da questão.
+
+Os ids do banco são densos (autoincremento, questões desativadas deixam
+poucos buracos). Se a faixa de ids passar de ``FATOR_ESPARSO`` vezes o número
+de questões, os arrays passam a ter uma posição por questão e um dicionário
+``indice`` leva o id à posição, em vez de alocar a faixa inteira.
+
+Montado junto com o snapshot (``BancoQuestoes.gabarito``) e trocado com ele
+a cada importação.
+"""
+from array import array
+
+SEM_QUESTAO = 0
+# Respostas que não são uma única letra a-z ficam num dicionário à parte
+RESPOSTA_LONGA = 255
+
+# Faixa de ids tolerada antes de trocar os arrays diretos pelo dicionário
+FATOR_ESPARSO = 4
+FOLGA_ESPARSA = 1024
+
+
+class Gabarito:
+    def __init__(self, itens, ids):
+        # itens: iterável de (id, resposta_correta, (disciplina, banca)) em
+        # ordem de id, percorrido uma vez só; ids: os mesmos ids, em ordem
+        self.base = ids[0] if len(ids) else 0
+        faixa = (ids[-1] - self.base + 1) if len(ids) else 0
+        if faixa <= FATOR_ESPARSO * len(ids) + FOLGA_ESPARSA:
+            self.indice = None
+            tamanho = faixa
+        else:
+            self.indice = {questao_id: i for i, questao_id in enumerate(ids)}
+            tamanho = len(ids)
+        self.letras = bytearray(tamanho)
+        self.tabela_chaves = []
+        self.chaves = array('I', bytes(4 * tamanho))
+        self.respostas_longas = {}
+
+        posicao_chave = {}
+        for questao_id, resposta, chave in itens:
+            i = questao_id - self.base if self.indice is None else self.indice[questao_id]
+            resposta = (resposta or '').strip().lower()
+            if len(resposta) == 1 and 'a' <= resposta <= 'z':
+                self.letras[i] = ord(resposta)
+            else:
+                self.letras[i] = RESPOSTA_LONGA
+                self.respostas_longas[questao_id] = resposta
+            k = posicao_chave.get(chave)
+            if k is None:
+                k = posicao_chave[chave] = len(self.tabela_chaves)
+                self.tabela_chaves.append(chave)
+            self.chaves[i] = k
+
+    def posicao(self, questao_id):
+        """Posição do id nos arrays, ou None se ele não está no gabarito."""
+        if self.indice is not None:
+            return self.indice.get(questao_id)
+        i = questao_id - self.base
+        if 0 <= i < len(self.letras) and self.letras[i] != SEM_QUESTAO:
+            return i
+        return None
+
+    def __contains__(self, questao_id):
+        return self.posicao(questao_id) is not None
+
+    def resposta(self, questao_id):
+        """Resposta correta em minúsculas, ou None se o id não existe."""
+        i = self.posicao(questao_id)
+        if i is None:
+            return None
+        codigo = self.letras[i]
+        if codigo == RESPOSTA_LONGA:
+            return self.respostas_longas[questao_id]
+        return chr(codigo)
+
+    def chave(self, questao_id):
+        i = self.posicao(questao_id)
+        return None if i is None else self.tabela_chaves[self.chaves[i]]
+
+    def corrigir(self, questao_id, alternativa):
+        """True/False para a alternativa escolhida, ou None se o id não existe."""
+        correta = self.resposta(questao_id)
+        if correta is None:
+            return None
+        return alternativa == correta
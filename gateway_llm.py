@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""Gateway em volta de um cliente de modelo (clientes_llm).
+
+``GatewayLLM`` é ele mesmo um ``ClienteLLM`` e acrescenta ao cliente:
+
+* compartimento (bulkhead): um semáforo por modelo limita as chamadas
+  simultâneas ao provedor, somando todos os gateways do processo;
+* prazo por chamada: quem chama espera no máximo ``prazo`` segundos,
+  incluindo as novas tentativas; a chamada em si roda numa thread própria
+  e só devolve a vaga do compartimento quando termina de fato;
+* novas tentativas para erros transitórios, com espera exponencial
+  sorteada (full jitter);
+* disjuntor (circuit breaker): depois de ``limiar_falhas`` falhas seguidas o
+  provedor não é chamado por ``reabertura`` segundos; então uma única
+  chamada de sondagem decide se ele volta;
+* reserva: quando o provedor falha, está com o circuito aberto ou estoura o
+  prazo, responde o cliente ``reserva`` (o pré-corretor local), se houver.
+
+``transmitir`` faz o mesmo para respostas em streaming; o prazo vale para a
+resposta inteira.
+
+``metricas()`` traz histogramas de latência por desfecho.
+"""
+import bisect
+import os
+import queue
+import random
+import threading
+import time
+
+from clientes_llm import ClienteHeuristico, ClienteLLM, ErroLLM, criar_cliente
+
+CONCORRENCIA = 4
+PRAZO = 30.0
+TENTATIVAS = 3
+ESPERA_BASE = 0.5
+ESPERA_MAXIMA = 8.0
+LIMIAR_FALHAS = 5
+REABERTURA = 30.0
+
+LIMITES_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+DESFECHOS = ("sucesso", "erro", "prazo", "rejeitado", "circuito_aberto", "reserva")
+
+
+class ErroPrazo(ErroLLM):
+    """O prazo da chamada acabou antes da resposta."""
+
+
+class ErroCompartimento(ErroLLM):
+    """Nenhuma vaga no compartimento do modelo dentro do prazo."""
+
+
+class ErroCircuitoAberto(ErroLLM):
+    """Disjuntor aberto: o provedor não está sendo chamado."""
+
+
+_compartimentos = {}
+_lock_compartimentos = threading.Lock()
+
+
+def compartimento(identificador, limite):
+    """Semáforo compartilhado pelas chamadas ao modelo ``identificador``."""
+    with _lock_compartimentos:
+        if identificador not in _compartimentos:
+            _compartimentos[identificador] = (threading.BoundedSemaphore(limite), limite)
+        return _compartimentos[identificador]
+
+
+class Histograma:
+    """Contagens cumulativas por limite em ms, no formato dos histogramas do Prometheus."""
+
+    def __init__(self, limites=LIMITES_MS):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma_ms = 0.0
+
+    def observar(self, segundos):
+        ms = segundos * 1000
+        self.contagens[bisect.bisect_left(self.limites, ms)] += 1
+        self.soma_ms += ms
+
+    def como_dict(self):
+        baldes, acumulado = {}, 0
+        for limite, contagem in zip(self.limites + ("+Inf",), self.contagens):
+            acumulado += contagem
+            baldes[str(limite)] = acumulado
+        return {"baldes_ms": baldes, "total": acumulado, "soma_ms": round(self.soma_ms, 1)}
+
+
+class Disjuntor:
+    FECHADO, ABERTO, MEIO_ABERTO = "fechado", "aberto", "meio_aberto"
+
+    def __init__(self, limiar_falhas=LIMIAR_FALHAS, reabertura=REABERTURA):
+        self.limiar_falhas = limiar_falhas
+        self.reabertura = reabertura
+        self.estado = self.FECHADO
+        self.falhas_seguidas = 0
+        self.aberturas = 0
+        self._aberto_em = 0.0
+        self._sondando = False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """Se a chamada pode ir ao provedor; depois dela, chame ``sucesso``, ``falha`` ou ``liberar``."""
+        with self._lock:
+            if self.estado == self.ABERTO and time.monotonic() - self._aberto_em >= self.reabertura:
+                self.estado = self.MEIO_ABERTO
+            if self.estado == self.MEIO_ABERTO:
+                if self._sondando:
+                    return False
+                self._sondando = True
+                return True
+            return self.estado == self.FECHADO
+
+    def sucesso(self):
+        with self._lock:
+            self.estado = self.FECHADO
+            self.falhas_seguidas = 0
+            self._sondando = False
+
+    def falha(self):
+        with self._lock:
+            self.falhas_seguidas += 1
+            if self.estado == self.MEIO_ABERTO or self.falhas_seguidas >= self.limiar_falhas:
+                if self.estado != self.ABERTO:
+                    self.aberturas += 1
+                self.estado = self.ABERTO
+                self._aberto_em = time.monotonic()
+            self._sondando = False
+
+    def liberar(self):
+        # Chamada que não diz nada sobre a saúde do provedor (ex.: pedido inválido)
+        with self._lock:
+            self._sondando = False
+
+
+class GatewayLLM(ClienteLLM):
+    nome = "gateway"
+
+    def __init__(self, cliente, reserva=None, concorrencia=CONCORRENCIA, prazo=PRAZO, tentativas=TENTATIVAS,
+                 espera_base=ESPERA_BASE, espera_maxima=ESPERA_MAXIMA, limiar_falhas=LIMIAR_FALHAS,
+                 reabertura=REABERTURA):
+        self.cliente = cliente
+        self.reserva = reserva
+        self.prazo = prazo
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.semaforo, self.concorrencia = compartimento(cliente.identificador, concorrencia)
+        self.disjuntor = Disjuntor(limiar_falhas, reabertura)
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+        self._histogramas = {desfecho: Histograma() for desfecho in DESFECHOS}
+        self._motivos_reserva = {}
+        self._em_uso = 0
+        self.total_tentativas = 0
+
+    @property
+    def identificador(self):
+        return self.cliente.identificador
+
+    def responder(self, prompt, prazo=None):
+        inicio = time.monotonic()
+        texto, falha = self._tentar(lambda limite: self._chamar(prompt, limite), inicio, prazo)
+        if falha is None:
+            self._registrar("sucesso", inicio)
+            return texto, self.identificador
+        return self._reservar(falha, inicio, lambda: (self.reserva.gerar(prompt), self.reserva.identificador))
+
+    def gerar(self, prompt, prazo=None):
+        return self.responder(prompt, prazo)[0]
+
+    def transmitir(self, prompt, prazo=None):
+        """Como ``responder``, em pedaços: novas tentativas e reserva só valem
+        até o primeiro pedaço; uma falha depois dele sobe para quem lê."""
+        inicio = time.monotonic()
+        limite = inicio + (prazo or self.prazo)
+        aberto, falha = self._tentar(lambda limite: self._abrir_fluxo(prompt, limite), inicio, prazo)
+        if falha is None:
+            return self.identificador, self._continuar_fluxo(*aberto, inicio, limite)
+        return self._reservar(falha, inicio, lambda: self.reserva.transmitir(prompt))
+
+    def _tentar(self, operacao, inicio, prazo):
+        """``operacao(limite)`` com disjuntor e novas tentativas.
+
+        Devolve (resultado, None) ou (None, (desfecho, erro)); erros não
+        transitórios sobem direto.
+        """
+        limite = inicio + (prazo or self.prazo)
+        falha = None
+        for tentativa in range(self.tentativas):
+            if not self.disjuntor.permitir():
+                return None, ("circuito_aberto", ErroCircuitoAberto("Provedor do modelo indisponível no momento."))
+            try:
+                resultado = operacao(limite)
+            except ErroCompartimento as e:
+                self.disjuntor.liberar()
+                return None, ("rejeitado", e)
+            except ErroPrazo as e:
+                self.disjuntor.falha()
+                return None, ("prazo", e)
+            except ErroLLM as e:
+                if not e.transitorio:
+                    self.disjuntor.liberar()
+                    self._registrar("erro", inicio)
+                    raise
+                self.disjuntor.falha()
+                falha = ("erro", e)
+                espera = self._rng.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+                if tentativa + 1 == self.tentativas or time.monotonic() + espera >= limite:
+                    break
+                time.sleep(espera)
+            else:
+                self.disjuntor.sucesso()
+                return resultado, None
+        return None, falha
+
+    def _reservar(self, falha, inicio, usar_reserva):
+        desfecho, erro = falha
+        if self.reserva is None:
+            self._registrar(desfecho, inicio)
+            raise erro
+        resultado = usar_reserva()
+        with self._lock:
+            self._motivos_reserva[desfecho] = self._motivos_reserva.get(desfecho, 0) + 1
+        self._registrar("reserva", inicio)
+        return resultado
+
+    def _chamar(self, prompt, limite):
+        restante = limite - time.monotonic()
+        if restante <= 0 or not self.semaforo.acquire(timeout=restante):
+            raise ErroCompartimento("Limite de chamadas simultâneas ao modelo atingido.")
+        with self._lock:
+            self._em_uso += 1
+            self.total_tentativas += 1
+        caixa = {}
+        pronto = threading.Event()
+
+        def executar():
+            try:
+                caixa["texto"] = self.cliente.gerar(prompt, prazo=max(limite - time.monotonic(), 0.001))
+            except Exception as e:
+                caixa["erro"] = e
+            finally:
+                with self._lock:
+                    self._em_uso -= 1
+                self.semaforo.release()
+                pronto.set()
+
+        threading.Thread(target=executar, name="chamada-llm", daemon=True).start()
+        if not pronto.wait(max(limite - time.monotonic(), 0)):
+            raise ErroPrazo("O modelo não respondeu dentro do prazo.")
+        if "erro" in caixa:
+            raise self._como_erro_llm(caixa["erro"])
+        return caixa["texto"]
+
+    def _abrir_fluxo(self, prompt, limite):
+        """Inicia o streaming numa thread e espera o primeiro pedaço; devolve (fila, primeiro item)."""
+        restante = limite - time.monotonic()
+        if restante <= 0 or not self.semaforo.acquire(timeout=restante):
+            raise ErroCompartimento("Limite de chamadas simultâneas ao modelo atingido.")
+        with self._lock:
+            self._em_uso += 1
+            self.total_tentativas += 1
+        fila = queue.Queue()
+
+        def produzir():
+            try:
+                _, pedacos = self.cliente.transmitir(prompt, prazo=max(limite - time.monotonic(), 0.001))
+                for pedaco in pedacos:
+                    fila.put(("pedaco", pedaco))
+                fila.put(("fim", None))
+            except Exception as e:
+                fila.put(("erro", e))
+            finally:
+                with self._lock:
+                    self._em_uso -= 1
+                self.semaforo.release()
+
+        threading.Thread(target=produzir, name="fluxo-llm", daemon=True).start()
+        item = self._proximo(fila, limite)
+        if item[0] == "erro":
+            raise self._como_erro_llm(item[1])
+        return fila, item
+
+    def _continuar_fluxo(self, fila, item, inicio, limite):
+        desfecho = "erro"
+        try:
+            while item[0] == "pedaco":
+                yield item[1]
+                item = self._proximo(fila, limite)
+            if item[0] == "erro":
+                self.disjuntor.falha()
+                raise self._como_erro_llm(item[1])
+            desfecho = "sucesso"
+        except ErroPrazo:
+            self.disjuntor.falha()
+            desfecho = "prazo"
+            raise
+        except GeneratorExit:
+            # Quem lia desistiu (ex.: conexão fechada); não diz nada do provedor
+            desfecho = None
+            raise
+        finally:
+            if desfecho is not None:
+                self._registrar(desfecho, inicio)
+
+    @staticmethod
+    def _proximo(fila, limite):
+        try:
+            return fila.get(timeout=max(limite - time.monotonic(), 0))
+        except queue.Empty:
+            raise ErroPrazo("O modelo não respondeu dentro do prazo.") from None
+
+    @staticmethod
+    def _como_erro_llm(erro):
+        if isinstance(erro, ErroLLM):
+            return erro
+        novo = ErroLLM(str(erro))
+        novo.__cause__ = erro
+        return novo
+
+    def _registrar(self, desfecho, inicio):
+        with self._lock:
+            self._histogramas[desfecho].observar(time.monotonic() - inicio)
+
+    def metricas(self):
+        with self._lock:
+            return {
+                "modelo": self.identificador,
+                "reserva": self.reserva.identificador if self.reserva is not None else None,
+                "concorrencia": self.concorrencia,
+                "chamadas_em_andamento": self._em_uso,
+                "tentativas": self.total_tentativas,
+                "disjuntor": {"estado": self.disjuntor.estado, "falhas_seguidas": self.disjuntor.falhas_seguidas,
+                              "aberturas": self.disjuntor.aberturas},
+                "motivos_reserva": dict(self._motivos_reserva),
+                "latencia": {desfecho: h.como_dict() for desfecho, h in self._histogramas.items()},
+            }
+
+
+def criar_gateway(tipo=None):
+    """Cliente de ``criar_cliente`` atrás do gateway, configurado pelo ambiente.
+
+    LLM_CONCORRENCIA, LLM_PRAZO, LLM_TENTATIVAS, LLM_LIMIAR_FALHAS,
+    LLM_REABERTURA; LLM_RESERVA=0 desliga a reserva pelo pré-corretor local.
+    """
+    cliente = criar_cliente(tipo)
+    reserva = None
+    if cliente.nome not in ("heuristico", "local") and os.environ.get("LLM_RESERVA", "1") == "1":
+        reserva = ClienteHeuristico()
+    return GatewayLLM(
+        cliente, reserva,
+        concorrencia=int(os.environ.get("LLM_CONCORRENCIA", CONCORRENCIA)),
+        prazo=float(os.environ.get("LLM_PRAZO", PRAZO)),
+        tentativas=int(os.environ.get("LLM_TENTATIVAS", TENTATIVAS)),
+        limiar_falhas=int(os.environ.get("LLM_LIMIAR_FALHAS", LIMIAR_FALHAS)),
+        reabertura=float(os.environ.get("LLM_REABERTURA", REABERTURA)))
@@ -1,11 +1,53 @@
-﻿import sqlite3
-import pandas as pd
-import json
+import argparse
+import csv
 import os
+import sqlite3
+import time
+from itertools import islice
+from json.encoder import encode_basestring_ascii as _json
 
-DB_NAME = 'database.db'
+from banco_questoes import (criar_controle_versao, hashes_registro, incrementar_versao, preparar_controle_conteudo,
+                            restaurar_controle_versao, suspender_controle_versao)
+import questoes_publicadas
+import taxonomia
+
+DB_NAME = os.environ.get('DATABASE_PATH', 'database.db')
 CSV_NAME = 'questoes.csv'
 
+# Linhas por executemany; a importação inteira roda em uma única transação
+TAMANHO_LOTE = 5000
+
+COLUNAS_CSV = ('disciplina', 'materia', 'dificuldade', 'enunciado', 'alternativa_a', 'alternativa_b',
+               'alternativa_c', 'alternativa_d', 'alternativa_e', 'resposta_correta', 'justificativa',
+               'dica', 'formula', 'banca')
+
+COLUNAS_ESSENCIAIS = ['disciplina', 'materia', 'enunciado', 'alternativa_a', 'alternativa_b',
+                      'alternativa_c', 'alternativa_d', 'resposta_correta']
+
+SQL_INSERT = """
+INSERT INTO questoes (disciplina, materia, dificuldade, enunciado, alternativas, resposta_correta,
+                      justificativa, dica, formula, banca, hash_conteudo, hash_linha)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_ATUALIZAR = """
+UPDATE questoes SET disciplina = ?, materia = ?, dificuldade = ?, enunciado = ?, alternativas = ?,
+                    resposta_correta = ?, justificativa = ?, dica = ?, formula = ?, banca = ?,
+                    hash_linha = ?, ativo = 1
+WHERE id = ?
+"""
+
+# PRAGMAs só durante a carga: o arquivo continua em WAL (o mesmo modo do
+# app, então não precisa de acesso exclusivo) e o fsync fica desligado até o
+# commit final.
+PRAGMAS_IMPORTACAO = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "OFF"),
+    ("cache_size", -64000),
+    ("temp_store", "MEMORY"),
+)
+
+
 def criar_tabelas(conn):
     cursor = conn.cursor()
     # Tabela de Questões
@@ -20,10 +62,15 @@ def criar_tabelas(conn):
         resposta_correta TEXT NOT NULL,
         justificativa TEXT,
         dica TEXT,
-        formula TEXT
+        formula TEXT,
+        banca TEXT DEFAULT '',
+        hash_conteudo TEXT,
+        hash_linha TEXT,
+        ativo INTEGER NOT NULL DEFAULT 1,
+        area_id INTEGER REFERENCES areas (id)
     );
     """)
-    
+
     # Tabela de Resultados (para o Dashboard)
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS resultados (
@@ -34,7 +81,7 @@ def criar_tabelas(conn):
         percentual REAL NOT NULL
     );
     """)
-    
+
     # Tabela de Desempenho por Matéria (para o Dashboard)
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS desempenho_materia (
@@ -46,80 +93,289 @@ def criar_tabelas(conn):
         FOREIGN KEY (resultado_id) REFERENCES resultados (id)
     );
     """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_questoes_disciplina_banca ON questoes (disciplina, banca)")
     conn.commit()
+    criar_controle_versao(conn)
+    preparar_controle_conteudo(conn)
+    taxonomia.preparar(conn)
     print("Tabelas 'questoes', 'resultados' e 'desempenho_materia' verificadas/criadas.")
 
-def importar_dados():
-    if not os.path.exists(CSV_NAME):
-        print(f"Erro: Arquivo '{CSV_NAME}' não encontrado no diretório.")
-        print("Por favor, crie o arquivo e adicione os dados antes de executar este script.")
-        return
 
-    conn = sqlite3.connect(DB_NAME)
-    criar_tabelas(conn)
+def ler_csv(caminho, cabecalhos=None, delimitador=';'):
+    """Gera (cabeçalho, linha) por linha do CSV, sem carregar o arquivo na memória.
+
+    Com ``cabecalhos``, a primeira linha do arquivo é descartada e esses
+    nomes são usados no lugar dela.
+    """
+    with open(caminho, mode='r', encoding='utf-8-sig', newline='') as f:
+        leitor = csv.reader(f, delimiter=delimitador)
+        cabecalho = next(leitor, [])
+        if cabecalhos is not None:
+            cabecalho = cabecalhos
+        cabecalho = [nome.strip() for nome in cabecalho]
+        for row in leitor:
+            yield cabecalho, row
+
+
+def indices_colunas(cabecalho):
+    posicoes = {nome: i for i, nome in enumerate(cabecalho)}
+    return tuple(posicoes.get(coluna) for coluna in COLUNAS_CSV)
+
+
+def _campo(row, i):
+    if i is None or i >= len(row):
+        return ''
+    return row[i].strip()
+
+
+def montar_registro(row, indices, banca_padrao=''):
+    """Converte uma linha do CSV na tupla do INSERT, ou None se estiver incompleta."""
+    (i_disciplina, i_materia, i_dificuldade, i_enunciado, i_a, i_b, i_c, i_d, i_e,
+     i_resposta, i_justificativa, i_dica, i_formula, i_banca) = indices
+    disciplina = _campo(row, i_disciplina)
+    enunciado = _campo(row, i_enunciado)
+    resposta = _campo(row, i_resposta)
+    if not disciplina or not enunciado or not resposta:
+        return None
+
+    # Mesmo texto que json.dumps({'a': ..., ...}) produziria, sem o custo de
+    # montar um dict por linha; a alternativa 'e' só entra se existir.
+    alternativa_e = _campo(row, i_e)
+    if alternativa_e:
+        alternativas = '{"a": %s, "b": %s, "c": %s, "d": %s, "e": %s}' % (
+            _json(_campo(row, i_a)), _json(_campo(row, i_b)), _json(_campo(row, i_c)),
+            _json(_campo(row, i_d)), _json(alternativa_e))
+    else:
+        alternativas = '{"a": %s, "b": %s, "c": %s, "d": %s}' % (
+            _json(_campo(row, i_a)), _json(_campo(row, i_b)), _json(_campo(row, i_c)),
+            _json(_campo(row, i_d)))
+
+    return (
+        disciplina,
+        _campo(row, i_materia),
+        _campo(row, i_dificuldade) or 'Média',
+        enunciado,
+        alternativas,
+        resposta.lower(),
+        _campo(row, i_justificativa) or None,
+        _campo(row, i_dica) or None,
+        _campo(row, i_formula) or None,
+        _campo(row, i_banca) or banca_padrao,
+    )
+
+
+def gerar_registros(linhas, banca_padrao='', contadores=None):
+    indices = None
+    cabecalho_atual = None
+    for cabecalho, row in linhas:
+        if cabecalho is not cabecalho_atual:
+            cabecalho_atual, indices = cabecalho, indices_colunas(cabecalho)
+        registro = montar_registro(row, indices, banca_padrao)
+        if registro is None:
+            if contadores is not None:
+                contadores['ignoradas'] += 1
+            continue
+        yield registro + hashes_registro(registro)
+
+
+def em_lotes(iteravel, tamanho):
+    iterador = iter(iteravel)
+    while True:
+        lote = list(islice(iterador, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+def carregar_registros(conn, registros, antes_de_inserir=None, tamanho_lote=TAMANHO_LOTE):
+    """Insere ``registros`` em lotes dentro de uma única transação.
+
+    ``antes_de_inserir(cursor)`` roda na mesma transação (ex.: apagar as
+    questões antigas), então leitores nunca veem a tabela pela metade.
+    Os triggers de versão ficam suspensos durante a carga e o contador sobe
+    uma vez só. Devolve (total inserido, segundos).
+    """
+    sincronismo_anterior = conn.execute("PRAGMA synchronous").fetchone()[0]
+    for nome, valor in PRAGMAS_IMPORTACAO:
+        conn.execute("PRAGMA {} = {}".format(nome, valor))
+
+    inicio = time.perf_counter()
+    total = 0
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        suspender_controle_versao(cursor)
+        if antes_de_inserir is not None:
+            antes_de_inserir(cursor)
+        for lote in em_lotes(registros, tamanho_lote):
+            cursor.executemany(SQL_INSERT, lote)
+            total += len(lote)
+        incrementar_versao(cursor)
+        restaurar_controle_versao(cursor)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA synchronous = {}".format(sincronismo_anterior))
+    return total, time.perf_counter() - inicio
+
+
+def sincronizar_registros(conn, registros, escopo_banca=None, desativar_ausentes=False,
+                          tamanho_lote=TAMANHO_LOTE):
+    """Aplica ``registros`` sem apagar a tabela, casando pelo hash de conteúdo.
+
+    Questões novas são inseridas, as que mudaram (``hash_linha`` diferente ou
+    inativas) são atualizadas no mesmo id e as idênticas não são tocadas.
+    Com ``escopo_banca``, só as questões dessa banca são atualizadas ou
+    desativadas. Com ``desativar_ausentes``, as questões que não vieram no
+    arquivo ficam com ``ativo = 0``. Sem nenhuma mudança nenhuma página é
+    escrita e a versão do banco não muda.
+    Devolve (contagens, segundos).
+    """
+    sincronismo_anterior = conn.execute("PRAGMA synchronous").fetchone()[0]
+    for nome, valor in PRAGMAS_IMPORTACAO:
+        conn.execute("PRAGMA {} = {}".format(nome, valor))
+
+    inicio = time.perf_counter()
+    contagens = {'inseridas': 0, 'atualizadas': 0, 'inalteradas': 0, 'desativadas': 0}
     cursor = conn.cursor()
+    escrevendo = False
 
-    # Limpa dados antigos para evitar duplicatas na re-importação
-    cursor.execute("DELETE FROM questoes")
-    conn.commit()
-    print("Tabela 'questoes' limpa (dados antigos removidos).")
+    def gravar(sql, lote):
+        nonlocal escrevendo
+        if not lote:
+            return
+        if not escrevendo:
+            suspender_controle_versao(cursor)
+            escrevendo = True
+        cursor.executemany(sql, lote)
+        lote.clear()
 
     try:
-        # Usando pandas para facilitar a leitura do CSV
-        df = pd.read_csv(CSV_NAME, encoding='utf-8', sep=';')
-        
-        # Renomeia colunas se necessário (ajuste conforme seu CSV)
-        # Ex: df = df.rename(columns={'Enunciado da Questão': 'enunciado'})
-
-        # Verifica colunas essenciais
-        colunas_essenciais = ['disciplina', 'materia', 'enunciado', 'alternativa_a', 'alternativa_b', 'alternativa_c', 'alternativa_d', 'resposta_correta']
-        for col in colunas_essenciais:
-            if col not in df.columns:
-                print(f"Erro: Coluna essencial '{col}' não encontrada no CSV.")
-                return
-
-        total_importadas = 0
-        for _, row in df.iterrows():
-            alternativas = {
-                'a': row['alternativa_a'],
-                'b': row['alternativa_b'],
-                'c': row['alternativa_c'],
-                'd': row['alternativa_d'],
-            }
-            # Adiciona alternativa 'e' se ela existir no CSV
-            if 'alternativa_e' in df.columns and pd.notna(row['alternativa_e']):
-                alternativas['e'] = row['alternativa_e']
-            
-            alternativas_json = json.dumps(alternativas)
-
-            cursor.execute("""
-            INSERT INTO questoes (disciplina, materia, dificuldade, enunciado, alternativas, resposta_correta, justificativa, dica, formula)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                row.get('disciplina'),
-                row.get('materia'),
-                row.get('dificuldade', 'Média'), # Valor padrão
-                row.get('enunciado'),
-                alternativas_json,
-                str(row.get('resposta_correta')).lower(), # Garante minúscula
-                row.get('justificativa'),
-                row.get('dica'),
-                row.get('formula')
-            ))
-            total_importadas += 1
+        cursor.execute("BEGIN IMMEDIATE")
+        # hash_conteudo -> [(id, hash_linha, ativo)], ativas primeiro;
+        # duplicatas no banco casam uma a uma com duplicatas no arquivo. Com
+        # ``escopo_banca`` só as questões dessa banca podem ser casadas.
+        if escopo_banca is None:
+            linhas = conn.execute("SELECT id, hash_conteudo, hash_linha, ativo FROM questoes ORDER BY ativo DESC, id")
+        else:
+            linhas = conn.execute("SELECT id, hash_conteudo, hash_linha, ativo FROM questoes WHERE banca = ? "
+                                  "ORDER BY ativo DESC, id", (escopo_banca,))
+        existentes = {}
+        for questao_id, hash_conteudo, hash_linha, ativo in linhas:
+            existentes.setdefault(hash_conteudo, []).append((questao_id, hash_linha, ativo))
 
-        conn.commit()
-        print(f"Sucesso! {total_importadas} questões importadas do '{CSV_NAME}' para '{DB_NAME}'.")
+        insercoes, atualizacoes = [], []
+        for registro in registros:
+            hash_conteudo, hash_linha = registro[-2:]
+            candidatos = existentes.get(hash_conteudo)
+            if candidatos:
+                questao_id, hash_anterior, ativo = candidatos.pop(0)
+                if ativo and hash_anterior == hash_linha:
+                    contagens['inalteradas'] += 1
+                    continue
+                atualizacoes.append(registro[:-2] + (hash_linha, questao_id))
+                contagens['atualizadas'] += 1
+                if len(atualizacoes) >= tamanho_lote:
+                    gravar(SQL_ATUALIZAR, atualizacoes)
+            else:
+                insercoes.append(registro)
+                contagens['inseridas'] += 1
+                if len(insercoes) >= tamanho_lote:
+                    gravar(SQL_INSERT, insercoes)
+        gravar(SQL_ATUALIZAR, atualizacoes)
+        gravar(SQL_INSERT, insercoes)
 
-    except Exception as e:
-        print(f"Ocorreu um erro durante a importação: {e}")
+        if desativar_ausentes:
+            ausentes = [(questao_id,) for candidatos in existentes.values()
+                        for questao_id, _, ativo in candidatos if ativo]
+            contagens['desativadas'] = len(ausentes)
+            gravar("UPDATE questoes SET ativo = 0 WHERE id = ?", ausentes)
+
+        if escrevendo:
+            incrementar_versao(cursor)
+            restaurar_controle_versao(cursor)
+        conn.commit()
+    except BaseException:
         conn.rollback()
+        raise
     finally:
-        conn.close()
+        conn.execute("PRAGMA synchronous = {}".format(sincronismo_anterior))
+    return contagens, time.perf_counter() - inicio
 
-if __name__ == "__main__":
-    importar_dados()
+
+def relatar(total, segundos, origem, destino):
+    taxa = total / segundos if segundos > 0 else float('inf')
+    print(f"Sucesso! {total} questões importadas do '{origem}' para '{destino}' "
+          f"em {segundos:.2f}s ({taxa:,.0f} linhas/s).")
+
+
+def relatar_sincronizacao(contagens, segundos, origem, destino):
+    lidas = contagens['inseridas'] + contagens['atualizadas'] + contagens['inalteradas']
+    taxa = lidas / segundos if segundos > 0 else float('inf')
+    print(f"Sucesso! '{origem}' sincronizado com '{destino}' em {segundos:.2f}s ({taxa:,.0f} linhas/s): "
+          f"{contagens['inseridas']} novas, {contagens['atualizadas']} atualizadas, "
+          f"{contagens['inalteradas']} inalteradas, {contagens['desativadas']} desativadas.")
 
 
+def publicar(conn, caminho_db):
+    """Troca o arquivo de questões lido pelo app, se a importação mudou algo."""
+    destino = questoes_publicadas.caminho_publicado(caminho_db)
+    if questoes_publicadas.publicar_se_desatualizado(conn, destino):
+        print(f"Banco de questões publicado em '{destino}'.")
 
 
+def importar_dados(caminho_csv=CSV_NAME, caminho_db=DB_NAME, substituir=False, desativar_ausentes=False):
+    """Importa o CSV de forma incremental (padrão) ou substituindo a tabela inteira.
+
+    A substituição apaga todas as questões e gera ids novos, o que invalida
+    os simulados em andamento; prefira o modo incremental.
+    """
+    if not os.path.exists(caminho_csv):
+        print(f"Erro: Arquivo '{caminho_csv}' não encontrado no diretório.")
+        print("Por favor, crie o arquivo e adicione os dados antes de executar este script.")
+        return
+
+    with open(caminho_csv, mode='r', encoding='utf-8-sig', newline='') as f:
+        cabecalho = [nome.strip() for nome in next(csv.reader(f, delimiter=';'), [])]
+    for col in COLUNAS_ESSENCIAIS:
+        if col not in cabecalho:
+            print(f"Erro: Coluna essencial '{col}' não encontrada no CSV.")
+            return
+
+    conn = sqlite3.connect(caminho_db)
+    criar_tabelas(conn)
+    contadores = {'ignoradas': 0}
+
+    def limpar(cursor):
+        # Limpa dados antigos para evitar duplicatas na re-importação
+        cursor.execute("DELETE FROM questoes")
+
+    try:
+        registros = gerar_registros(ler_csv(caminho_csv), contadores=contadores)
+        if substituir:
+            total, segundos = carregar_registros(conn, registros, antes_de_inserir=limpar)
+            relatar(total, segundos, caminho_csv, caminho_db)
+        else:
+            contagens, segundos = sincronizar_registros(conn, registros, desativar_ausentes=desativar_ausentes)
+            relatar_sincronizacao(contagens, segundos, caminho_csv, caminho_db)
+        if contadores['ignoradas']:
+            print(f"{contadores['ignoradas']} linhas incompletas foram ignoradas.")
+        publicar(conn, caminho_db)
+    except Exception as e:
+        print(f"Ocorreu um erro durante a importação: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa questões de um CSV separado por ';'.")
+    parser.add_argument('csv', nargs='?', default=CSV_NAME)
+    parser.add_argument('db', nargs='?', default=DB_NAME)
+    parser.add_argument('--substituir', action='store_true',
+                        help="apaga todas as questões antes de importar (gera ids novos)")
+    parser.add_argument('--desativar-ausentes', action='store_true',
+                        help="marca como inativas as questões que não estão no CSV")
+    args = parser.parse_args()
+    importar_dados(args.csv, args.db, substituir=args.substituir, desativar_ausentes=args.desativar_ausentes)
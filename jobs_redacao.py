@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""Correções de redação como jobs assíncronos.
+
+``/api/redacao/corrigir-gemini`` só registra o job e responde com o id; um
+pool de threads por processo chama o modelo (``clientes_llm``) fora do
+ciclo da requisição, então um worker do gunicorn não fica preso por
+segundos esperando a API.
+
+O estado de cada job fica na tabela ``jobs_redacao`` (mesmo ``database.db``
+das sessões), para que qualquer worker responda à consulta de status. O
+texto da redação não é gravado: ele só passa pela fila em memória do
+processo que recebeu o job.
+
+A fila é limitada (``capacidade``): com ela cheia, ``submeter`` levanta
+``FilaCheia`` e a rota responde 503, em vez de acumular esperas longas.
+
+Com um ``cache`` (cache_correcoes.py), uma redação já corrigida vira um job
+concluído na hora, e reenvios iguais enquanto o primeiro ainda está na fila
+recebem o mesmo job.
+
+Um job com ``ouvinte`` lê a resposta do modelo em streaming e repassa cada
+competência assim que ela é interpretada (``redacao.corrigir_transmitindo``);
+no fim o ouvinte recebe ``concluido`` com a correção inteira, ou ``erro``.
+"""
+import json
+import math
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import cache_correcoes
+import redacao
+from clientes_llm import ErroLLM
+
+TRABALHADORES = 4
+CAPACIDADE = 32
+TTL_JOB = 60 * 60                 # jobs concluídos ficam consultáveis por 1h
+PRAZO_ORFAO = 10 * 60             # job sem conclusão depois disso: processo morreu
+INTERVALO_CONSULTA = 0.2          # polling do SQLite por jobs de outro processo
+AMOSTRAS_LATENCIA = 512
+
+PENDENTE, EXECUTANDO, CONCLUIDO, ERRO = "pendente", "executando", "concluido", "erro"
+FINAIS = (CONCLUIDO, ERRO)
+
+
+class FilaCheia(Exception):
+    """Todas as posições da fila de correções estão ocupadas."""
+
+
+def _resumo(amostras):
+    if not amostras:
+        return {"media": None, "p95": None, "max": None}
+    ordenadas = sorted(amostras)
+    return {
+        "media": round(sum(ordenadas) / len(ordenadas) * 1000, 1),
+        "p95": round(ordenadas[math.ceil(len(ordenadas) * 0.95) - 1] * 1000, 1),
+        "max": round(ordenadas[-1] * 1000, 1),
+    }
+
+
+class PoolCorrecoes:
+    def __init__(self, conexoes, cliente, trabalhadores=TRABALHADORES, capacidade=CAPACIDADE, ttl=TTL_JOB,
+                 cache=None):
+        # cliente: instância de clientes_llm.ClienteLLM, ou função sem
+        # argumentos que a cria (chamada no primeiro job de cada processo)
+        self.conexoes = conexoes
+        self.cliente = cliente
+        self.cache = cache
+        self.trabalhadores = trabalhadores
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._concluidos = threading.Condition(self._lock)
+        self._pid = None
+        self._fila = None
+        self._threads = []
+        self._threads_criadas = 0
+        self._em_execucao = 0
+        self._em_andamento = {}             # chave do cache -> job ainda não concluído
+        self._esperas = deque(maxlen=AMOSTRAS_LATENCIA)
+        self._servicos = deque(maxlen=AMOSTRAS_LATENCIA)
+        self._primeiros_retornos = deque(maxlen=AMOSTRAS_LATENCIA)
+        self.total_concluidos = 0
+        self.total_erros = 0
+        self.total_rejeitados = 0
+
+    def preparar(self):
+        conn = self.conexoes.obter()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs_redacao (
+            id TEXT PRIMARY KEY,
+            estado TEXT NOT NULL,
+            tema TEXT,
+            resultado TEXT,
+            erro TEXT,
+            criado_em REAL NOT NULL,
+            iniciado_em REAL,
+            concluido_em REAL
+        ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_redacao_criado ON jobs_redacao (criado_em)")
+        conn.commit()
+
+    # -- processo atual ----------------------------------------------------
+
+    def garantir_ativo(self):
+        if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Primeiro job neste processo (ou depois de um fork)
+                self._fila = queue.Queue()
+                self._em_execucao = 0
+                self._em_andamento = {}
+                self._threads = []
+                self._pid = os.getpid()
+            # Completa o pool, repondo trabalhadores que tenham morrido
+            vivas = [thread for thread in self._threads if thread.is_alive()]
+            novas = []
+            for _ in range(self.trabalhadores - len(vivas)):
+                self._threads_criadas += 1
+                novas.append(threading.Thread(target=self._executar, daemon=True,
+                                              name='correcao-redacao-{}'.format(self._threads_criadas)))
+            self._threads = vivas + novas
+            for thread in novas:
+                thread.start()
+
+    def _cliente(self):
+        if callable(self.cliente) and not hasattr(self.cliente, 'gerar'):
+            with self._lock:
+                if not hasattr(self.cliente, 'gerar'):
+                    self.cliente = self.cliente()
+        return self.cliente
+
+    def submeter(self, tema, texto, ouvinte=None):
+        """Registra o job e o põe na fila; devolve (id, veio do cache).
+
+        ``ouvinte(evento, dados)`` recebe os eventos do streaming; jobs com
+        ouvinte não são agrupados com reenvios iguais.
+
+        Levanta ``FilaCheia`` ou, se o cliente do modelo não puder ser
+        criado, ``ErroLLM``.
+        """
+        self.garantir_ativo()
+        chave = None
+        if self.cache is not None:
+            chave = cache_correcoes.chave(tema, texto, redacao.VERSAO_RUBRICA, self._cliente().identificador)
+            correcao = self.cache.obter(chave)
+            if correcao is not None:
+                return self._registrar(tema, CONCLUIDO, json.dumps(correcao, ensure_ascii=False)), True
+        with self._lock:
+            existente = self._em_andamento.get(chave) if chave is not None and ouvinte is None else None
+            if existente is not None:
+                return existente, False
+            if self._fila.qsize() + self._em_execucao >= self.capacidade:
+                self.total_rejeitados += 1
+                raise FilaCheia()
+            job_id = self._registrar(tema, PENDENTE)
+            if chave is not None and ouvinte is None:
+                self._em_andamento[chave] = job_id
+        self._fila.put((job_id, tema, texto, chave, ouvinte, time.monotonic()))
+        return job_id, False
+
+    def _registrar(self, tema, estado, resultado=None):
+        job_id = secrets.token_urlsafe(16)
+        agora = time.time()
+        concluido_em = agora if estado == CONCLUIDO else None
+        conn = self.conexoes.obter()
+        with conn:
+            conn.execute("INSERT INTO jobs_redacao (id, estado, tema, resultado, criado_em, iniciado_em, concluido_em) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", (job_id, estado, tema, resultado, agora, concluido_em, concluido_em))
+        return job_id
+
+    def _executar(self):
+        while True:
+            job_id, tema, texto, chave, ouvinte, enfileirado = self._fila.get()
+            inicio = time.monotonic()
+            with self._lock:
+                self._em_execucao += 1
+                self._esperas.append(inicio - enfileirado)
+            finalizado = False
+            try:
+                self._marcar(job_id, EXECUTANDO, iniciado_em=time.time())
+                try:
+                    cliente = self._cliente()
+                    if ouvinte is None:
+                        correcao, modelo = redacao.corrigir(cliente, tema, texto)
+                    else:
+                        correcao, modelo = redacao.corrigir_transmitindo(
+                            cliente, tema, texto, self._medir_primeiro_retorno(ouvinte, inicio))
+                    duracao = time.monotonic() - inicio
+                except (ErroLLM, ValueError) as e:
+                    erro = f"Erro ao processar correção com IA: {e}"
+                    self._marcar(job_id, ERRO, erro=erro, concluido_em=time.time())
+                    finalizado = True
+                    self.total_erros += 1
+                    if ouvinte is not None:
+                        ouvinte("erro", {"job_id": job_id, "erro": erro})
+                else:
+                    self._marcar(job_id, CONCLUIDO, resultado=json.dumps(correcao, ensure_ascii=False),
+                                 concluido_em=time.time())
+                    finalizado = True
+                    self.total_concluidos += 1
+                    if ouvinte is not None:
+                        ouvinte("concluido", correcao)
+                    # Resposta da reserva (gateway_llm) não fica no cache do modelo principal
+                    if chave is not None and modelo == cliente.identificador:
+                        self.cache.guardar(chave, redacao.VERSAO_RUBRICA, cliente.identificador, correcao, duracao)
+            except sqlite3.Error as e:
+                print(f"Erro ao gravar job de correção {job_id}: {e}")
+                if ouvinte is not None and not finalizado:
+                    ouvinte("erro", {"job_id": job_id, "erro": f"Erro ao gravar correção: {e}"})
+            except Exception as e:
+                # Falha não prevista (bug, erro inesperado do cliente): o job
+                # termina em erro e a thread continua atendendo a fila
+                print(f"Erro inesperado no job de correção {job_id}: {e!r}")
+                if not finalizado:
+                    erro = f"Erro inesperado ao processar correção: {e}"
+                    self.total_erros += 1
+                    try:
+                        self._marcar(job_id, ERRO, erro=erro, concluido_em=time.time())
+                    except sqlite3.Error:
+                        pass  # o Varredor encerra o job como órfão
+                    if ouvinte is not None:
+                        ouvinte("erro", {"job_id": job_id, "erro": erro})
+            finally:
+                with self._lock:
+                    self._em_execucao -= 1
+                    if self._em_andamento.get(chave) == job_id:
+                        del self._em_andamento[chave]
+                    self._servicos.append(time.monotonic() - inicio)
+                    self._concluidos.notify_all()
+
+    def _medir_primeiro_retorno(self, ouvinte, inicio):
+        # Tempo até a primeira competência chegar ao ouvinte
+        primeiro = []
+
+        def avisar(evento, dados):
+            if evento == "competencia" and not primeiro:
+                primeiro.append(True)
+                with self._lock:
+                    self._primeiros_retornos.append(time.monotonic() - inicio)
+            ouvinte(evento, dados)
+        return avisar
+
+    def _marcar(self, job_id, estado, **campos):
+        colunas = ", ".join("{} = ?".format(nome) for nome in campos)
+        conn = self.conexoes.obter()
+        with conn:
+            conn.execute("UPDATE jobs_redacao SET estado = ?{} WHERE id = ?".format(", " + colunas if colunas else ""),
+                         (estado, *campos.values(), job_id))
+
+    # -- consulta ----------------------------------------------------------
+
+    def obter(self, job_id):
+        """Dicionário com o estado do job, ou None se não existe (ou expirou)."""
+        row = self.conexoes.obter().execute(
+            "SELECT id, estado, resultado, erro, criado_em, iniciado_em, concluido_em FROM jobs_redacao WHERE id = ?",
+            (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {"job_id": row[0], "estado": row[1]}
+        if row[2] is not None:
+            job["correcao"] = json.loads(row[2])
+        if row[3] is not None:
+            job["erro"] = row[3]
+        if row[5] is not None:
+            job["espera_s"] = round(row[5] - row[4], 3)
+        if row[6] is not None and row[5] is not None:
+            job["duracao_s"] = round(row[6] - row[5], 3)
+        return job
+
+    def aguardar(self, job_id, timeout):
+        """Como ``obter``, mas espera até ``timeout`` segundos o job terminar."""
+        limite = time.monotonic() + timeout
+        while True:
+            job = self.obter(job_id)
+            restante = limite - time.monotonic()
+            if job is None or job["estado"] in FINAIS or restante <= 0:
+                return job
+            with self._lock:
+                # Jobs deste processo avisam ao terminar; os de outros
+                # processos são consultados de novo no intervalo
+                self._concluidos.wait(min(restante, INTERVALO_CONSULTA))
+
+    def expirar(self):
+        """Apaga jobs vencidos e encerra os órfãos; chamado pelo ``Varredor``."""
+        agora = time.time()
+        conn = self.conexoes.obter()
+        with conn:
+            conn.execute("UPDATE jobs_redacao SET estado = ?, erro = ?, concluido_em = ? "
+                         "WHERE estado IN (?, ?) AND criado_em < ?",
+                         (ERRO, "Correção interrompida. Envie a redação novamente.", agora,
+                          PENDENTE, EXECUTANDO, agora - PRAZO_ORFAO))
+            return conn.execute("DELETE FROM jobs_redacao WHERE criado_em < ?", (agora - self.ttl,)).rowcount
+
+    def metricas(self):
+        cache = self.cache.metricas() if self.cache is not None else None
+        cliente = self.cliente.metricas() if hasattr(self.cliente, 'metricas') else None
+        with self._lock:
+            return {
+                "trabalhadores": self.trabalhadores,
+                "capacidade": self.capacidade,
+                "profundidade_fila": self._fila.qsize() if self._fila is not None else 0,
+                "em_execucao": self._em_execucao,
+                "concluidos": self.total_concluidos,
+                "erros": self.total_erros,
+                "rejeitados": self.total_rejeitados,
+                "espera_ms": _resumo(self._esperas),
+                "servico_ms": _resumo(self._servicos),
+                "primeira_competencia_ms": _resumo(self._primeiros_retornos),
+                "cache": cache,
+                "cliente": cliente,
+            }
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Analisador JSON incremental (push) para saídas de modelo em streaming.
+
+``alimentar(pedaco)`` consome o texto recebido até agora e devolve os
+valores que ficaram completos nele, como ``(caminho, valor)``: para
+``{"a": [1, {"b": 2}]}`` saem ``(("a", 0), 1)``, ``(("a", 1, "b"), 2)``,
+``(("a", 1), {"b": 2})``, ``(("a",), [...])`` e ``((), {...})``. Cada
+caractere é lido uma única vez, então o custo total é linear no tamanho da
+resposta, não no número de pedaços.
+
+Texto antes do primeiro ``{``/``[`` (como a cerca ```json de alguns modelos)
+e depois do valor completo é ignorado.
+"""
+import json
+import re
+
+_ESPACOS = frozenset(" \t\r\n")
+_FIM_STRING = re.compile(r'["\\]')
+_FIM_ESCALAR = re.compile(r'[\s,\]}]')
+_LITERAIS = {"true": True, "false": False, "null": None}
+
+
+class AnalisadorIncremental:
+    def __init__(self):
+        # Cada nível aberto: [container, caminho, chave pendente, esperando chave]
+        self._pilha = []
+        self._token = None           # "string" ou "escalar" em andamento
+        self._partes = []
+        self._escape = False
+        self._iniciado = False
+        self.concluido = False
+        self.valor = None
+
+    def alimentar(self, pedaco):
+        completos = []
+        i, n = 0, len(pedaco)
+        while i < n and not self.concluido:
+            if self._token == "string":
+                i = self._ler_string(pedaco, i, completos)
+                continue
+            if self._token == "escalar":
+                fim = _FIM_ESCALAR.search(pedaco, i)
+                if fim is None:
+                    self._partes.append(pedaco[i:])
+                    break
+                self._partes.append(pedaco[i:fim.start()])
+                self._fechar_escalar(completos)
+                i = fim.start()
+                continue
+
+            c = pedaco[i]
+            i += 1
+            if not self._iniciado:
+                if c in "{[":
+                    self._iniciado = True
+                    self._abrir({} if c == "{" else [])
+                continue
+            if c in _ESPACOS:
+                continue
+            if c in "{[":
+                self._abrir({} if c == "{" else [])
+            elif c in "}]":
+                self._fechar(c, completos)
+            elif c == ",":
+                nivel = self._nivel()
+                if isinstance(nivel[0], dict):
+                    nivel[3] = True
+            elif c == ":":
+                nivel = self._nivel()
+                if not isinstance(nivel[0], dict) or nivel[2] is None:
+                    raise ValueError("':' fora de um par chave/valor.")
+            elif c == '"':
+                self._token, self._partes, self._escape = "string", [], False
+            else:
+                self._token, self._partes = "escalar", [c]
+        return completos
+
+    def fim(self):
+        """Valor completo; ValueError se o texto terminou antes dele."""
+        if not self.concluido:
+            raise ValueError("JSON incompleto na resposta do modelo.")
+        return self.valor
+
+    # -- interno -----------------------------------------------------------
+
+    def _nivel(self):
+        if not self._pilha:
+            raise ValueError("JSON inválido na resposta do modelo.")
+        return self._pilha[-1]
+
+    def _caminho_filho(self):
+        if not self._pilha:
+            return ()
+        container, caminho, chave, _ = self._pilha[-1]
+        if isinstance(container, dict):
+            if chave is None:
+                raise ValueError("Valor sem chave em objeto JSON.")
+            return caminho + (chave,)
+        return caminho + (len(container),)
+
+    def _abrir(self, container):
+        self._pilha.append([container, self._caminho_filho(), None, isinstance(container, dict)])
+
+    def _fechar(self, c, completos):
+        container, caminho, _, _ = self._nivel()
+        if isinstance(container, dict) != (c == "}"):
+            raise ValueError("Fechamento '{}' não corresponde ao JSON aberto.".format(c))
+        self._pilha.pop()
+        self._completar(caminho, container, completos)
+
+    def _ler_string(self, pedaco, i, completos):
+        while True:
+            if self._escape:
+                if i >= len(pedaco):
+                    return i
+                self._partes.append(pedaco[i])
+                self._escape = False
+                i += 1
+            especial = _FIM_STRING.search(pedaco, i)
+            if especial is None:
+                self._partes.append(pedaco[i:])
+                return len(pedaco)
+            j = especial.start()
+            self._partes.append(pedaco[i:j + 1])
+            if pedaco[j] == "\\":
+                self._escape = True
+                i = j + 1
+                continue
+            # Aspas finais: decodifica só este token
+            texto = json.loads('"' + "".join(self._partes))
+            self._token = None
+            nivel = self._pilha[-1]
+            if isinstance(nivel[0], dict) and nivel[3]:
+                nivel[2], nivel[3] = texto, False
+            else:
+                self._completar(self._caminho_filho(), texto, completos)
+            return j + 1
+
+    def _fechar_escalar(self, completos):
+        bruto = "".join(self._partes)
+        self._token = None
+        if bruto in _LITERAIS:
+            valor = _LITERAIS[bruto]
+        else:
+            try:
+                valor = json.loads(bruto)
+            except json.JSONDecodeError:
+                raise ValueError("Valor inválido no JSON: {!r}".format(bruto)) from None
+            if not isinstance(valor, (int, float)):
+                raise ValueError("Valor inválido no JSON: {!r}".format(bruto))
+        self._completar(self._caminho_filho(), valor, completos)
+
+    def _completar(self, caminho, valor, completos):
+        if self._pilha:
+            container, _, chave, _ = self._pilha[-1]
+            if isinstance(container, dict):
+                container[chave] = valor
+                self._pilha[-1][2] = None
+            else:
+                container.append(valor)
+        else:
+            self.concluido = True
+            self.valor = valor
+        completos.append((caminho, valor))
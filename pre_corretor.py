@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""Pré-correção de redações, local e determinística.
+
+Sem modelo de linguagem: uma única passada pelo texto mede palavras,
+parágrafos, tamanho das frases, conectivos por categoria, diversidade
+lexical, palavras do tema presentes no texto, marcas de repertório,
+desvios de registro e os elementos da proposta de intervenção (agente,
+ação, meio, finalidade, detalhamento). Os indicadores viram as notas das
+cinco competências, no mesmo formato da correção feita pelo modelo
+(``redacao.PROMPT``).
+
+Leva uma fração de milissegundo por redação. Serve de resposta imediata
+enquanto o modelo corrige e de corretor quando não há modelo configurado
+(``clientes_llm.ClienteHeuristico``).
+
+Lote: ``avaliar_lote`` ou, pela linha de comando,
+
+    python pre_corretor.py redacoes.jsonl [saida.jsonl] [--processos N]
+    python pre_corretor.py --benchmark [quantidade]
+
+com uma redação por linha: {"tema": "...", "texto": "..."}.
+"""
+import json
+import math
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+
+from redacao import COMPETENCIAS
+
+VERSAO = "1"
+
+_MARCAS = re.compile("[\u0300-\u036f]")     # acentos separados pelo NFD
+
+_TOKENS = re.compile(r"\w+|[.!?]+|\n+|[\"“”«»]")
+_ASPAS = frozenset("\"“”«»")
+_FIM_FRASE = frozenset(".!?")
+_INICIO_FRASE_MINUSCULA = re.compile(r"(?:^|[.!?][ \t]+|\n[ \t]*)[a-zà-ÿ]")
+
+MINIMO_PALAVRAS = 60          # abaixo disso o texto é considerado insuficiente
+PALAVRAS_IDEAL = (250, 450)
+PARAGRAFOS_IDEAL = (4, 5)
+FRASE_LONGA = 45
+FRASE_CURTA = 4
+
+PALAVRAS_VAZIAS = frozenset("""
+    a o as os um uma uns umas de da do das dos e ou em no na nos nas ao aos
+    para por pela pelo pelas pelos com sem sobre que se sua seu suas seus
+    como mais entre ser nao sao esse essa este esta isso isto
+""".split())
+
+
+def _frases(categoria, *frases):
+    return {tuple(frase.split()): categoria for frase in frases}
+
+
+CONECTIVOS = {
+    **_frases("adicao", "alem disso", "ademais", "tambem", "outrossim", "nao so", "bem como",
+              "alem de", "ainda"),
+    **_frases("oposicao", "entretanto", "contudo", "todavia", "porem", "no entanto", "mas",
+              "embora", "apesar de", "ainda que", "por outro lado", "em contrapartida"),
+    **_frases("causa", "porque", "visto que", "uma vez que", "ja que", "pois", "dado que",
+              "devido a", "em virtude de", "em razao de", "haja vista"),
+    **_frases("conclusao", "portanto", "logo", "dessa forma", "desse modo", "em suma", "por conseguinte",
+              "assim sendo", "diante disso", "em sintese", "por fim", "consequentemente"),
+    **_frases("exemplificacao", "por exemplo", "a exemplo de", "como exemplo", "isto e", "ou seja",
+              "a saber", "tal como"),
+    **_frases("sequencia", "primeiramente", "em primeiro lugar", "em segundo lugar", "inicialmente",
+              "em seguida", "posteriormente", "finalmente"),
+}
+CATEGORIAS_CONECTIVOS = ("adicao", "oposicao", "causa", "conclusao", "exemplificacao", "sequencia")
+
+INTERVENCAO = {
+    **_frases("agente", "governo", "estado", "ministerio", "ministerio da educacao", "poder publico",
+              "escolas", "escola", "midia", "sociedade civil", "ongs", "familia", "familias",
+              "congresso", "prefeituras", "empresas", "instituicoes"),
+    **_frases("acao", "deve", "devem", "cabe", "e necessario", "e preciso", "e fundamental", "urge",
+              "promover", "criar", "implementar", "ampliar", "fiscalizar", "investir", "desenvolver"),
+    **_frases("meio", "por meio de", "por meio da", "por meio do", "mediante", "atraves de", "atraves da",
+              "atraves do", "por intermedio de", "com o auxilio de", "via"),
+    **_frases("finalidade", "a fim de", "para que", "com o intuito de", "com o objetivo de", "de modo a",
+              "com a finalidade de", "visando", "no intuito de"),
+    **_frases("detalhamento", "ou seja", "isto e", "a exemplo de", "sobretudo", "especialmente", "inclusive"),
+}
+ELEMENTOS_INTERVENCAO = ("agente", "acao", "meio", "finalidade", "detalhamento")
+
+REPERTORIO = frozenset("""
+    segundo conforme constituicao lei leis pesquisa pesquisas dados ibge oms onu unesco
+    filosofo sociologo historiador pensador autor obra livro estudo estudos relatorio
+    declaracao artigo estatuto ipea datafolha
+""".split())
+
+INFORMAL = frozenset("vc vcs pq tb tbm ne ta to pra pro pros pras tipo ai blz msm oq kkk".split())
+
+MAIOR_FRASE = max(len(chave) for chave in list(CONECTIVOS) + list(INTERVENCAO))
+
+# Frases indexadas pela última palavra: a maioria das palavras não fecha
+# nenhuma e custa uma consulta só
+_POR_ULTIMA = {}
+for _frase, _categoria in CONECTIVOS.items():
+    _POR_ULTIMA.setdefault(_frase[-1], []).append((len(_frase), _frase, _categoria, None))
+for _frase, _elemento in INTERVENCAO.items():
+    _POR_ULTIMA.setdefault(_frase[-1], []).append((len(_frase), _frase, None, _elemento))
+for _candidatas in _POR_ULTIMA.values():
+    _candidatas.sort(key=lambda candidata: -candidata[0])    # mais longas primeiro
+
+
+def palavras_do_tema(tema):
+    normalizado = normalizar(tema)
+    # Radical curto (5 letras) para casar "educação"/"educacional"
+    return {p[:5] for p in re.findall(r"\w+", normalizado) if len(p) > 3 and p not in PALAVRAS_VAZIAS}
+
+
+def normalizar(texto):
+    """Minúsculas sem acentos (o que sobra fora do ASCII, como aspas curvas, fica)."""
+    return _MARCAS.sub("", unicodedata.normalize("NFD", texto.lower()))
+
+
+def indicadores(tema, texto):
+    """Indicadores do texto.
+
+    Uma passada em Python pelos tokens cuida do que depende da ordem
+    (frases, parágrafos, conectivos de várias palavras, repetições
+    seguidas); o vocabulário é contado em C por ``Counter``.
+    """
+    radicais_tema = palavras_do_tema(tema)
+    palavras = []
+    frases = []
+    paragrafos = []                       # palavras por parágrafo
+    inicio_frase = inicio_paragrafo = 0   # índices em ``palavras``
+    conectivos = dict.fromkeys(CATEGORIAS_CONECTIVOS, 0)
+    intervencao = dict.fromkeys(ELEMENTOS_INTERVENCAO, 0)
+    intervencao_paragrafo = set()          # elementos no parágrafo atual
+    intervencao_final = 0                  # elementos no último parágrafo fechado
+    aspas = 0
+    repeticoes_seguidas = 0
+    anterior = None
+    ultimo_conectivo = None                # (índice da última palavra, categoria)
+
+    for p in _TOKENS.findall(normalizar(texto)):
+        inicio = p[0]
+        if inicio in _FIM_FRASE or inicio == "\n":
+            if len(palavras) > inicio_frase:
+                frases.append(len(palavras) - inicio_frase)
+                inicio_frase = len(palavras)
+            if inicio == "\n" and len(palavras) > inicio_paragrafo:
+                paragrafos.append(len(palavras) - inicio_paragrafo)
+                inicio_paragrafo = len(palavras)
+                intervencao_final = len(intervencao_paragrafo)
+                intervencao_paragrafo.clear()
+            anterior = None
+        elif inicio in _ASPAS:
+            aspas += 1
+        else:
+            palavras.append(p)
+            if p == anterior:
+                repeticoes_seguidas += 1
+            anterior = p
+            # Conectivos e marcas de intervenção que terminam nesta palavra,
+            # sem atravessar o fim da frase
+            candidatas = _POR_ULTIMA.get(p)
+            if candidatas is not None:
+                disponiveis = len(palavras) - inicio_frase
+                conectivo = None
+                for n, frase, categoria, elemento in candidatas:
+                    if n == 1 or (n <= disponiveis and tuple(palavras[-n:]) == frase):
+                        if categoria is None:
+                            intervencao[elemento] += 1
+                            intervencao_paragrafo.add(elemento)
+                        elif conectivo is None:
+                            conectivo = n, categoria
+                if conectivo is not None:
+                    # Só o conectivo mais longo conta: "ainda que" desfaz o
+                    # "ainda" já contado na palavra anterior
+                    n, categoria = conectivo
+                    if ultimo_conectivo is not None and ultimo_conectivo[0] >= len(palavras) - n:
+                        conectivos[ultimo_conectivo[1]] -= 1
+                    conectivos[categoria] += 1
+                    ultimo_conectivo = len(palavras) - 1, categoria
+    if len(palavras) > inicio_frase:
+        frases.append(len(palavras) - inicio_frase)
+    if len(palavras) > inicio_paragrafo:
+        paragrafos.append(len(palavras) - inicio_paragrafo)
+        intervencao_final = len(intervencao_paragrafo)
+
+    contagem = Counter(palavras)
+    numeros = sum(n for p, n in contagem.items() if p.isdigit())
+    tipos = len(contagem) - sum(1 for p in contagem if p.isdigit())
+    conteudo = {p: n for p, n in contagem.items() if len(p) > 2 and p not in PALAVRAS_VAZIAS and not p.isdigit()}
+    radicais_presentes = {p[:5] for p in contagem if len(p) > 3 and p[:5] in radicais_tema}
+    total = len(palavras)
+    media_frase = total / len(frases) if frases else 0.0
+    desvio_frase = math.sqrt(sum((f - media_frase) ** 2 for f in frases) / len(frases)) if frases else 0.0
+    total_conteudo = sum(conteudo.values())
+    return {
+        "palavras": total,
+        "paragrafos": len(paragrafos),
+        "frases": len(frases),
+        "media_palavras_frase": round(media_frase, 1),
+        "desvio_palavras_frase": round(desvio_frase, 1),
+        "frases_longas": sum(1 for f in frases if f > FRASE_LONGA),
+        "frases_curtas": sum(1 for f in frases if f < FRASE_CURTA),
+        "conectivos": conectivos,
+        "diversidade_lexical": round(tipos / math.sqrt(total), 2) if total else 0.0,
+        "repeticao_maxima": round(max(conteudo.values()) / total_conteudo, 3) if total_conteudo else 0.0,
+        "cobertura_tema": round(len(radicais_presentes) / len(radicais_tema), 2) if radicais_tema else 0.0,
+        "ocorrencias_tema": sum(n for p, n in contagem.items() if len(p) > 3 and p[:5] in radicais_tema),
+        "repertorio": sum(contagem[p] for p in REPERTORIO.intersection(contagem)) + numeros + aspas // 2,
+        "intervencao": {e: intervencao[e] > 0 for e in ELEMENTOS_INTERVENCAO},
+        "intervencao_paragrafo_final": intervencao_final,
+        "desvios": sum(contagem[p] for p in INFORMAL.intersection(contagem)) + repeticoes_seguidas
+                   + len(_INICIO_FRASE_MINUSCULA.findall(texto)),
+    }
+
+
+def _limitar(valor, minimo=0, maximo=20):
+    return int(round(max(minimo, min(maximo, valor))))
+
+
+def _faixa(valor, ideal, pontos):
+    # Pontos cheios dentro da faixa ideal, caindo proporcionalmente fora dela
+    baixo, alto = ideal
+    if valor < baixo:
+        return pontos * valor / baixo
+    if valor > alto:
+        return max(0.0, pontos * (1 - (valor - alto) / alto))
+    return float(pontos)
+
+
+def _competencias(ind):
+    palavras = max(ind["palavras"], 1)
+    frases = max(ind["frases"], 1)
+    categorias = sum(1 for n in ind["conectivos"].values() if n)
+    total_conectivos = sum(ind["conectivos"].values())
+    elementos = sum(ind["intervencao"].values())
+
+    c1 = 20 - ind["desvios"] * 100 / palavras * 2 - ind["frases_longas"] * 2 - ind["frases_curtas"] \
+        - max(0, ind["media_palavras_frase"] - 30) / 2
+    c2 = 4 + 7 * min(1.0, ind["cobertura_tema"] * 1.5) + _faixa(ind["paragrafos"], PARAGRAFOS_IDEAL, 5) \
+        + _faixa(ind["palavras"], PALAVRAS_IDEAL, 4)
+    c3 = 4 + min(6, ind["repertorio"] * 1.5) + min(5, (ind["conectivos"]["causa"] + ind["conectivos"]["exemplificacao"]) * 1.25) \
+        + min(5, max(0.0, ind["diversidade_lexical"] - 5) * 1.0)
+    c4 = 4 + categorias * 2 + min(4, total_conectivos / frases * 6) - max(0.0, ind["repeticao_maxima"] - 0.04) * 100
+    c5 = elementos * 3.2 + min(4, ind["intervencao_paragrafo_final"])
+    return [_limitar(c1, 4), _limitar(c2), _limitar(c3), _limitar(c4), _limitar(c5)]
+
+
+COMENTARIOS = (
+    lambda ind: "{} desvio(s) de registro ou digitação detectados; {} frase(s) muito longa(s).".format(
+        ind["desvios"], ind["frases_longas"]),
+    lambda ind: "{} parágrafo(s), {} palavras; {:.0%} das palavras-chave do tema aparecem no texto.".format(
+        ind["paragrafos"], ind["palavras"], ind["cobertura_tema"]),
+    lambda ind: "{} marca(s) de repertório (dados, citações, referências); diversidade lexical {}.".format(
+        ind["repertorio"], ind["diversidade_lexical"]),
+    lambda ind: "Conectivos usados: {}.".format(
+        ", ".join("{} ({})".format(c, n) for c, n in ind["conectivos"].items() if n) or "nenhum"),
+    lambda ind: "Elementos da proposta encontrados: {}.".format(
+        ", ".join(e for e, presente in ind["intervencao"].items() if presente) or "nenhum"),
+)
+
+
+def _observacoes(ind, notas):
+    fortes, fracos, sugestoes = [], [], []
+    if notas[1] >= 15:
+        fortes.append("Texto aderente ao tema e com estrutura dissertativa adequada")
+    if ind["cobertura_tema"] < 0.5:
+        fracos.append("Pouca relação explícita com as palavras-chave do tema")
+        sugestoes.append("Retome o tema com suas palavras na introdução e na conclusão")
+    if not PARAGRAFOS_IDEAL[0] <= ind["paragrafos"] <= PARAGRAFOS_IDEAL[1]:
+        fracos.append("Número de parágrafos fora do esperado (introdução, 2 desenvolvimentos e conclusão)")
+        sugestoes.append("Organize o texto em 4 ou 5 parágrafos")
+    if notas[2] >= 15:
+        fortes.append("Argumentação sustentada por repertório")
+    elif ind["repertorio"] < 2:
+        fracos.append("Repertório sociocultural limitado")
+        sugestoes.append("Inclua dados, leis ou autores que sustentem os argumentos")
+    if notas[3] >= 15:
+        fortes.append("Boa variedade de conectivos")
+    else:
+        sugestoes.append("Varie os conectivos entre parágrafos (adição, oposição, conclusão)")
+    faltando = [e for e, presente in ind["intervencao"].items() if not presente]
+    if not faltando:
+        fortes.append("Proposta de intervenção completa")
+    else:
+        fracos.append("Proposta de intervenção sem: {}".format(", ".join(faltando)))
+        sugestoes.append("Detalhe a proposta com agente, ação, meio, finalidade e detalhamento")
+    if ind["frases_longas"]:
+        sugestoes.append("Divida os períodos muito longos")
+    dicas = ["Revise concordância e pontuação antes de entregar",
+             "Use o último parágrafo para a proposta de intervenção"]
+    return fortes or ["Texto com estrutura reconhecível"], fracos, sugestoes, dicas
+
+
+def avaliar(tema, texto):
+    """Correção no formato de ``redacao.PROMPT``, com os indicadores usados."""
+    ind = indicadores(tema, texto)
+    if ind["palavras"] < MINIMO_PALAVRAS:
+        notas = [0] * 5
+        comentarios = ["Texto insuficiente ({} palavras; mínimo {}).".format(ind["palavras"], MINIMO_PALAVRAS)] * 5
+        fortes, fracos = [], ["Texto insuficiente para avaliação"]
+        sugestoes, dicas = ["Desenvolva introdução, argumentos e conclusão"], []
+    else:
+        notas = _competencias(ind)
+        comentarios = [comentar(ind) for comentar in COMENTARIOS]
+        fortes, fracos, sugestoes, dicas = _observacoes(ind, notas)
+    return {
+        "nota_final": sum(notas),
+        "analise_competencias": [
+            {"competencia": competencia, "nota": nota, "comentario": comentario}
+            for competencia, nota, comentario in zip(COMPETENCIAS, notas, comentarios)
+        ],
+        "pontos_fortes": fortes,
+        "pontos_fracos": fracos,
+        "sugestoes_melhoria": sugestoes,
+        "dicas_concursos": dicas,
+        "indicadores": ind,
+    }
+
+
+def _avaliar_item(item):
+    return avaliar(item["tema"], item["texto"])
+
+
+def avaliar_lote(itens, processos=1, tamanho_bloco=256):
+    """Avalia dicionários {"tema", "texto"}, na ordem; ``processos`` > 1 usa multiprocessing."""
+    if processos <= 1:
+        for item in itens:
+            yield _avaliar_item(item)
+        return
+    import multiprocessing
+    with multiprocessing.Pool(processos) as pool:
+        yield from pool.imap(_avaliar_item, itens, chunksize=tamanho_bloco)
+
+
+REDACAO_EXEMPLO = """A educação financeira ainda é pouco presente nas escolas brasileiras. Segundo dados do Banco Central, {n} por cento das famílias estão endividadas, o que revela a urgência do tema.
+
+Em primeiro lugar, a falta de planejamento leva ao consumo impulsivo. Além disso, o crédito fácil agrava o problema, visto que juros altos corroem a renda. Por exemplo, o cartão rotativo cobra taxas abusivas.
+
+Por outro lado, iniciativas como a Base Nacional Comum Curricular já preveem o tema. No entanto, a implementação é lenta, pois faltam professores capacitados.
+
+Portanto, cabe ao Ministério da Educação promover a formação docente, por meio de cursos gratuitos, a fim de que os jovens aprendam a planejar o orçamento, ou seja, evitem dívidas desnecessárias."""
+
+
+def _benchmark(quantidade, processos):
+    itens = [{"tema": "Educação financeira nas escolas", "texto": REDACAO_EXEMPLO.format(n=i % 100)}
+             for i in range(quantidade)]
+    inicio = time.perf_counter()
+    for _ in avaliar_lote(itens, processos):
+        pass
+    decorrido = time.perf_counter() - inicio
+    print("{} redações em {:.2f} s: {:.3f} ms por redação, {:.0f} redações/s ({} processo(s))".format(
+        quantidade, decorrido, decorrido / quantidade * 1000, quantidade / decorrido, processos))
+
+
+def main():
+    argumentos = sys.argv[1:]
+    processos = 1
+    if "--processos" in argumentos:
+        i = argumentos.index("--processos")
+        processos = int(argumentos[i + 1])
+        del argumentos[i:i + 2]
+    if argumentos and argumentos[0] == "--benchmark":
+        _benchmark(int(argumentos[1]) if len(argumentos) > 1 else 20000, processos)
+        return
+    if not argumentos:
+        print(__doc__)
+        return
+
+    with open(argumentos[0], encoding="utf-8") as entrada:
+        itens = [json.loads(linha) for linha in entrada if linha.strip()]
+    saida = open(argumentos[1], "w", encoding="utf-8") if len(argumentos) > 1 else sys.stdout
+    inicio = time.perf_counter()
+    try:
+        for item, correcao in zip(itens, avaliar_lote(itens, processos)):
+            saida.write(json.dumps({"id": item.get("id"), **correcao}, ensure_ascii=False) + "\n")
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    decorrido = time.perf_counter() - inicio
+    print("{} redações avaliadas em {:.2f} s".format(len(itens), decorrido), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Cópia somente leitura do banco de questões servida pelo app.
+
+As importações continuam escrevendo em ``database.db`` (questões, taxonomia,
+triggers de versão), que também recebe os resultados, sessões e agregados.
+Os workers, porém, leem as questões de um arquivo separado (``questoes.db``
+ou ``QUESTOES_DB_PATH``) aberto com ``immutable=1``: sem locks, sem WAL e
+sem verificar mudanças a cada leitura, então commits e checkpoints do lado
+dos resultados não atrasam a carga do snapshot.
+
+``publicar`` gera o arquivo inteiro num temporário ao lado do destino e o
+troca com ``os.replace``. Quem já tinha o arquivo aberto continua lendo o
+inode antigo; ``FonteBancoQuestoes`` percebe o inode novo e recarrega.
+Antes da troca, o mesmo conteúdo é compilado em ``questoes.bin``
+(banco_binario.py), que os workers mapeiam em memória. O arquivo publicado
+também leva o índice de busca textual ``questoes_busca`` (busca.py).
+
+    python questoes_publicadas.py        publica a partir de DATABASE_PATH
+"""
+import os
+import sqlite3
+
+import banco_binario
+import banco_questoes
+import busca
+import taxonomia
+
+# Tabelas copiadas (só as linhas ativas de ``questoes``)
+TABELAS = ("questoes", "areas", "disciplinas", "versao_banco")
+
+NOME_ARQUIVO = "questoes.db"
+
+# PRAGMA user_version do arquivo publicado; mudar força a republicação de
+# arquivos gerados por versões anteriores (2: índice de busca FTS5)
+FORMATO = 2
+
+
+class BancoIndisponivel(Exception):
+    """O arquivo publicado ainda não existe ou não pôde ser lido."""
+
+
+def caminho_publicado(caminho_db):
+    """``QUESTOES_DB_PATH`` ou ``questoes.db`` na pasta do banco de trabalho."""
+    return os.environ.get('QUESTOES_DB_PATH') or os.path.join(os.path.dirname(caminho_db), NOME_ARQUIVO)
+
+
+def caminho_binario(caminho_publicado):
+    return os.path.splitext(caminho_publicado)[0] + ".bin"
+
+
+def conectar(caminho):
+    """Conexão somente leitura, sem locks, ao arquivo publicado."""
+    return sqlite3.connect("file:{}?mode=ro&immutable=1".format(caminho), uri=True, check_same_thread=False)
+
+
+def versao_publicada(caminho):
+    """``versao_banco`` do arquivo publicado, ou None se ausente ou de outro formato."""
+    if not os.path.exists(caminho):
+        return None
+    conn = conectar(caminho)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] != FORMATO:
+            return None
+        return conn.execute("SELECT versao FROM versao_banco WHERE id = 1").fetchone()[0]
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def _sincronizar_diretorio(caminho):
+    if not hasattr(os, 'O_DIRECTORY'):
+        return  # Windows
+    fd = os.open(os.path.dirname(os.path.abspath(caminho)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def publicar(conn, destino):
+    """Copia as questões ativas e a taxonomia de ``conn`` para ``destino``.
+
+    Devolve a versão publicada. ``conn`` não pode estar com transação aberta.
+    """
+    temporario = "{}.{}.tmp".format(destino, os.getpid())
+    if os.path.exists(temporario):
+        os.remove(temporario)
+    esquemas = dict(conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+            ','.join('?' * len(TABELAS))), TABELAS).fetchall())
+
+    conn.commit()
+    conn.execute("ATTACH DATABASE ? AS publicado", (temporario,))
+    try:
+        conn.execute("PRAGMA publicado.journal_mode = DELETE")
+        conn.execute("PRAGMA publicado.synchronous = FULL")
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        for tabela in TABELAS:
+            # O CREATE original, com o nome qualificado pelo banco anexado
+            sql = esquemas[tabela].replace("CREATE TABLE " + tabela, "CREATE TABLE publicado." + tabela, 1)
+            cursor.execute(sql)
+            filtro = " WHERE ativo = 1" if tabela == "questoes" else ""
+            cursor.execute("INSERT INTO publicado.{0} SELECT * FROM main.{0}{1}".format(tabela, filtro))
+        busca.indexar(cursor, "publicado")
+        cursor.execute("PRAGMA publicado.user_version = {}".format(FORMATO))
+        versao = cursor.execute("SELECT versao FROM main.versao_banco WHERE id = 1").fetchone()[0]
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        conn.execute("DETACH DATABASE publicado")
+        os.remove(temporario)
+        raise
+    conn.execute("DETACH DATABASE publicado")
+
+    try:
+        compilar(temporario, caminho_binario(destino))
+    except BaseException:
+        os.remove(temporario)
+        raise
+    os.replace(temporario, destino)
+    _sincronizar_diretorio(destino)
+    return versao
+
+
+def compilar(caminho_db, destino):
+    """Gera o ``questoes.bin`` a partir de um arquivo publicado."""
+    if not banco_binario.SUPORTADO:
+        return
+    origem = sqlite3.connect(caminho_db)
+    try:
+        versao = origem.execute("SELECT versao FROM versao_banco WHERE id = 1").fetchone()[0]
+        areas = taxonomia.carregar_taxonomia(origem).disciplinas_por_area.items()
+        banco_binario.compilar(origem.execute(banco_questoes.SQL_CARGA), areas, versao, destino)
+    finally:
+        origem.close()
+
+
+def publicar_se_desatualizado(conn, destino):
+    """Publica se o arquivo (ou o .bin) não existe, é de outro formato ou está
+    atrás de ``versao_banco``."""
+    atual = conn.execute("SELECT versao FROM versao_banco WHERE id = 1").fetchone()[0]
+    binario_em_dia = (not banco_binario.SUPORTADO
+                      or banco_binario.versao_compilada(caminho_binario(destino)) == atual)
+    if versao_publicada(destino) == atual and binario_em_dia:
+        return False
+    publicar(conn, destino)
+    return True
+
+
+if __name__ == '__main__':
+    caminho_db = os.environ.get('DATABASE_PATH', 'database.db')
+    destino = caminho_publicado(caminho_db)
+    conn = sqlite3.connect(caminho_db)
+    versao = publicar(conn, destino)
+    conn.close()
+    print(f"Banco de questões publicado em '{destino}' (versão {versao}).")
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Prompt e interpretação da resposta na correção de redações."""
+import json
+
+from json_incremental import AnalisadorIncremental
+
+# Aumente ao mudar o prompt ou os critérios: correções em cache de outra
+# versão deixam de ser usadas (cache_correcoes.py)
+VERSAO_RUBRICA = "1"
+
+COMPETENCIAS = (
+    "Competência 1: Domínio da norma culta",
+    "Competência 2: Compreensão do tema e estrutura",
+    "Competência 3: Argumentação e repertório",
+    "Competência 4: Coesão e coerência",
+    "Competência 5: Proposta de intervenção",
+)
+
+
+SECOES_RESUMO = ("nota_final", "pontos_fortes", "pontos_fracos", "sugestoes_melhoria", "dicas_concursos", "modelo")
+
+PROMPT = """
+Você é um corretor de redações de concursos públicos, focado no modelo ENEM/VUNESP.
+Analise a redação a seguir sobre o tema: "{tema}".
+
+Texto da redação:
+---
+{texto}
+---
+
+Sua resposta DEVE ser um objeto JSON válido, sem nenhum texto antes ou depois (sem markdown '```json').
+O JSON deve seguir EXATAMENTE esta estrutura:
+
+{{
+    "nota_final": <um número de 0 a 100>,
+    "analise_competencias": [
+        {{"competencia": "Competência 1: Domínio da norma culta", "nota": <número 0-20>, "comentario": "<comentário detalhado sobre gramática, ortografia, etc>"}},
+        {{"competencia": "Competência 2: Compreensão do tema e estrutura", "nota": <número 0-20>, "comentario": "<comentário sobre a abordagem do tema e a estrutura dissertativa>"}},
+        {{"competencia": "Competência 3: Argumentação e repertório", "nota": <número 0-20>, "comentario": "<comentário sobre a seleção e uso de argumentos e repertório sociocultural>"}},
+        {{"competencia": "Competência 4: Coesão e coerência", "nota": <número 0-20>, "comentario": "<comentário sobre o uso de conectivos e a fluidez do texto>"}},
+        {{"competencia": "Competência 5: Proposta de intervenção", "nota": <número 0-20>, "comentario": "<comentário sobre a proposta de intervenção (agente, ação, meio, efeito, detalhamento)>"}}
+    ],
+    "pontos_fortes": ["<ponto forte 1>", "<ponto forte 2>", "..."],
+    "pontos_fracos": ["<ponto fraco 1>", "<ponto fraco 2>", "..."],
+    "sugestoes_melhoria": ["<sugestão 1>", "<sugestão 2>", "..."],
+    "dicas_concursos": ["<dica específica 1>", "<dica específica 2>", "..."]
+}}
+"""
+
+
+class Prompt(str):
+    """O prompt pronto, guardando tema e texto para clientes que não usam
+    o texto do prompt (``clientes_llm.ClienteHeuristico``)."""
+
+    def __new__(cls, tema, texto):
+        prompt = super().__new__(cls, PROMPT.format(tema=tema, texto=texto))
+        prompt.tema, prompt.texto = tema, texto
+        return prompt
+
+
+def montar_prompt(tema, texto):
+    return Prompt(tema, texto)
+
+
+def interpretar_resposta(resposta):
+    """JSON da correção a partir do texto do modelo (tolera cercas de markdown).
+
+    Levanta ValueError se não for um objeto JSON.
+    """
+    texto = resposta.strip().replace("```json", "").replace("```", "")
+    correcao = json.loads(texto)
+    if not isinstance(correcao, dict):
+        raise ValueError("Resposta do modelo não é um objeto JSON.")
+    return correcao
+
+
+def corrigir(cliente, tema, texto):
+    """(correção, identificador do modelo que respondeu)."""
+    resposta, modelo = cliente.responder(montar_prompt(tema, texto))
+    correcao = interpretar_resposta(resposta)
+    correcao["modelo"] = modelo
+    return correcao, modelo
+
+
+def corrigir_transmitindo(cliente, tema, texto, avisar):
+    """Como ``corrigir``, lendo a resposta do modelo em streaming.
+
+    Cada competência é passada a ``avisar("competencia", {...})`` assim que
+    o objeto dela fecha na saída do modelo, e a nota final a
+    ``avisar("nota_final", {...})``.
+    """
+    modelo, pedacos = cliente.transmitir(montar_prompt(tema, texto))
+    analisador = AnalisadorIncremental()
+    for pedaco in pedacos:
+        for caminho, valor in analisador.alimentar(pedaco):
+            if len(caminho) == 2 and caminho[0] == "analise_competencias" and isinstance(valor, dict):
+                avisar("competencia", {"indice": caminho[1], **valor})
+            elif caminho == ("nota_final",):
+                avisar("nota_final", {"nota_final": valor})
+    correcao = analisador.fim()
+    if not isinstance(correcao, dict):
+        raise ValueError("Resposta do modelo não é um objeto JSON.")
+    correcao["modelo"] = modelo
+    return correcao, modelo
+
+
+def eventos_da_correcao(correcao):
+    """Os eventos de ``corrigir_transmitindo`` para uma correção já pronta (ex.: do cache)."""
+    if "nota_final" in correcao:
+        yield "nota_final", {"nota_final": correcao["nota_final"]}
+    for indice, competencia in enumerate(correcao.get("analise_competencias", [])):
+        yield "competencia", {"indice": indice, **competencia}
+
+
+def resumo(correcao):
+    return {secao: correcao[secao] for secao in SECOES_RESUMO if secao in correcao}
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""Armazenamento do estado dos simulados no servidor.
+
+O cookie assinado do Flask guarda só um identificador opaco
+(``session['simulado_sid']``); o estado em si fica em um armazém plugável:
+
+* ``ArmazemMemoria``: LRU com TTL, por processo (um único worker);
+* ``ArmazemSQLite``: tabela ``sessoes_simulado``, compartilhada entre workers.
+
+Os valores são ``bytes`` já serializados (``EstadoSimulado.para_bytes``). Um
+``Varredor`` em thread daemon remove periodicamente os simulados abandonados.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+TTL_PADRAO = 2 * 60 * 60          # simulado abandonado expira em 2h
+MAXIMO_SESSOES_MEMORIA = 10000
+INTERVALO_VARREDURA = 5 * 60
+
+
+# Byte de resposta: 0 = não respondida; bits 0-4 = letra (1='a' .. 26='z',
+# 27 = outra entrada); bit 7 = acertou.
+RESPOSTA_OUTRA = 27
+BIT_ACERTO = 0x80
+
+
+def novo_sid():
+    return secrets.token_urlsafe(24)
+
+
+class EstadoSimulado:
+    """Estado de tamanho constante de um simulado em andamento.
+
+    Em vez da lista de ids, guarda o filtro, a versão do índice de amostragem
+    e a semente; a sequência de questões é regenerada por
+    ``amostragem.SequenciaSorteada``. As respostas ficam em um bytearray
+    indexado pela posição da questão no simulado.
+    """
+
+    __slots__ = ('filtro', 'versao', 'semente', 'total', 'respostas')
+
+    def __init__(self, filtro, versao, semente, total, respostas=None):
+        self.filtro = filtro
+        self.versao = versao
+        self.semente = semente
+        self.total = total
+        self.respostas = respostas if respostas is not None else bytearray(total)
+
+    @classmethod
+    def novo(cls, filtro, versao, total):
+        return cls(filtro, versao, secrets.randbits(63), total)
+
+    def respondida(self, indice):
+        return self.respostas[indice] != 0
+
+    def acertou(self, indice):
+        return bool(self.respostas[indice] & BIT_ACERTO)
+
+    def registrar(self, indice, alternativa, acertou):
+        if len(alternativa) == 1 and 'a' <= alternativa <= 'z':
+            codigo = ord(alternativa) - ord('a') + 1
+        else:
+            codigo = RESPOSTA_OUTRA
+        self.respostas[indice] = codigo | (BIT_ACERTO if acertou else 0)
+
+    def resposta(self, indice):
+        codigo = self.respostas[indice]
+        if not codigo:
+            return None
+        letra = codigo & ~BIT_ACERTO
+        return {
+            "alternativa_escolhida": chr(ord('a') + letra - 1) if letra != RESPOSTA_OUTRA else '',
+            "acertou": bool(codigo & BIT_ACERTO),
+        }
+
+    def para_bytes(self):
+        cabecalho = json.dumps(
+            {"f": self.filtro, "v": self.versao, "s": self.semente, "t": self.total},
+            separators=(',', ':'),
+        ).encode('utf-8')
+        return struct.pack('>H', len(cabecalho)) + cabecalho + bytes(self.respostas)
+
+    @classmethod
+    def de_bytes(cls, dados):
+        (tamanho,) = struct.unpack_from('>H', dados)
+        cabecalho = json.loads(dados[2:2 + tamanho])
+        return cls(cabecalho["f"], cabecalho["v"], cabecalho["s"], cabecalho["t"],
+                   bytearray(dados[2 + tamanho:]))
+
+
+class ArmazemSessoes:
+    def preparar(self):
+        """Cria o que o armazém precisar no banco; chamado pelo setup_db()."""
+
+    def obter(self, sid):
+        raise NotImplementedError
+
+    def salvar(self, sid, dados):
+        raise NotImplementedError
+
+    def remover(self, sid):
+        raise NotImplementedError
+
+    def expirar(self):
+        """Remove as sessões vencidas e devolve quantas foram removidas."""
+        raise NotImplementedError
+
+
+class ArmazemMemoria(ArmazemSessoes):
+    def __init__(self, ttl=TTL_PADRAO, maximo=MAXIMO_SESSOES_MEMORIA):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._itens = OrderedDict()  # sid -> (expira_em, dados)
+        self._lock = threading.Lock()
+
+    def obter(self, sid):
+        with self._lock:
+            item = self._itens.get(sid)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                del self._itens[sid]
+                return None
+            self._itens.move_to_end(sid)
+            return item[1]
+
+    def salvar(self, sid, dados):
+        with self._lock:
+            self._itens[sid] = (time.time() + self.ttl, dados)
+            self._itens.move_to_end(sid)
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+
+    def remover(self, sid):
+        with self._lock:
+            self._itens.pop(sid, None)
+
+    def expirar(self):
+        agora = time.time()
+        with self._lock:
+            vencidas = [sid for sid, (expira_em, _) in self._itens.items() if expira_em < agora]
+            for sid in vencidas:
+                del self._itens[sid]
+        return len(vencidas)
+
+    def __len__(self):
+        return len(self._itens)
+
+
+class ArmazemSQLite(ArmazemSessoes):
+    def __init__(self, conexoes, ttl=TTL_PADRAO):
+        # conexoes: GerenciadorConexoes do arquivo onde fica a tabela
+        self.conexoes = conexoes
+        self.ttl = ttl
+
+    def preparar(self):
+        conn = self.conexoes.obter()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS sessoes_simulado (
+            sid TEXT PRIMARY KEY,
+            dados BLOB NOT NULL,
+            expira_em REAL NOT NULL
+        ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessoes_simulado_expira ON sessoes_simulado (expira_em)")
+        conn.commit()
+
+    def obter(self, sid):
+        row = self.conexoes.obter().execute(
+            "SELECT dados FROM sessoes_simulado WHERE sid = ? AND expira_em >= ?", (sid, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def salvar(self, sid, dados):
+        conn = self.conexoes.obter()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessoes_simulado (sid, dados, expira_em) VALUES (?, ?, ?)",
+                (sid, dados, time.time() + self.ttl),
+            )
+
+    def remover(self, sid):
+        conn = self.conexoes.obter()
+        with conn:
+            conn.execute("DELETE FROM sessoes_simulado WHERE sid = ?", (sid,))
+
+    def expirar(self):
+        conn = self.conexoes.obter()
+        with conn:
+            return conn.execute("DELETE FROM sessoes_simulado WHERE expira_em < ?", (time.time(),)).rowcount
+
+
+def criar_armazem(tipo, conexoes=None, ttl=TTL_PADRAO):
+    if tipo == 'memoria':
+        return ArmazemMemoria(ttl=ttl)
+    if tipo == 'sqlite':
+        return ArmazemSQLite(conexoes, ttl=ttl)
+    raise ValueError("Armazém de sessões desconhecido: {}".format(tipo))
+
+
+class Varredor:
+    """Thread daemon que chama ``armazem.expirar()`` a cada ``intervalo``.
+
+    ``garantir_ativo()`` é barato e pode ser chamado em toda requisição: ele
+    (re)inicia a thread no processo atual, inclusive depois de um fork.
+    """
+
+    def __init__(self, armazem, intervalo=INTERVALO_VARREDURA):
+        self.armazem = armazem
+        self.intervalo = intervalo
+        self.total_expiradas = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def garantir_ativo(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._executar, name='varredor-sessoes', daemon=True)
+            self._thread.start()
+
+    def _executar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.total_expiradas += self.armazem.expirar()
+            except sqlite3.Error as e:
+                print(f"Erro ao expirar sessões de simulado: {e}")
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Taxonomia de áreas e disciplinas guardada no banco.
+
+``areas`` e ``disciplinas`` substituem o antigo dicionário MAPA_AREAS do
+app.py. As contagens e os filtros por área do app saem do snapshot em
+memória (``Taxonomia``, carregada junto com as questões); cada questão ainda
+carrega ``area_id`` (mantido por triggers a partir da disciplina), usado pelo
+filtro de área da busca textual (busca.py).
+
+Qualquer mudança na taxonomia incrementa ``versao_banco``; a CLI abaixo
+republica o arquivo de questões (questoes_publicadas.py) e o snapshot (com a
+taxonomia que vem junto com ele) é recarregado pelos workers sem redeploy.
+
+    python taxonomia.py                                 lista áreas e disciplinas
+    python taxonomia.py associar "Direito Civil" "Conhecimentos Jurídicos"
+    python taxonomia.py desassociar "Direito Civil"
+"""
+import os
+import sqlite3
+import sys
+
+# Semente usada só na primeira execução, quando a tabela ``areas`` está vazia
+AREAS_INICIAIS = (
+    ("Língua Portuguesa", ["Língua Portuguesa"]),
+    ("Exatas e Raciocínio Lógico", ["Matemática", "Raciocínio Lógico", "Matemática Financeira"]),
+    ("Conhecimentos Jurídicos", [
+        "Direito Administrativo", "Direito Constitucional", "Direito Civil", "Direito Processual Civil",
+        "Direito Penal", "Direito Processual Penal", "Direito do Trabalho", "Direito Tributário",
+        "Direito Empresarial", "Direito Financeiro", "Direito Internacional", "Direito da Magistratura",
+        "Direito da Criança e do Adolescente", "Direito da Criança e do Adolescente / Estatuto do Idoso",
+    ]),
+    ("Conhecimentos Bancários e Vendas", ["Conhecimentos Bancários", "Vendas e Negociação",
+                                          "Atualidades do Mercado Financeiro"]),
+    ("Psicologia Clínica e Saúde", ["Psicologia", "Psicologia (Saúde)"]),
+    ("Gestão de Pessoas", ["Psicologia (Gestão)"]),
+    ("Informática", ["Informática"]),
+    ("Atualidades Gerais", ["Atualidades"]),
+)
+
+_INCREMENTAR_VERSAO = "UPDATE versao_banco SET versao = versao + 1 WHERE id = 1;"
+
+_AREA_DA_QUESTAO = """
+    INSERT OR IGNORE INTO disciplinas (nome) VALUES (NEW.disciplina);
+    UPDATE questoes SET area_id = (SELECT area_id FROM disciplinas WHERE nome = NEW.disciplina)
+    WHERE id = NEW.id AND area_id IS NOT (SELECT area_id FROM disciplinas WHERE nome = NEW.disciplina);
+"""
+
+TRIGGERS_TAXONOMIA = (
+    # Questão nova ou com disciplina trocada: registra a disciplina e copia a área
+    "CREATE TRIGGER IF NOT EXISTS trg_questoes_area_insert AFTER INSERT ON questoes BEGIN {} END"
+    .format(_AREA_DA_QUESTAO),
+    "CREATE TRIGGER IF NOT EXISTS trg_questoes_area_update AFTER UPDATE OF disciplina ON questoes BEGIN {} END"
+    .format(_AREA_DA_QUESTAO),
+    # Disciplina movida de área: propaga para as questões
+    """CREATE TRIGGER IF NOT EXISTS trg_disciplinas_area_update AFTER UPDATE OF area_id ON disciplinas BEGIN
+        UPDATE questoes SET area_id = NEW.area_id WHERE disciplina = NEW.nome;
+        {} END""".format(_INCREMENTAR_VERSAO),
+    """CREATE TRIGGER IF NOT EXISTS trg_disciplinas_insert AFTER INSERT ON disciplinas
+    WHEN NEW.area_id IS NOT NULL BEGIN
+        UPDATE questoes SET area_id = NEW.area_id WHERE disciplina = NEW.nome;
+        {} END""".format(_INCREMENTAR_VERSAO),
+    "CREATE TRIGGER IF NOT EXISTS trg_areas_insert AFTER INSERT ON areas BEGIN {} END".format(_INCREMENTAR_VERSAO),
+    "CREATE TRIGGER IF NOT EXISTS trg_areas_update AFTER UPDATE ON areas BEGIN {} END".format(_INCREMENTAR_VERSAO),
+    # Sem PRAGMA foreign_keys, o ON DELETE SET NULL é feito aqui
+    """CREATE TRIGGER IF NOT EXISTS trg_areas_delete AFTER DELETE ON areas BEGIN
+        UPDATE disciplinas SET area_id = NULL WHERE area_id = OLD.id;
+        {} END""".format(_INCREMENTAR_VERSAO),
+)
+
+
+def criar_tabelas(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS areas (
+        id INTEGER PRIMARY KEY,
+        nome TEXT NOT NULL UNIQUE,
+        ordem INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS disciplinas (
+        id INTEGER PRIMARY KEY,
+        nome TEXT NOT NULL UNIQUE,
+        area_id INTEGER REFERENCES areas (id)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_disciplinas_area ON disciplinas (area_id)")
+    if "area_id" not in {row[1] for row in conn.execute("PRAGMA table_info(questoes)")}:
+        conn.execute("ALTER TABLE questoes ADD COLUMN area_id INTEGER REFERENCES areas (id)")
+    # Nenhuma consulta filtra questoes só por área: o índice só custava escrita
+    conn.execute("DROP INDEX IF EXISTS idx_questoes_area")
+    for sql in TRIGGERS_TAXONOMIA:
+        conn.execute(sql)
+
+
+def preparar(conn):
+    """Cria as tabelas e triggers, semeia na primeira execução e preenche area_id.
+
+    Requer ``versao_banco`` (banco_questoes.criar_controle_versao).
+    """
+    criar_tabelas(conn)
+    if conn.execute("SELECT 1 FROM areas LIMIT 1").fetchone() is None:
+        for ordem, (area, disciplinas) in enumerate(AREAS_INICIAIS):
+            area_id = conn.execute("INSERT INTO areas (nome, ordem) VALUES (?, ?)", (area, ordem)).lastrowid
+            conn.executemany("INSERT OR IGNORE INTO disciplinas (nome, area_id) VALUES (?, ?)",
+                             [(disciplina, area_id) for disciplina in disciplinas])
+    conn.execute("INSERT OR IGNORE INTO disciplinas (nome) SELECT DISTINCT disciplina FROM questoes")
+    conn.execute("""
+        UPDATE questoes SET area_id = (SELECT area_id FROM disciplinas d WHERE d.nome = questoes.disciplina)
+        WHERE area_id IS NOT (SELECT area_id FROM disciplinas d WHERE d.nome = questoes.disciplina)
+    """)
+    conn.commit()
+
+
+class Taxonomia:
+    """Áreas (na ordem de exibição) e as disciplinas de cada uma."""
+
+    def __init__(self, areas):
+        # areas: lista de (nome, tupla de disciplinas)
+        self.disciplinas_por_area = dict(areas)
+        self.areas = tuple(self.disciplinas_por_area)
+        self.area_da_disciplina = {disciplina: area for area, disciplinas in areas for disciplina in disciplinas}
+
+    def disciplinas(self, area):
+        return self.disciplinas_por_area.get(area, ())
+
+    def area(self, disciplina):
+        return self.area_da_disciplina.get(disciplina, '')
+
+
+def carregar_taxonomia(conn):
+    areas = {}
+    for area, disciplina in conn.execute("""
+        SELECT a.nome, d.nome FROM areas a LEFT JOIN disciplinas d ON d.area_id = a.id
+        ORDER BY a.ordem, a.id, d.nome
+    """):
+        lista = areas.setdefault(area, [])
+        if disciplina is not None:
+            lista.append(disciplina)
+    return Taxonomia([(area, tuple(disciplinas)) for area, disciplinas in areas.items()])
+
+
+def associar(conn, disciplina, area):
+    with conn:
+        linha = conn.execute("SELECT id FROM areas WHERE nome = ?", (area,)).fetchone()
+        if linha is None:
+            ordem = conn.execute("SELECT COALESCE(MAX(ordem), -1) + 1 FROM areas").fetchone()[0]
+            area_id = conn.execute("INSERT INTO areas (nome, ordem) VALUES (?, ?)", (area, ordem)).lastrowid
+        else:
+            area_id = linha[0]
+        conn.execute("INSERT INTO disciplinas (nome, area_id) VALUES (?, ?) "
+                     "ON CONFLICT (nome) DO UPDATE SET area_id = excluded.area_id", (disciplina, area_id))
+
+
+def desassociar(conn, disciplina):
+    with conn:
+        conn.execute("UPDATE disciplinas SET area_id = NULL WHERE nome = ?", (disciplina,))
+
+
+if __name__ == '__main__':
+    caminho_db = os.environ.get('DATABASE_PATH', 'database.db')
+    conn = sqlite3.connect(caminho_db)
+    comando = sys.argv[1] if len(sys.argv) > 1 else 'listar'
+    if comando == 'associar' and len(sys.argv) == 4:
+        associar(conn, sys.argv[2], sys.argv[3])
+    elif comando == 'desassociar' and len(sys.argv) == 3:
+        desassociar(conn, sys.argv[2])
+    elif comando != 'listar':
+        print(__doc__)
+        sys.exit(1)
+    if comando != 'listar':
+        # Os workers leem a taxonomia do arquivo publicado
+        import questoes_publicadas
+        questoes_publicadas.publicar_se_desatualizado(conn, questoes_publicadas.caminho_publicado(caminho_db))
+
+    taxonomia = carregar_taxonomia(conn)
+    for area in taxonomia.areas:
+        print(area)
+        for disciplina in taxonomia.disciplinas(area):
+            print("    " + disciplina)
+    sem_area = [nome for (nome,) in conn.execute("SELECT nome FROM disciplinas WHERE area_id IS NULL ORDER BY nome")]
+    if sem_area:
+        print("Sem área: " + ", ".join(sem_area))
+    conn.close()
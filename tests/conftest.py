@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from banco_questoes import hashes_registro  # noqa: E402
+from importar_questoes import criar_tabelas, sincronizar_registros  # noqa: E402
+import questoes_publicadas  # noqa: E402
+
+# (disciplina, matéria, banca, enunciado, resposta)
+QUESTOES = (
+    ("Língua Portuguesa", "Crase", "VUNESP", "Assinale o uso correto da crase.", "a"),
+    ("Língua Portuguesa", "Crase", "FGV", "A crase é <script>alert(1)</script> facultativa em:", "b"),
+    ("Língua Portuguesa", "Regência", "VUNESP", "Qual a regência do verbo assistir?", "c"),
+    ("Matemática", "Porcentagem", "VUNESP", "Quanto é 15% de 200?", "d"),
+    ("Matemática", "Frações", "FGV", "Some as frações 1/2 e 1/3.", "e"),
+    ("Direito Civil", "Contratos", "FGV", "Sobre a licitação e os contratos, assinale:", "a"),
+    ("Direito Civil", "Posse", "CESPE", "A posse de boa-fé garante:", "b"),
+    ("Raciocínio Lógico", "Proposições", "VUNESP", "Negue a proposição: todo homem é mortal.", "c"),
+)
+
+
+def registro(disciplina, materia, banca, enunciado, resposta, dificuldade='Média'):
+    base = (disciplina, materia, dificuldade, enunciado,
+            '{"a": "primeira", "b": "segunda", "c": "terceira", "d": "quarta", "e": "quinta"}',
+            resposta, "Justificativa.", None, None, banca)
+    return base + hashes_registro(base)
+
+
+@pytest.fixture
+def banco_trabalho(tmp_path):
+    """database.db com as tabelas do app e as QUESTOES de exemplo."""
+    conn = sqlite3.connect(str(tmp_path / "database.db"))
+    criar_tabelas(conn)
+    sincronizar_registros(conn, [registro(*questao) for questao in QUESTOES])
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def publicado(banco_trabalho, tmp_path):
+    """Caminho do questoes.db publicado a partir de ``banco_trabalho``."""
+    destino = str(tmp_path / "questoes.db")
+    questoes_publicadas.publicar(banco_trabalho, destino)
+    return destino
+
+
+@pytest.fixture(scope="session")
+def modulo_app(tmp_path_factory):
+    """O módulo ``app`` importado sobre um database.db com as QUESTOES.
+
+    O app lê DATABASE_PATH e publica o questoes.db na importação, então ele
+    é importado uma vez por sessão de testes.
+    """
+    pasta = tmp_path_factory.mktemp("app")
+    caminho = str(pasta / "database.db")
+    conn = sqlite3.connect(caminho)
+    criar_tabelas(conn)
+    sincronizar_registros(conn, [registro(*questao) for questao in QUESTOES])
+    conn.close()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("DATABASE_PATH", caminho)
+        mp.delenv("QUESTOES_DB_PATH", raising=False)
+        mp.delenv("RESULTADOS_WRITE_BEHIND", raising=False)
+        import app
+    return app
+
+
+@pytest.fixture
+def cliente(modulo_app):
+    """Cliente de teste com a sua própria sessão (cookie)."""
+    return modulo_app.app.test_client()
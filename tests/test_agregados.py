@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import agregados
+import correcao
+from banco_questoes import carregar_banco
+
+SIMULADOS = [
+    ([1, 2, 3, 4], ["a", "b", "x", None]),
+    ([5, 6, 7, 8], ["e", "a", "b", "c"]),
+    ([2, 4, 6], ["a", "a", "a"]),
+    ([8], [None]),
+]
+
+
+@pytest.fixture
+def banco(banco_trabalho):
+    return carregar_banco(banco_trabalho)
+
+
+@pytest.fixture
+def conn(banco_trabalho, banco):
+    agregados.preparar(banco_trabalho, banco.taxonomia.area_da_disciplina)
+    return banco_trabalho
+
+
+def finalizar(conn, banco, simulados, lote=False):
+    resultados = correcao.corrigir_lote(banco, simulados)
+    if lote:
+        correcao.gravar(conn.cursor(), resultados)
+    else:
+        for resultado in resultados:
+            correcao.gravar(conn.cursor(), [resultado])
+    conn.commit()
+
+
+def por_materia(conn):
+    return sorted(conn.execute(
+        "SELECT area, disciplina, materia, SUM(acertos), SUM(total) FROM desempenho_agregado "
+        "GROUP BY area, disciplina, materia").fetchall())
+
+
+def test_incremental_igual_a_reconstrucao(conn, banco):
+    finalizar(conn, banco, SIMULADOS)
+    gerais, areas = agregados.ler_estatisticas(conn)
+    materias = por_materia(conn)
+    assert gerais[0] == len(SIMULADOS)
+    assert areas["Língua Portuguesa"] == (2, 4)
+
+    agregados.reconstruir(conn, banco.taxonomia.area_da_disciplina)
+    gerais_reconstruidas, areas_reconstruidas = agregados.ler_estatisticas(conn)
+    assert gerais_reconstruidas[:4] == (gerais[0], pytest.approx(gerais[1]), gerais[2], gerais[3])
+    assert gerais_reconstruidas[4:] == gerais[4:]
+    assert areas_reconstruidas == areas
+    assert por_materia(conn) == materias
+
+
+def test_lote_igual_a_um_por_vez(conn, banco):
+    finalizar(conn, banco, SIMULADOS, lote=True)
+    em_lote = agregados.ler_estatisticas(conn), por_materia(conn)
+
+    with conn:
+        for tabela in ("resultados", "desempenho_materia", "estatisticas_gerais", "desempenho_agregado",
+                       "desempenho_area"):
+            conn.execute("DELETE FROM {}".format(tabela))
+    finalizar(conn, banco, SIMULADOS)
+    (gerais, areas), materias = agregados.ler_estatisticas(conn), por_materia(conn)
+    assert gerais[:4] == (em_lote[0][0][0], pytest.approx(em_lote[0][0][1]), em_lote[0][0][2], em_lote[0][0][3])
+    assert gerais[4] == em_lote[0][0][4]
+    assert areas == em_lote[0][1]
+    assert materias == em_lote[1]
+
+
+def test_melhor_desempenho(conn, banco):
+    finalizar(conn, banco, SIMULADOS)
+    gerais, _ = agregados.ler_estatisticas(conn)
+    melhor = conn.execute("SELECT percentual, data FROM resultados ORDER BY percentual DESC LIMIT 1").fetchone()
+    assert (gerais[4], gerais[5]) == tuple(melhor)
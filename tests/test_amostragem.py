@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from amostragem import IndiceAmostragem, PermutacaoEmbaralhada, SequenciaSorteada, uniao_de_ids
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 16, 17, 100, 1000, 4097])
+def test_permutacao_e_bijecao(n):
+    permutacao = PermutacaoEmbaralhada(n, semente=12345)
+    imagens = [permutacao[i] for i in range(n)]
+    assert sorted(imagens) == list(range(n))
+
+
+@pytest.mark.parametrize("n", [1, 7, 64, 1000])
+def test_indice_de_desfaz_permutacao(n):
+    permutacao = PermutacaoEmbaralhada(n, semente=2 ** 62 + 3)
+    for i in range(n):
+        assert permutacao.indice_de(permutacao[i]) == i
+
+
+def test_semente_define_a_ordem():
+    a = [PermutacaoEmbaralhada(500, 1)[i] for i in range(500)]
+    b = [PermutacaoEmbaralhada(500, 1)[i] for i in range(500)]
+    c = [PermutacaoEmbaralhada(500, 2)[i] for i in range(500)]
+    assert a == b
+    assert a != c
+
+
+def test_fora_do_intervalo():
+    permutacao = PermutacaoEmbaralhada(10, 0)
+    with pytest.raises(IndexError):
+        permutacao[10]
+    with pytest.raises(IndexError):
+        permutacao[-1]
+
+
+LINHAS = [
+    (1, "Matemática", "FGV"), (2, "Matemática", "VUNESP"), (3, "Português", "FGV"), (4, "Matemática", "FGV"),
+    (7, "Direito", None), (9, "Português", "FGV"), (10, "Matemática", "VUNESP"), (12, "Matemática", "FGV"),
+]
+
+
+def chave_de(questao_id):
+    for linha_id, disciplina, banca in LINHAS:
+        if linha_id == questao_id:
+            return disciplina, banca
+    return None
+
+
+def test_selecionar_une_os_baldes_do_filtro():
+    indice = IndiceAmostragem.de_linhas(LINHAS)
+    assert sorted(indice.selecionar({"Matemática"})) == [1, 2, 4, 10, 12]
+    assert sorted(indice.selecionar({"Matemática", "Português"}, banca="FGV")) == [1, 3, 4, 9, 12]
+    assert sorted(indice.selecionar({"Direito"})) == [7]
+    assert len(indice.selecionar({"Química"})) == 0
+    # Seleções iguais reaproveitam a mesma união
+    assert indice.selecionar({"Matemática"}) is indice.selecionar(["Matemática"])
+
+
+def test_linhas_fora_de_ordem_dao_o_mesmo_indice():
+    assert IndiceAmostragem.de_linhas(reversed(LINHAS)).versao == IndiceAmostragem.de_linhas(LINHAS).versao
+    movida = [(1, "Português", "FGV")] + LINHAS[1:]
+    assert IndiceAmostragem.de_linhas(movida).versao != IndiceAmostragem.de_linhas(LINHAS).versao
+
+
+def test_uniao_posicao_de_e_inverso_de_getitem():
+    uniao = IndiceAmostragem.de_linhas(LINHAS).selecionar({"Matemática", "Português", "Direito"})
+    assert len(uniao) == len(LINHAS)
+    for posicao in range(len(uniao)):
+        questao_id = uniao[posicao]
+        assert uniao.posicao_de(questao_id, chave_de(questao_id)) == posicao
+    assert uniao.posicao_de(5, ("Matemática", "FGV")) is None
+    assert uniao.posicao_de(1, ("Química", "FGV")) is None
+    with pytest.raises(IndexError):
+        uniao[len(uniao)]
+
+
+def test_amostrar_sem_reposicao():
+    uniao = IndiceAmostragem.de_linhas(LINHAS).selecionar({"Matemática", "Português"})
+    amostra = uniao.amostrar(4, random.Random(3))
+    assert len(set(amostra)) == 4
+    assert set(amostra) <= set(uniao)
+    assert sorted(uniao.amostrar(100)) == sorted(uniao)
+
+
+def test_uniao_de_ids_ignora_ids_sem_chave():
+    uniao = uniao_de_ids([12, 3, 3, 99, 7], chave_de)
+    assert sorted(uniao) == [3, 7, 12]
+    assert uniao.posicao_de(12, ("Matemática", "FGV")) is not None
+
+
+@pytest.mark.parametrize("total", [3, 7, 50])
+def test_sequencia_sorteada(total):
+    uniao = IndiceAmostragem.de_linhas(LINHAS).selecionar({"Matemática", "Português", "Direito"})
+    sequencia = SequenciaSorteada(uniao, semente=42, total=total)
+    ids = list(sequencia)
+    assert len(ids) == min(total, len(uniao))
+    assert len(set(ids)) == len(ids)
+    assert ids == list(SequenciaSorteada(uniao, semente=42, total=total))
+    for indice, questao_id in enumerate(ids):
+        assert sequencia.indice_de(questao_id, chave_de(questao_id)) == indice
+    fora = set(uniao) - set(ids)
+    for questao_id in fora:
+        assert sequencia.indice_de(questao_id, chave_de(questao_id)) is None
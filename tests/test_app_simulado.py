@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from conftest import QUESTOES
+
+AREAS = ["Língua Portuguesa", "Exatas e Raciocínio Lógico", "Conhecimentos Jurídicos"]
+
+
+def iniciar(cliente, **dados):
+    return cliente.post('/api/simulado/iniciar', json=dados)
+
+
+def ids_do_simulado(cliente, total):
+    return [cliente.get('/api/simulado/questao/{}'.format(i)).get_json()["questao"]["id"] for i in range(total)]
+
+
+@pytest.mark.parametrize("quantidade", ["todas", "TODAS", "295"])
+def test_todas_traz_todas_as_questoes_do_filtro(cliente, quantidade):
+    resposta = iniciar(cliente, areas=AREAS, quantidade=quantidade)
+    assert resposta.status_code == 200
+    total = resposta.get_json()["total_questoes"]
+    assert total == len(QUESTOES)
+    assert sorted(ids_do_simulado(cliente, total)) == list(range(1, len(QUESTOES) + 1))
+    assert cliente.get('/api/simulado/questao/{}'.format(total)).status_code == 404
+
+
+def test_todas_respeita_area_e_banca(cliente):
+    resposta = iniciar(cliente, areas=["Língua Portuguesa"], banca="VUNESP", quantidade="todas")
+    total = resposta.get_json()["total_questoes"]
+    esperadas = [q for q in QUESTOES if q[0] == "Língua Portuguesa" and q[2] == "VUNESP"]
+    assert total == len(esperadas)
+    for indice in range(total):
+        questao = cliente.get('/api/simulado/questao/{}'.format(indice)).get_json()["questao"]
+        assert (questao["disciplina"], questao["banca"]) == ("Língua Portuguesa", "VUNESP")
+    assert sorted(ids_do_simulado(cliente, total)) == [1, 3]
+
+
+def test_quantidade_maior_que_o_filtro_e_limitada(cliente):
+    resposta = iniciar(cliente, areas=["Conhecimentos Jurídicos"], quantidade="10")
+    assert resposta.get_json()["total_questoes"] == 2
+
+
+def test_filtro_sem_questoes(cliente):
+    assert iniciar(cliente, areas=["Informática"], quantidade="todas").status_code == 404
+    assert iniciar(cliente, areas=[], quantidade="todas").status_code == 400
+
+
+def test_finalizar_simulado_todas(cliente):
+    total = iniciar(cliente, areas=AREAS, quantidade="todas").get_json()["total_questoes"]
+    for indice in range(total):
+        questao = cliente.get('/api/simulado/questao/{}'.format(indice)).get_json()["questao"]
+        resposta = cliente.post('/api/simulado/responder', json={"questao_id": questao["id"], "alternativa": "a"})
+        assert resposta.get_json()["success"]
+    relatorio = cliente.post('/api/simulado/finalizar').get_json()["relatorio"]
+    assert relatorio["total_questoes"] == len(QUESTOES)
+    assert relatorio["total_acertos"] == sum(1 for q in QUESTOES if q[4] == "a")
+    assert cliente.get('/api/simulado/questao/0').status_code == 404
+
+
+def test_janela_na_ordem_do_simulado(cliente):
+    total = iniciar(cliente, areas=AREAS, quantidade="todas").get_json()["total_questoes"]
+    ids = ids_do_simulado(cliente, total)
+    janela = cliente.get('/api/simulado/questoes?from=2&count=4').get_json()
+    assert (janela["total_questoes"], janela["inicio"]) == (total, 2)
+    assert [q["indice"] for q in janela["questoes"]] == [2, 3, 4, 5]
+    assert [q["questao"]["id"] for q in janela["questoes"]] == ids[2:6]
+    assert all(q["resposta_anterior"] is None for q in janela["questoes"])
+
+    # A janela para no fim do simulado
+    fim = cliente.get('/api/simulado/questoes?from={}&count=10'.format(total - 1)).get_json()
+    assert [q["questao"]["id"] for q in fim["questoes"]] == ids[-1:]
+
+
+def test_janela_revalida_com_etag(cliente):
+    iniciar(cliente, areas=AREAS, quantidade="todas")
+    primeira = cliente.get('/api/simulado/questoes?from=0&count=3')
+    etag = primeira.headers["ETag"]
+    assert primeira.headers["Cache-Control"] == "private, no-cache"
+    repetida = cliente.get('/api/simulado/questoes?from=0&count=3', headers={"If-None-Match": etag})
+    assert repetida.status_code == 304
+    assert repetida.data == b""
+
+    # Responder uma questão da janela muda o corpo e o ETag
+    questao = primeira.get_json()["questoes"][1]["questao"]
+    cliente.post('/api/simulado/responder', json={"questao_id": questao["id"], "alternativa": "a"})
+    depois = cliente.get('/api/simulado/questoes?from=0&count=3', headers={"If-None-Match": etag})
+    assert depois.status_code == 200
+    assert depois.headers["ETag"] != etag
+    assert depois.get_json()["questoes"][1]["resposta_anterior"]["alternativa_escolhida"] == "a"
+
+
+def test_janela_parametros_invalidos(cliente, modulo_app):
+    assert cliente.get('/api/simulado/questoes').status_code == 404
+    iniciar(cliente, areas=AREAS, quantidade="todas")
+    assert cliente.get('/api/simulado/questoes?from=x').status_code == 400
+    assert cliente.get('/api/simulado/questoes?from=-1').status_code == 400
+    assert cliente.get('/api/simulado/questoes?count=0').status_code == 400
+    assert cliente.get('/api/simulado/questoes?from={}'.format(len(QUESTOES))).status_code == 404
+    maximo = modulo_app.MAXIMO_PREFETCH
+    assert len(cliente.get('/api/simulado/questoes?count={}'.format(maximo + 100)).get_json()["questoes"]) \
+        == min(maximo, len(QUESTOES))
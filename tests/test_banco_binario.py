@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import banco_binario
+import banco_questoes
+from banco_questoes import BancoQuestoesMapeado, carregar_banco
+from conftest import registro
+from importar_questoes import sincronizar_registros
+import taxonomia
+
+pytestmark = pytest.mark.skipif(not banco_binario.SUPORTADO, reason="formato binário não suportado")
+
+
+@pytest.fixture
+def compilado(banco_trabalho, tmp_path):
+    # Questão com alternativas inválidas e campos nulos
+    sincronizar_registros(banco_trabalho, [registro("Informática", "Redes", "CESPE", "Sobre TCP/IP, julgue.", "certo")],
+                          desativar_ausentes=False)
+    with banco_trabalho:
+        banco_trabalho.execute("UPDATE questoes SET alternativas = 'não é json', justificativa = NULL "
+                               "WHERE disciplina = 'Informática'")
+    destino = str(tmp_path / "questoes.bin")
+    areas = taxonomia.carregar_taxonomia(banco_trabalho).disciplinas_por_area.items()
+    banco_binario.compilar(banco_trabalho.execute(banco_questoes.SQL_CARGA), areas, 7, destino)
+    return carregar_banco(banco_trabalho), banco_binario.ArquivoQuestoes(destino)
+
+
+def test_questoes_iguais_as_do_sqlite(compilado):
+    banco, arquivo = compilado
+    assert len(arquivo) == len(banco)
+    assert arquivo.versao == banco.versao
+    assert arquivo.versao_banco == 7
+    for questao_id in banco.ids:
+        esperada = banco.questao(questao_id)
+        mapeada = arquivo.questao(questao_id)
+        assert mapeada.como_dict() == esperada.como_dict()
+        for campo in banco_questoes.COLUNAS:
+            assert getattr(mapeada, campo) == getattr(esperada, campo)
+    assert arquivo.questao(0) is None
+    assert arquivo.questao(banco.ids[-1] + 1) is None
+
+
+def test_alternativas_invalidas_viram_dicionario_vazio(compilado):
+    banco, arquivo = compilado
+    questao_id, = banco.ids_por("disciplina", "Informática")
+    assert arquivo.questao(questao_id).alternativas == {}
+    assert arquivo.questao(questao_id).justificativa is None
+
+
+def test_snapshot_mapeado_igual_ao_carregado(compilado):
+    banco, arquivo = compilado
+    mapeado = BancoQuestoesMapeado(arquivo)
+    assert tuple(mapeado.ids) == banco.ids
+    assert list(mapeado.linhas_indice()) == list(banco.linhas_indice())
+    assert mapeado.taxonomia.disciplinas_por_area == banco.taxonomia.disciplinas_por_area
+    for campo in banco_questoes.FACETAS:
+        assert set(mapeado.valores(campo)) == set(banco.valores(campo))
+        for valor in banco.valores(campo):
+            assert tuple(mapeado.ids_por(campo, valor)) == banco.ids_por(campo, valor)
+    for questao_id in banco.ids:
+        assert mapeado.gabarito.resposta(questao_id) == banco.gabarito.resposta(questao_id)
+        assert mapeado.gabarito.chave(questao_id) == banco.gabarito.chave(questao_id)
+    assert mapeado.amostragem.versao == banco.amostragem.versao
+
+
+def test_versao_compilada(compilado, tmp_path):
+    assert banco_binario.versao_compilada(str(tmp_path / "questoes.bin")) == 7
+    assert banco_binario.versao_compilada(str(tmp_path / "ausente.bin")) is None
+    (tmp_path / "lixo.bin").write_bytes(b"qualquer coisa")
+    assert banco_binario.versao_compilada(str(tmp_path / "lixo.bin")) is None
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from banco_questoes import FonteBancoQuestoes
+from conftest import QUESTOES
+from questoes_publicadas import BancoIndisponivel
+
+
+def test_snapshot_do_arquivo_publicado(publicado):
+    banco = FonteBancoQuestoes(publicado, imutavel=True).atual()
+    assert len(banco) == len(QUESTOES)
+    q = banco.questao(banco.ids[0])
+    assert (q.disciplina, q.materia, q.banca, q.resposta_correta) == ("Língua Portuguesa", "Crase", "VUNESP", "a")
+    assert q.alternativas["e"] == "quinta"
+    assert len(banco.ids_por("banca", "FGV")) == 3
+
+
+def test_arquivo_ausente_levanta_banco_indisponivel(tmp_path):
+    fonte = FonteBancoQuestoes(str(tmp_path / "questoes.db"), imutavel=True)
+    with pytest.raises(BancoIndisponivel):
+        fonte.atual()
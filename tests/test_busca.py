@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import busca
+
+
+def test_montar_consulta():
+    assert busca.montar_consulta("questões sobre crase") == '"crase"*'
+    assert busca.montar_consulta('lei 14.133 "licitação"') == '"lei" "14.133" "licitação"*'
+    assert busca.montar_consulta("de a questão") is None
+    assert busca.montar_consulta(None) is None
+
+
+def test_busca_ignora_acentos_e_filtra_por_banca(publicado):
+    buscador = busca.BuscaQuestoes(publicado)
+    assert len(buscador.ids(busca.montar_consulta("licitacao"))) == 1
+    assert len(buscador.ids(busca.montar_consulta("CRASE"))) == 2
+    assert len(buscador.ids(busca.montar_consulta("crase"), banca="FGV")) == 1
+    assert len(buscador.ids(busca.montar_consulta("crase"), area="Língua Portuguesa")) == 2
+    assert buscador.ids(busca.montar_consulta("crase"), area="Informática") == ()
+
+
+def test_trecho_escapado_com_marcas(publicado):
+    buscador = busca.BuscaQuestoes(publicado)
+    linhas, proximo = buscador.buscar(busca.montar_consulta("facultativa"))
+    assert proximo is None
+    (_, _, trecho), = linhas
+    assert "<script>" not in trecho
+    assert "&lt;script&gt;" in trecho
+    assert "<mark>facultativa</mark>" in trecho
+
+
+def test_paginacao_por_cursor_nao_repete(publicado):
+    buscador = busca.BuscaQuestoes(publicado)
+    consulta = busca.montar_consulta("assinale")
+    primeira, proximo = buscador.buscar(consulta, limite=1)
+    segunda, fim = buscador.buscar(consulta, limite=1, apos=busca.decodificar_cursor(proximo))
+    assert fim is None
+    assert {primeira[0][0], segunda[0][0]} == set(buscador.ids(consulta))
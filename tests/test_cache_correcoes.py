@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+import cache_correcoes
+import jobs_redacao
+import redacao
+from clientes_llm import ClienteLocal
+from conexoes import GerenciadorConexoes
+
+TEMA = "Mobilidade urbana"
+TEXTO = "O transporte público   é essencial.\n\nPortanto, o Estado deve investir."
+CORRECAO = {"nota_final": 80, "analise_competencias": []}
+
+
+@pytest.fixture
+def conexoes(tmp_path):
+    conexoes = GerenciadorConexoes(str(tmp_path / "database.db"))
+    yield conexoes
+    conexoes.fechar_todas()
+
+
+@pytest.fixture
+def cache(conexoes):
+    cache = cache_correcoes.CacheCorrecoes(conexoes)
+    cache.preparar()
+    return cache
+
+
+class ClienteContado(ClienteLocal):
+    def __init__(self):
+        super().__init__()
+        self.chamadas = 0
+
+    def gerar(self, prompt, prazo=None):
+        self.chamadas += 1
+        return super().gerar(prompt, prazo)
+
+
+def test_chave_estavel_com_espacos_e_unicode():
+    base = cache_correcoes.chave(TEMA, TEXTO, "1", "local")
+    assert cache_correcoes.chave(" Mobilidade  urbana ", " ".join(TEXTO.split()), "1", "local") == base
+    # "é" decomposto (e + acento combinante) normaliza para o mesmo NFC
+    assert cache_correcoes.chave(TEMA, TEXTO.replace("\u00e9", "e\u0301"), "1", "local") == base
+
+
+def test_rubrica_e_modelo_fazem_parte_da_chave():
+    base = cache_correcoes.chave(TEMA, TEXTO, "1", "local")
+    assert cache_correcoes.chave(TEMA, TEXTO, "2", "local") != base
+    assert cache_correcoes.chave(TEMA, TEXTO, "1", "gemini:gemini-pro") != base
+    # As partes são separadas: mover texto entre elas não colide
+    assert cache_correcoes.chave("ab", "c", "1", "local") != cache_correcoes.chave("a", "bc", "1", "local")
+
+
+def test_guardar_e_obter_da_memoria_e_do_banco(cache, conexoes):
+    chave = cache_correcoes.chave(TEMA, TEXTO, "1", "local")
+    assert cache.obter(chave) is None
+    cache.guardar(chave, "1", "local", CORRECAO, 2.5)
+    assert cache.obter(chave) == CORRECAO
+
+    outro_processo = cache_correcoes.CacheCorrecoes(conexoes)
+    assert outro_processo.obter(chave) == CORRECAO
+    assert outro_processo.obter(chave) == CORRECAO
+    metricas = outro_processo.metricas()
+    assert (metricas["acertos_banco"], metricas["acertos_memoria"], metricas["faltas"]) == (1, 1, 0)
+    assert metricas["latencia_poupada_s"] == 5.0
+
+
+def test_invalidar_limpa_memoria_banco_e_outros_processos(cache, conexoes, monkeypatch):
+    chave_v1 = cache_correcoes.chave(TEMA, TEXTO, "1", "local")
+    chave_v2 = cache_correcoes.chave(TEMA, TEXTO, "2", "local")
+    cache.guardar(chave_v1, "1", "local", CORRECAO, 1.0)
+    cache.guardar(chave_v2, "2", "local", CORRECAO, 1.0)
+    outro_processo = cache_correcoes.CacheCorrecoes(conexoes)
+    assert outro_processo.obter(chave_v1) == CORRECAO
+
+    assert cache.invalidar("1") == 1
+    assert cache.metricas()["entradas_memoria"] == 0
+    assert cache.metricas()["entradas_por_rubrica"] == {"2": 1}
+    assert cache.obter(chave_v1) is None
+    assert cache.obter(chave_v2) == CORRECAO
+
+    # O outro processo ainda tem a entrada no LRU até reler a geração
+    monkeypatch.setattr(cache_correcoes, "INTERVALO_GERACAO", 0.0)
+    assert outro_processo.obter(chave_v1) is None
+
+
+def test_lru_limitado(conexoes, cache):
+    pequeno = cache_correcoes.CacheCorrecoes(conexoes, limite_memoria=2)
+    for i in range(3):
+        pequeno.guardar("chave{}".format(i), "1", "local", {"i": i}, 0.1)
+    assert pequeno.metricas()["entradas_memoria"] == 2
+    # A mais antiga saiu da memória, mas continua no banco
+    assert pequeno.obter("chave0") == {"i": 0}
+    assert pequeno.acertos_banco == 1
+
+
+def test_submeter_com_correcao_em_cache_nao_enfileira(conexoes, cache):
+    cliente = ClienteContado()
+    pool = jobs_redacao.PoolCorrecoes(conexoes, cliente, trabalhadores=1, cache=cache)
+    pool.preparar()
+    chave = cache_correcoes.chave(TEMA, TEXTO, redacao.VERSAO_RUBRICA, cliente.identificador)
+    cache.guardar(chave, redacao.VERSAO_RUBRICA, cliente.identificador, CORRECAO, 3.0)
+
+    job_id, do_cache = pool.submeter(TEMA, " ".join(TEXTO.split()))
+    assert do_cache is True
+    assert pool.metricas()["profundidade_fila"] == 0
+    job = pool.obter(job_id)
+    assert job["estado"] == jobs_redacao.CONCLUIDO
+    assert job["correcao"] == CORRECAO
+    assert cliente.chamadas == 0
+
+
+def test_submeter_com_outra_rubrica_ignora_o_cache(conexoes, cache, monkeypatch):
+    cliente = ClienteContado()
+    pool = jobs_redacao.PoolCorrecoes(conexoes, cliente, trabalhadores=1, cache=cache)
+    pool.preparar()
+    chave = cache_correcoes.chave(TEMA, TEXTO, redacao.VERSAO_RUBRICA, cliente.identificador)
+    cache.guardar(chave, redacao.VERSAO_RUBRICA, cliente.identificador, CORRECAO, 3.0)
+
+    monkeypatch.setattr(redacao, "VERSAO_RUBRICA", redacao.VERSAO_RUBRICA + "-nova")
+    job_id, do_cache = pool.submeter(TEMA, TEXTO)
+    assert do_cache is False
+    assert pool.aguardar(job_id, timeout=5)["correcao"] != CORRECAO
+    assert cliente.chamadas == 1
+
+
+def test_correcao_nova_vai_para_o_cache(conexoes, cache):
+    cliente = ClienteContado()
+    pool = jobs_redacao.PoolCorrecoes(conexoes, cliente, trabalhadores=1, cache=cache)
+    pool.preparar()
+    job_id, do_cache = pool.submeter(TEMA, TEXTO)
+    assert do_cache is False
+    job = pool.aguardar(job_id, timeout=5)
+    assert job["estado"] == jobs_redacao.CONCLUIDO
+
+    segundo_id, do_cache = pool.submeter(TEMA, TEXTO + "  ")
+    assert do_cache is True
+    assert pool.obter(segundo_id)["correcao"] == job["correcao"]
+    assert cliente.chamadas == 1
+    conn = sqlite3.connect(conexoes.caminho)
+    try:
+        assert conn.execute("SELECT rubrica, modelo FROM correcoes_cache").fetchall() == [
+            (redacao.VERSAO_RUBRICA, cliente.identificador)]
+    finally:
+        conn.close()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import gc
+import json
+
+import pytest
+from flask import Flask
+
+from cache_http import (CACHE_CONTROL_BANCO, CACHE_CONTROL_ESTATICO, CUSTO_ENTRADA, CacheFragmentos, CacheRespostas,
+                        resposta_emendada)
+
+
+class Snapshot:
+    """Chave de cache com a mesma semântica do snapshot: vale por identidade."""
+
+
+@pytest.fixture
+def flask_app():
+    return Flask(__name__)
+
+
+def test_corpo_gerado_uma_vez_por_chave(flask_app):
+    cache = CacheRespostas()
+    chamadas = []
+
+    def gerar():
+        chamadas.append(1)
+        return {"success": True, "n": len(chamadas)}
+
+    snapshot = Snapshot()
+    with flask_app.app_context():
+        primeiro = cache.corpo('areas', snapshot, gerar)
+        assert cache.corpo('areas', snapshot, gerar) is primeiro
+        assert json.loads(primeiro.corpo) == {"success": True, "n": 1}
+
+        novo = Snapshot()
+        trocado = cache.corpo('areas', novo, gerar)
+        assert json.loads(trocado.corpo)["n"] == 2
+        assert trocado.etag != primeiro.etag
+
+        # Estáticos (chave None) valem pelo processo inteiro
+        estatico = cache.corpo('temas', None, gerar)
+        assert cache.corpo('temas', None, gerar) is estatico
+    assert len(chamadas) == 3
+
+
+def test_etag_depende_so_do_corpo(flask_app):
+    with flask_app.app_context():
+        a = CacheRespostas().corpo('areas', None, lambda: {"areas": [1, 2]})
+        b = CacheRespostas().corpo('areas', None, lambda: {"areas": [1, 2]})
+        c = CacheRespostas().corpo('areas', None, lambda: {"areas": [2, 1]})
+    assert a.etag == b.etag
+    assert a.etag != c.etag
+
+
+def test_nao_segura_snapshots_antigos(flask_app):
+    cache = CacheRespostas()
+    snapshot = Snapshot()
+    with flask_app.app_context():
+        cache.corpo('areas', snapshot, lambda: {"v": 1})
+        del snapshot
+        gc.collect()
+        # A referência fraca morreu: o próximo snapshot gera um corpo novo
+        assert json.loads(cache.corpo('areas', Snapshot(), lambda: {"v": 2}).corpo) == {"v": 2}
+
+
+def test_responder_com_304(flask_app):
+    cache = CacheRespostas()
+    snapshot = Snapshot()
+
+    @flask_app.route('/dados')
+    def dados():
+        return cache.responder('dados', snapshot, lambda: {"success": True})
+
+    @flask_app.route('/estatico')
+    def estatico():
+        return cache.responder('estatico', None, lambda: {"temas": []}, CACHE_CONTROL_ESTATICO)
+
+    cliente = flask_app.test_client()
+    resposta = cliente.get('/dados')
+    etag = resposta.headers['ETag']
+    assert not etag.startswith('W/')
+    assert resposta.headers['Cache-Control'] == CACHE_CONTROL_BANCO
+    assert resposta.get_json() == {"success": True}
+
+    repetida = cliente.get('/dados', headers={'If-None-Match': etag})
+    assert repetida.status_code == 304
+    assert repetida.data == b''
+    assert cliente.get('/dados', headers={'If-None-Match': '"outro"'}).status_code == 200
+    assert cliente.get('/estatico').headers['Cache-Control'] == CACHE_CONTROL_ESTATICO
+
+
+@pytest.mark.parametrize("rota", ['/api/areas', '/api/bancas', '/api/catalogo'])
+def test_rotas_do_catalogo_revalidam(cliente, rota):
+    resposta = cliente.get(rota)
+    assert resposta.status_code == 200
+    etag = resposta.headers['ETag']
+    assert cliente.get(rota).data == resposta.data
+    assert cliente.get(rota, headers={'If-None-Match': etag}).status_code == 304
+
+
+class Questao:
+    def __init__(self, questao_id, enunciado):
+        self.id = questao_id
+        self.enunciado = enunciado
+
+    def como_dict(self):
+        return {"id": self.id, "enunciado": self.enunciado, "alternativas": {"a": "sim", "b": "não"}}
+
+
+def test_emendado_igual_ao_json_completo(flask_app):
+    questao = Questao(7, 'Aspas "duplas", <tags> e acentuação')
+    with flask_app.app_context():
+        fragmento = CacheFragmentos(1 << 20).obter("v1", questao)
+        dados = {"success": True, "indice_atual": 0, "questao": fragmento, "resposta_anterior": None,
+                 "lista": [fragmento, {"x": 1.5}]}
+        corpo = resposta_emendada(dados).get_data()
+    esperado = dict(dados, questao=questao.como_dict(), lista=[questao.como_dict(), {"x": 1.5}])
+    assert json.loads(corpo) == esperado
+
+
+def test_fragmentos_por_versao_e_limitados_por_bytes(flask_app):
+    questoes = [Questao(i, "enunciado " * 20) for i in range(10)]
+    with flask_app.app_context():
+        tamanho = len(CacheFragmentos(1 << 20).obter("v", questoes[0])) + CUSTO_ENTRADA
+        cache = CacheFragmentos(3 * tamanho)
+        primeiro = cache.obter("v1", questoes[0])
+        assert cache.obter("v1", questoes[0]) is primeiro
+        assert (cache.acertos, cache.faltas) == (1, 1)
+        # Outra versão do banco não reaproveita o fragmento
+        cache.obter("v2", questoes[0])
+        assert cache.faltas == 2
+
+        for questao in questoes[1:]:
+            cache.obter("v1", questao)
+        assert len(cache) == 3
+        assert cache.bytes_usados <= cache.limite_bytes
+        assert cache.metricas()["entradas"] == 3
+
+        # Fragmento maior que o limite é devolvido sem entrar no cache
+        minusculo = CacheFragmentos(10)
+        assert json.loads(minusculo.obter("v1", questoes[0])) == questoes[0].como_dict()
+        assert len(minusculo) == 0
+
+
+def test_questao_do_simulado_emendada(cliente, modulo_app):
+    cliente.post('/api/simulado/iniciar', json={"areas": ["Língua Portuguesa"], "quantidade": "todas"})
+    for indice in range(3):
+        dados = cliente.get('/api/simulado/questao/{}'.format(indice)).get_json()
+        banco = modulo_app.banco_questoes.atual()
+        assert dados["questao"] == json.loads(json.dumps(banco.questao(dados["questao"]["id"]).como_dict()))
+        assert dados["indice_atual"] == indice
+        assert dados["resposta_anterior"] is None
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+import pytest
+
+from banco_questoes import carregar_banco
+from catalogo import DIMENSOES
+from conftest import QUESTOES
+
+
+@pytest.fixture
+def cubo(banco_trabalho):
+    return carregar_banco(banco_trabalho).catalogo
+
+
+def test_contagens_do_cubo(cubo):
+    assert cubo.total == len(QUESTOES)
+    assert cubo.contar(banca={"FGV"}) == sum(1 for q in QUESTOES if q[2] == "FGV")
+    assert cubo.contar(area={"Exatas e Raciocínio Lógico"}, banca={"VUNESP"}) == 2
+    assert cubo.contar(disciplina={"Química"}) == 0
+    assert cubo.distribuicao("disciplina") == Counter(q[0] for q in QUESTOES)
+    assert cubo.distribuicao("banca", area={"Língua Portuguesa"}) == {"VUNESP": 2, "FGV": 1}
+
+
+def test_como_dict(cubo):
+    dados = cubo.como_dict()
+    areas = {area["nome_area"]: area["total_questoes"] for area in dados["areas"]}
+    assert areas == {"Língua Portuguesa": 3, "Exatas e Raciocínio Lógico": 3, "Conhecimentos Jurídicos": 2}
+    assert [a["total_questoes"] for a in dados["areas"]] == sorted(areas.values(), reverse=True)
+    assert dados["bancas"][0] == {"banca": "VUNESP", "total_questoes": 4}
+    assert dados["dificuldade_por_banca"]["CESPE"] == {"Média": 1}
+    assert cubo.como_dict() is dados
+
+
+def test_cubo_compacto_reconstroi_as_celulas(cubo):
+    compacto = cubo.compacto()
+    assert compacto["dimensoes"] == list(DIMENSOES)
+    celulas = {}
+    for *indices, quantidade in compacto["celulas"]:
+        chave = tuple(compacto["valores"][dimensao][j] for dimensao, j in zip(DIMENSOES, indices))
+        celulas[chave] = quantidade
+    assert celulas == cubo.celulas
+
+
+def test_endpoint_catalogo(cliente):
+    dados = cliente.get('/api/catalogo').get_json()
+    assert dados["success"]
+    assert dados["total_questoes"] == len(QUESTOES)
+    assert dados["temas"]
+    assert cliente.get('/api/areas').get_json()["areas"] == dados["areas"]
+    assert cliente.get('/api/bancas').get_json()["bancas"] == dados["bancas"]
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import threading
+
+import pytest
+
+import conexoes as modulo_conexoes
+from conexoes import ConexoesPorRequisicao, GerenciadorConexoes
+
+
+@pytest.fixture
+def gerenciador(tmp_path):
+    gerenciador = GerenciadorConexoes(str(tmp_path / "database.db"))
+    yield gerenciador
+    gerenciador.fechar_todas()
+
+
+def em_outra_thread(funcao):
+    resultado = []
+    thread = threading.Thread(target=lambda: resultado.append(funcao()))
+    thread.start()
+    thread.join()
+    return resultado[0], thread
+
+
+def test_mesma_conexao_na_mesma_thread(gerenciador):
+    conn = gerenciador.obter()
+    gerenciador.liberar(conn)
+    assert gerenciador.obter() is conn
+    assert gerenciador.total_aberturas == 1
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+
+def test_uma_conexao_por_thread(gerenciador):
+    principal = gerenciador.obter()
+    outra, _ = em_outra_thread(gerenciador.obter)
+    assert outra is not principal
+    assert gerenciador.total_aberturas == 2
+
+
+def test_conexao_de_thread_encerrada_e_fechada(gerenciador):
+    morta, thread = em_outra_thread(gerenciador.obter)
+    assert not thread.is_alive()
+    # A próxima abertura poda as conexões das threads que terminaram
+    gerenciador.obter()
+    assert list(gerenciador._abertas.values()) == [gerenciador.obter()]
+    with pytest.raises(sqlite3.ProgrammingError):
+        morta.execute("SELECT 1")
+
+
+def test_liberar_desfaz_transacao_esquecida(gerenciador):
+    conn = gerenciador.obter()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    assert conn.in_transaction
+    gerenciador.liberar(conn)
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_fork_esquece_as_conexoes_herdadas(gerenciador, monkeypatch):
+    herdada = gerenciador.obter()
+    pid_filho = modulo_conexoes.os.getpid() + 1
+    monkeypatch.setattr(modulo_conexoes.os, "getpid", lambda: pid_filho)
+    nova = gerenciador.obter()
+    assert nova is not herdada
+    assert list(gerenciador._abertas.values()) == [nova]
+    assert gerenciador.obter() is nova
+    # A herdada não foi fechada pelo filho (ela ainda é do processo pai)
+    assert herdada.execute("SELECT 1").fetchone()[0] == 1
+    herdada.close()
+
+
+def test_conexoes_por_requisicao(tmp_path):
+    gerenciador = ConexoesPorRequisicao(str(tmp_path / "database.db"))
+    conn = gerenciador.obter()
+    gerenciador.liberar(conn)
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert gerenciador.obter() is not conn
+    assert gerenciador.total_aberturas == 2
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+
+import pytest
+
+import agregados
+from banco_questoes import BancoQuestoes, Questao, carregar_banco
+import correcao
+from sessao_simulado import BIT_ACERTO, RESPOSTA_OUTRA
+from taxonomia import Taxonomia
+
+
+@pytest.fixture
+def banco(banco_trabalho):
+    return carregar_banco(banco_trabalho)
+
+
+def _por_area(resultado):
+    areas = defaultdict(lambda: [0, 0])
+    for (area, _, _, _, _), (acertos, total) in resultado.desempenho.items():
+        areas[area][0] += acertos
+        areas[area][1] += total
+    return dict(areas)
+
+
+def test_empacotar_respostas(banco):
+    # Gabarito das questões 1..4: a, b, c, d
+    respostas = correcao.empacotar_respostas(banco.gabarito, [1, 2, 3, 4], ["A ", "c", None, "talvez"])
+    assert respostas[0] == 1 | BIT_ACERTO
+    assert respostas[1] == 3
+    assert respostas[2] == 0
+    assert respostas[3] == RESPOSTA_OUTRA
+    with pytest.raises(ValueError):
+        correcao.empacotar_respostas(banco.gabarito, [1, 99], ["a", "a"])
+
+
+def test_nao_respondidas_contam_como_erro(banco):
+    resultado, = correcao.corrigir_lote(banco, [([1, 2, 3, 4], ["a", None, "", "d"])])
+    assert (resultado.total_questoes, resultado.total_acertos, resultado.percentual) == (4, 2, 50.0)
+
+
+def test_desempenho_agrupado_por_area(banco):
+    ids = [1, 2, 3, 4, 5, 6, 7, 8]
+    resultado, = correcao.corrigir_lote(banco, [(ids, ["a", "b", "x", "d", None, "a", "c", "c"])])
+    assert _por_area(resultado) == {
+        "Língua Portuguesa": [2, 3],
+        "Exatas e Raciocínio Lógico": [2, 3],
+        "Conhecimentos Jurídicos": [1, 2],
+    }
+    assert dict(resultado.por_materia()) == {
+        "Crase": [2, 2], "Regência": [0, 1], "Porcentagem": [1, 1], "Frações": [0, 1],
+        "Contratos": [1, 1], "Posse": [0, 1], "Proposições": [1, 1],
+    }
+
+
+def test_ids_esparsos_e_respostas_longas():
+    questoes = [
+        Questao(1, "Matemática", "Frações", "Fácil", "?", {}, "a", None, None, None, "FGV"),
+        Questao(10 ** 9, "Direito Civil", "Posse", "Média", "?", {}, "Certo", None, None, None, "CESPE"),
+    ]
+    taxonomia = Taxonomia([("Exatas", ("Matemática",)), ("Jurídicas", ("Direito Civil",))])
+    banco = BancoQuestoes(questoes, "v1", taxonomia)
+    assert banco.gabarito.indice is not None
+    assert len(banco.mapa_desempenho.grupos) == 2
+
+    resultado, = correcao.corrigir_lote(banco, [([10 ** 9, 1], [" certo", "b"])])
+    assert resultado.total_acertos == 1
+    assert _por_area(resultado) == {"Exatas": [0, 1], "Jurídicas": [1, 1]}
+
+
+def test_gravar_resultados(banco, banco_trabalho):
+    agregados.criar_tabelas(banco_trabalho)
+    resultados = correcao.corrigir_lote(banco, [([1, 4], ["a", "d"]), ([2], [None])])
+    cursor = banco_trabalho.cursor()
+    resultado_ids = correcao.gravar(cursor, resultados)
+    banco_trabalho.commit()
+    assert banco_trabalho.execute(
+        "SELECT total_questoes, total_acertos, percentual FROM resultados ORDER BY id").fetchall() == [
+        (2, 2, 100.0), (1, 0, 0.0)]
+    assert sorted(banco_trabalho.execute(
+        "SELECT resultado_id, materia, acertos, total FROM desempenho_materia").fetchall()) == sorted([
+        (resultado_ids[0], "Crase", 1, 1), (resultado_ids[0], "Porcentagem", 1, 1), (resultado_ids[1], "Crase", 0, 1)])
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import agregados
+import fila_resultados
+from conexoes import GerenciadorConexoes
+from correcao import ResultadoSimulado
+from importar_questoes import criar_tabelas
+
+pytestmark = pytest.mark.skipif(not fila_resultados.DISPONIVEL, reason="requer fcntl")
+
+
+@pytest.fixture
+def conexoes(tmp_path):
+    conexoes = GerenciadorConexoes(str(tmp_path / "database.db"))
+    conn = conexoes.obter()
+    criar_tabelas(conn)
+    agregados.preparar(conn, {})
+    fila_resultados.preparar(conn)
+    yield conexoes
+    conexoes.fechar_todas()
+
+
+def escrever_orfao(diretorio, nome, entradas):
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, nome)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for entrada in entradas:
+            f.write(fila_resultados._codificar(*entrada))
+    return caminho
+
+
+def reaplicar(conexoes, diretorio, orfao):
+    # A escritora reaplica os órfãos ao subir e apaga cada journal reaplicado
+    fila = fila_resultados.FilaResultados(conexoes, diretorio, sincronizar=False)
+    fila.garantir_ativo()
+    limite = time.monotonic() + 5
+    while os.path.exists(orfao) and time.monotonic() < limite:
+        time.sleep(0.01)
+    return fila
+
+
+def entradas_exemplo():
+    desempenho = {("Linguagens", "Português", "Sintaxe", "VUNESP", "Média"): [3, 5]}
+    return [("e{}".format(i), "2026-01-01 10:00:00", ResultadoSimulado(5, 3, 60.0, desempenho)) for i in range(3)]
+
+
+def total_resultados(conexoes):
+    conn = sqlite3.connect(conexoes.caminho)
+    try:
+        return conn.execute("SELECT COUNT(*), COUNT(DISTINCT entrada_id) FROM resultados").fetchone()
+    finally:
+        conn.close()
+
+
+def test_reaplicacao_de_journal_orfao_e_idempotente(conexoes, tmp_path):
+    diretorio = str(tmp_path / "journal")
+    entradas = entradas_exemplo()
+
+    caminho = escrever_orfao(diretorio, "resultados-1-aaaa.jsonl", entradas)
+    fila = reaplicar(conexoes, diretorio, caminho)
+    assert not os.path.exists(caminho)
+    assert fila.reaplicadas == 3
+    assert total_resultados(conexoes) == (3, 3)
+
+    # Queda depois do commit e antes de apagar o journal: ele volta a aparecer
+    caminho = escrever_orfao(diretorio, "resultados-2-bbbb.jsonl", entradas)
+    fila = reaplicar(conexoes, diretorio, caminho)
+    assert not os.path.exists(caminho)
+    assert fila.reaplicadas == 0
+    assert total_resultados(conexoes) == (3, 3)
+
+
+def test_linha_cortada_no_fim_do_journal_e_ignorada(tmp_path):
+    entradas = entradas_exemplo()
+    caminho = escrever_orfao(str(tmp_path), "resultados-1-cccc.jsonl", entradas)
+    with open(caminho, 'a', encoding='utf-8') as f:
+        f.write(fila_resultados._codificar(*entradas[0])[:20])
+    assert [entrada_id for entrada_id, _, _ in fila_resultados.ler_journal(caminho)] == ["e0", "e1", "e2"]
+
+
+def esperar(condicao, timeout=5):
+    limite = time.monotonic() + timeout
+    while not condicao() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicao()
+
+
+def test_lote_recusado_nao_trava_o_journal(conexoes, tmp_path):
+    diretorio = str(tmp_path / "journal")
+    fila = fila_resultados.FilaResultados(conexoes, diretorio, sincronizar=False)
+    desempenho = {("Linguagens", "Português", "Sintaxe", "VUNESP", "Média"): [1, 2]}
+
+    # NOT NULL violado no banco (sqlite3.Error) e desempenho malformado (TypeError)
+    fila.enfileirar(ResultadoSimulado(None, 1, 50.0, desempenho))
+    assert fila.aguardar(5)
+    fila.enfileirar(ResultadoSimulado(2, 1, 50.0, {("a", "b", "c", "d", "e"): ["x", 1]}))
+    assert fila.aguardar(5)
+    assert fila.rejeitadas == 2
+    assert fila._thread.is_alive()
+
+    for _ in range(3):
+        fila.enfileirar(ResultadoSimulado(2, 1, 50.0, desempenho))
+    assert fila.aguardar(5)
+    assert esperar(lambda: os.path.getsize(fila._journal.name) == 0)
+    assert total_resultados(conexoes) == (3, 3)
+
+    # Os recusados ficam em journals sem trava, para a próxima reaplicação
+    separados = [nome for nome in os.listdir(diretorio) if nome != os.path.basename(fila._journal.name)]
+    assert len(separados) == 2
+    assert sorted(len(fila_resultados.ler_journal(os.path.join(diretorio, nome))) for nome in separados) == [1, 1]
+
+
+def test_escritora_morta_e_reposta_com_o_mesmo_journal(conexoes, tmp_path):
+    fila = fila_resultados.FilaResultados(conexoes, str(tmp_path / "journal"), sincronizar=False)
+    fila.garantir_ativo()
+    journal, fila_interna = fila._journal, fila._fila
+    morta = threading.Thread(target=lambda: None)
+    morta.start()
+    morta.join()
+    fila._thread = morta            # como se a escritora tivesse morrido
+
+    fila.enfileirar(ResultadoSimulado(2, 1, 50.0, {}))
+    assert fila._journal is journal and fila._fila is fila_interna
+    assert fila.aguardar(5)
+    assert total_resultados(conexoes) == (1, 1)
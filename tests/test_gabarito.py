@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from gabarito import FATOR_ESPARSO, FOLGA_ESPARSA, Gabarito
+
+
+def _gabarito(ids):
+    respostas = ("a", " B ", "certo", "f", None)
+    itens = [(questao_id, respostas[k % len(respostas)], ("Matemática", "FGV" if k % 2 else "VUNESP"))
+             for k, questao_id in enumerate(ids)]
+    return Gabarito(iter(itens), ids)
+
+
+DENSOS = (3, 4, 5, 7, 10)
+ESPARSOS = (1, 2, 10 ** 9)
+
+
+@pytest.mark.parametrize("ids", [DENSOS, ESPARSOS])
+def test_respostas_e_chaves(ids):
+    gabarito = _gabarito(ids)
+    assert [gabarito.resposta(questao_id) for questao_id in ids[:3]] == ["a", "b", "certo"]
+    assert gabarito.chave(ids[0]) == ("Matemática", "VUNESP")
+    assert gabarito.chave(ids[1]) == ("Matemática", "FGV")
+    assert gabarito.corrigir(ids[1], "b") is True
+    assert gabarito.corrigir(ids[2], "c") is False
+    assert gabarito.corrigir(ids[2], "certo") is True
+
+
+def test_respostas_fora_de_a_e():
+    gabarito = _gabarito(DENSOS)
+    # Letras depois do E ficam no array; o resto (certo/errado, vazio) no dicionário
+    assert gabarito.resposta(7) == "f"
+    assert gabarito.resposta(10) == ""
+    assert gabarito.respostas_longas == {5: "certo", 10: ""}
+
+
+@pytest.mark.parametrize("ids", [DENSOS, ESPARSOS])
+def test_ids_ausentes(ids):
+    gabarito = _gabarito(ids)
+    for questao_id in (0, 6, 11, 10 ** 9 + 1, -1):
+        if questao_id in ids:
+            continue
+        assert questao_id not in gabarito
+        assert gabarito.resposta(questao_id) is None
+        assert gabarito.chave(questao_id) is None
+        assert gabarito.corrigir(questao_id, "a") is None
+
+
+def test_faixa_esparsa_usa_dicionario():
+    assert _gabarito(DENSOS).indice is None
+    assert len(_gabarito(DENSOS).letras) == 8
+
+    esparso = _gabarito(ESPARSOS)
+    assert esparso.indice == {1: 0, 2: 1, 10 ** 9: 2}
+    assert len(esparso.letras) == len(ESPARSOS)
+
+    limite = FATOR_ESPARSO * 2 + FOLGA_ESPARSA
+    assert _gabarito((1, limite)).indice is None
+    assert _gabarito((1, limite + 1)).indice is not None
+
+
+def test_vazio():
+    gabarito = Gabarito([], ())
+    assert 1 not in gabarito
+    assert len(gabarito.letras) == 0
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from clientes_llm import ClienteInstavel, ClienteLocal, ErroLLM
+from gateway_llm import Disjuntor, ErroCircuitoAberto, ErroPrazo, GatewayLLM
+
+PROMPT = "Corrija a redação."
+
+
+def gateway(cliente, **opcoes):
+    padrao = dict(tentativas=1, espera_base=0.001, limiar_falhas=3, reabertura=60.0, prazo=5.0)
+    padrao.update(opcoes)
+    return GatewayLLM(cliente, **padrao)
+
+
+def test_disjuntor_abre_depois_de_n_falhas():
+    cliente = ClienteInstavel()
+    cliente.fora_do_ar()
+    g = gateway(cliente)
+    for _ in range(3):
+        with pytest.raises(ErroLLM) as erro:
+            g.responder(PROMPT)
+        assert not isinstance(erro.value, ErroCircuitoAberto)
+    assert g.disjuntor.estado == Disjuntor.ABERTO
+    with pytest.raises(ErroCircuitoAberto):
+        g.responder(PROMPT)
+    assert cliente.chamadas == 3
+    assert g.metricas()["disjuntor"]["aberturas"] == 1
+
+
+def test_novas_tentativas_contam_como_falhas():
+    cliente = ClienteInstavel()
+    cliente.fora_do_ar()
+    g = gateway(cliente, tentativas=3)
+    with pytest.raises(ErroLLM):
+        g.responder(PROMPT)
+    assert cliente.chamadas == 3
+    assert g.disjuntor.estado == Disjuntor.ABERTO
+
+
+def test_meio_aberto_deixa_passar_uma_sondagem():
+    disjuntor = Disjuntor(limiar_falhas=1, reabertura=0.05)
+    disjuntor.falha()
+    assert not disjuntor.permitir()
+    time.sleep(0.06)
+    assert disjuntor.permitir()
+    assert disjuntor.estado == Disjuntor.MEIO_ABERTO
+    assert not disjuntor.permitir()
+    disjuntor.falha()
+    assert disjuntor.estado == Disjuntor.ABERTO
+    assert not disjuntor.permitir()
+
+
+def test_sondagem_unica_com_chamadas_simultaneas():
+    cliente = ClienteInstavel(atraso=0.3)
+    cliente.fora_do_ar()
+    g = gateway(cliente, limiar_falhas=1, reabertura=0.05)
+    with pytest.raises(ErroLLM):
+        g.responder(PROMPT)
+    cliente.restabelecer()
+    time.sleep(0.06)
+
+    desfechos = []
+    inicio = threading.Barrier(4)
+
+    def chamar():
+        inicio.wait()
+        try:
+            g.responder(PROMPT)
+            desfechos.append("sucesso")
+        except ErroCircuitoAberto:
+            desfechos.append("circuito_aberto")
+
+    threads = [threading.Thread(target=chamar) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(desfechos) == ["circuito_aberto"] * 3 + ["sucesso"]
+    assert cliente.chamadas == 2
+
+
+def test_sondagem_bem_sucedida_fecha_o_circuito():
+    cliente = ClienteInstavel()
+    cliente.fora_do_ar()
+    g = gateway(cliente, limiar_falhas=2, reabertura=0.05)
+    for _ in range(2):
+        with pytest.raises(ErroLLM):
+            g.responder(PROMPT)
+    assert g.disjuntor.estado == Disjuntor.ABERTO
+
+    cliente.restabelecer()
+    time.sleep(0.06)
+    texto, modelo = g.responder(PROMPT)
+    assert (texto, modelo) == (ClienteLocal().gerar(PROMPT), "instavel")
+    assert g.disjuntor.estado == Disjuntor.FECHADO
+    assert g.disjuntor.falhas_seguidas == 0
+    # Fechado de novo: uma falha isolada não reabre
+    cliente.fora_do_ar()
+    with pytest.raises(ErroLLM):
+        g.responder(PROMPT)
+    assert g.disjuntor.estado == Disjuntor.FECHADO
+
+
+def test_reserva_responde_com_o_circuito_aberto():
+    cliente = ClienteInstavel()
+    cliente.fora_do_ar()
+    reserva = ClienteLocal()
+    g = gateway(cliente, reserva=reserva, limiar_falhas=1)
+    # A falha que abre o circuito já é respondida pela reserva
+    assert g.responder(PROMPT) == (reserva.gerar(PROMPT), "local")
+    assert g.responder(PROMPT) == (reserva.gerar(PROMPT), "local")
+    assert cliente.chamadas == 1
+    metricas = g.metricas()
+    assert metricas["motivos_reserva"] == {"erro": 1, "circuito_aberto": 1}
+    assert metricas["latencia"]["reserva"]["total"] == 2
+
+
+def test_prazo_e_respeitado():
+    cliente = ClienteInstavel(taxa_lentidao=1.0, atraso_lento=1.0)
+    g = gateway(cliente, prazo=0.1)
+    inicio = time.monotonic()
+    with pytest.raises(ErroPrazo):
+        g.responder(PROMPT)
+    assert time.monotonic() - inicio < 0.5
+    assert g.disjuntor.falhas_seguidas == 1
+    assert g.metricas()["latencia"]["prazo"]["total"] == 1
+
+
+def test_prazo_estourado_usa_a_reserva():
+    cliente = ClienteInstavel(taxa_lentidao=1.0, atraso_lento=1.0)
+    reserva = ClienteLocal()
+    g = gateway(cliente, reserva=reserva)
+    inicio = time.monotonic()
+    assert g.responder(PROMPT, prazo=0.1) == (reserva.gerar(PROMPT), "local")
+    assert time.monotonic() - inicio < 0.5
+    assert g.metricas()["motivos_reserva"] == {"prazo": 1}
+
+
+def test_prazo_vale_para_o_streaming_inteiro():
+    cliente = ClienteInstavel(atraso=1.0)
+    g = gateway(cliente, prazo=0.2)
+    modelo, pedacos = g.transmitir(PROMPT)
+    assert modelo == "instavel"
+    inicio = time.monotonic()
+    with pytest.raises(ErroPrazo):
+        for _ in pedacos:
+            pass
+    assert time.monotonic() - inicio < 0.5
+    assert g.disjuntor.falhas_seguidas == 1
+
+
+def test_erro_nao_transitorio_nao_conta_no_disjuntor():
+    class ClienteInvalido(ClienteLocal):
+        nome = "invalido"
+
+        def gerar(self, prompt, prazo=None):
+            raise ErroLLM("Pedido inválido.", transitorio=False)
+
+    g = gateway(ClienteInvalido(), reserva=ClienteLocal(), limiar_falhas=1)
+    with pytest.raises(ErroLLM):
+        g.responder(PROMPT)
+    assert g.disjuntor.estado == Disjuntor.FECHADO
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import csv
+import json
+import sqlite3
+
+import pytest
+
+import questoes_publicadas
+from banco_questoes import hashes_registro
+from importar_questoes import (carregar_registros, criar_tabelas, gerar_registros, importar_dados, ler_csv,
+                               sincronizar_registros)
+
+
+def registro(enunciado, banca='VUNESP', materia='Sintaxe', resposta='a'):
+    base = ('Português', materia, 'Média', enunciado, '{"a": "sim", "b": "não"}', resposta,
+            None, None, None, banca)
+    return base + hashes_registro(base)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "questoes.db"))
+    criar_tabelas(conn)
+    yield conn
+    conn.close()
+
+
+def questoes(conn):
+    return {row[0]: row[1:] for row in conn.execute("SELECT enunciado, id, materia, banca, ativo FROM questoes")}
+
+
+def test_sincronizar_insere_atualiza_e_ignora_iguais(conn):
+    contagens, _ = sincronizar_registros(conn, [registro('Q1'), registro('Q2'), registro('Q3')])
+    assert contagens == {'inseridas': 3, 'atualizadas': 0, 'inalteradas': 0, 'desativadas': 0}
+    ids = {enunciado: linha[0] for enunciado, linha in questoes(conn).items()}
+
+    contagens, _ = sincronizar_registros(conn, [registro('Q1'), registro('Q2', materia='Regência'),
+                                                registro('Q3'), registro('Q4')])
+    assert contagens == {'inseridas': 1, 'atualizadas': 1, 'inalteradas': 2, 'desativadas': 0}
+    depois = questoes(conn)
+    assert depois['Q2'][:2] == (ids['Q2'], 'Regência')
+    assert {enunciado: depois[enunciado][0] for enunciado in ids} == ids
+
+
+def test_sincronizar_sem_mudancas_nao_muda_versao(conn):
+    sincronizar_registros(conn, [registro('Q1')])
+    versao = conn.execute("SELECT versao FROM versao_banco").fetchone()
+    contagens, _ = sincronizar_registros(conn, [registro('Q1')])
+    assert contagens['inalteradas'] == 1
+    assert conn.execute("SELECT versao FROM versao_banco").fetchone() == versao
+
+
+def test_sincronizar_desativa_e_reativa_ausentes(conn):
+    sincronizar_registros(conn, [registro('Q1'), registro('Q2')])
+    contagens, _ = sincronizar_registros(conn, [registro('Q1')], desativar_ausentes=True)
+    assert contagens['desativadas'] == 1
+    assert questoes(conn)['Q2'][3] == 0
+
+    contagens, _ = sincronizar_registros(conn, [registro('Q1'), registro('Q2')])
+    assert contagens['atualizadas'] == 1
+    assert questoes(conn)['Q2'][3] == 1
+
+
+def test_escopo_banca_nao_toca_outras_bancas(conn):
+    sincronizar_registros(conn, [registro('Q1', banca='FGV'), registro('Q2', banca='FGV'),
+                                 registro('Q3', banca='VUNESP')])
+    fgv = questoes(conn)
+
+    # Mesma questão (mesmo hash de conteúdo) vinda pela importação da VUNESP
+    contagens, _ = sincronizar_registros(conn, [registro('Q1', banca='VUNESP'), registro('Q3', banca='VUNESP')],
+                                         escopo_banca='VUNESP', desativar_ausentes=True)
+    assert contagens == {'inseridas': 1, 'atualizadas': 0, 'inalteradas': 1, 'desativadas': 0}
+    linhas = conn.execute("SELECT enunciado, banca, ativo FROM questoes ORDER BY id").fetchall()
+    assert linhas == [('Q1', 'FGV', 1), ('Q2', 'FGV', 1), ('Q3', 'VUNESP', 1), ('Q1', 'VUNESP', 1)]
+    assert fgv['Q1'][0] == 1 and fgv['Q2'][0] == 2
+
+
+CABECALHO = ['disciplina', 'materia', 'dificuldade', 'enunciado', 'alternativa_a', 'alternativa_b',
+             'alternativa_c', 'alternativa_d', 'alternativa_e', 'resposta_correta', 'justificativa', 'banca']
+
+
+def escrever_csv(caminho, linhas, cabecalho=CABECALHO):
+    with open(caminho, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.writer(f, delimiter=';')
+        escritor.writerow(cabecalho)
+        escritor.writerows(linhas)
+    return str(caminho)
+
+
+def test_registros_do_csv(tmp_path):
+    caminho = escrever_csv(tmp_path / "q.csv", [
+        ['Português', 'Crase', '', ' Use "crase"? ', 'sim', 'não', 'às vezes', 'nunca', 'sempre', 'B', '', 'FGV'],
+        ['Português', 'Crase', 'Difícil', 'Sem alternativa e', 'a1', 'b1', 'c1', 'd1', '', 'a', 'Porque sim.', ''],
+        ['', 'Crase', '', 'Sem disciplina', 'a', 'b', 'c', 'd', '', 'a', '', ''],
+        ['Português', 'Crase', '', 'Sem resposta', 'a', 'b', 'c', 'd', '', '', '', ''],
+    ])
+    contadores = {'ignoradas': 0}
+    registros = list(gerar_registros(ler_csv(caminho), banca_padrao='VUNESP', contadores=contadores))
+    assert contadores == {'ignoradas': 2}
+    primeiro, segundo = (r[:10] for r in registros)
+    assert primeiro == ('Português', 'Crase', 'Média', 'Use "crase"?',
+                        json.dumps({"a": "sim", "b": "não", "c": "às vezes", "d": "nunca", "e": "sempre"}),
+                        'b', None, None, None, 'FGV')
+    assert json.loads(segundo[4]) == {"a": "a1", "b": "b1", "c": "c1", "d": "d1"}
+    assert segundo[4] == json.dumps({"a": "a1", "b": "b1", "c": "c1", "d": "d1"})
+    assert (segundo[2], segundo[6], segundo[9]) == ('Difícil', 'Porque sim.', 'VUNESP')
+    assert registros[0][10:] == hashes_registro(primeiro)
+
+
+def versao(conn):
+    return conn.execute("SELECT versao FROM versao_banco").fetchone()[0]
+
+
+def test_carga_em_lotes_numa_transacao(conn):
+    antes = versao(conn)
+    total, _ = carregar_registros(conn, (registro('Q{}'.format(i)) for i in range(7)), tamanho_lote=2)
+    assert total == 7
+    assert conn.execute("SELECT COUNT(*) FROM questoes").fetchone()[0] == 7
+    # Uma carga sobe a versão uma vez, e os triggers voltam ao fim dela
+    assert versao(conn) == antes + 1
+    with conn:
+        conn.execute("UPDATE questoes SET materia = 'Regência' WHERE id = 1")
+    assert versao(conn) == antes + 2
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] != 0
+
+
+def test_falha_na_carga_desfaz_tudo(conn):
+    sincronizar_registros(conn, [registro('Antiga')])
+    antes = versao(conn)
+
+    def registros():
+        yield registro('Q1')
+        yield registro('Q2')
+        raise ValueError("linha corrompida")
+
+    with pytest.raises(ValueError):
+        carregar_registros(conn, registros(), antes_de_inserir=lambda c: c.execute("DELETE FROM questoes"),
+                           tamanho_lote=1)
+    assert list(questoes(conn)) == ['Antiga']
+    assert versao(conn) == antes
+    with conn:
+        conn.execute("UPDATE questoes SET materia = 'Regência'")
+    assert versao(conn) == antes + 1
+
+
+def test_importar_dados_incremental_e_substituindo(tmp_path):
+    linhas = [['Matemática', 'Frações', 'Fácil', 'Q{}'.format(i), 'a', 'b', 'c', 'd', 'e', 'c', '', 'FGV']
+              for i in range(5)]
+    caminho_csv = escrever_csv(tmp_path / "q.csv", linhas)
+    caminho_db = str(tmp_path / "database.db")
+    importar_dados(caminho_csv, caminho_db)
+    importar_dados(escrever_csv(tmp_path / "parcial.csv", linhas[1:]), caminho_db, desativar_ausentes=True)
+
+    banco = sqlite3.connect(caminho_db)
+    try:
+        assert banco.execute("SELECT id, ativo FROM questoes ORDER BY id").fetchall() == [
+            (1, 0), (2, 1), (3, 1), (4, 1), (5, 1)]
+    finally:
+        banco.close()
+    assert questoes_publicadas.versao_publicada(str(tmp_path / "questoes.db")) is not None
+
+    importar_dados(caminho_csv, caminho_db, substituir=True)
+    banco = sqlite3.connect(caminho_db)
+    try:
+        assert banco.execute("SELECT MIN(id), COUNT(*) FROM questoes").fetchone() == (6, 5)
+    finally:
+        banco.close()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+import jobs_redacao
+from clientes_llm import ClienteLocal
+from conexoes import GerenciadorConexoes
+
+TEMA = "Mobilidade urbana"
+TEXTO = "O transporte público é essencial.\n\nPortanto, o Estado deve investir."
+
+
+@pytest.fixture
+def conexoes(tmp_path):
+    conexoes = GerenciadorConexoes(str(tmp_path / "database.db"))
+    yield conexoes
+    conexoes.fechar_todas()
+
+
+def pool_de(conexoes, atraso=0.0, **opcoes):
+    pool = jobs_redacao.PoolCorrecoes(conexoes, ClienteLocal(atraso=atraso), **opcoes)
+    pool.preparar()
+    return pool
+
+
+def esperar_estado(pool, job_id, estado, timeout=2.0):
+    limite = time.monotonic() + timeout
+    while pool.obter(job_id)["estado"] != estado:
+        assert time.monotonic() < limite
+        time.sleep(0.01)
+
+
+def test_aguardar_volta_quando_o_job_termina(conexoes):
+    pool = pool_de(conexoes, atraso=0.1, trabalhadores=1)
+    job_id, do_cache = pool.submeter(TEMA, TEXTO)
+    assert do_cache is False
+    inicio = time.monotonic()
+    job = pool.aguardar(job_id, timeout=5)
+    assert time.monotonic() - inicio < 2
+    assert job["estado"] == jobs_redacao.CONCLUIDO
+    assert "nota_final" in job["correcao"]
+    assert job["duracao_s"] >= 0.1
+    assert pool.metricas()["concluidos"] == 1
+
+
+def test_aguardar_respeita_o_timeout(conexoes):
+    pool = pool_de(conexoes, atraso=1.0, trabalhadores=1)
+    job_id, _ = pool.submeter(TEMA, TEXTO)
+    inicio = time.monotonic()
+    job = pool.aguardar(job_id, timeout=0.1)
+    assert time.monotonic() - inicio < 0.5
+    assert job["estado"] in (jobs_redacao.PENDENTE, jobs_redacao.EXECUTANDO)
+    assert pool.aguardar("inexistente", timeout=1) is None
+
+
+def test_aguardar_job_de_outro_processo(conexoes):
+    # O job é concluído por outra conexão, sem aviso pela Condition: só a
+    # consulta periódica ao SQLite o encontra
+    pool = pool_de(conexoes)
+    job_id = pool._registrar(TEMA, jobs_redacao.PENDENTE)
+
+    def concluir():
+        time.sleep(0.3)
+        outro = GerenciadorConexoes(conexoes.caminho)
+        with outro.obter() as conn:
+            conn.execute("UPDATE jobs_redacao SET estado = ?, resultado = '{}' WHERE id = ?",
+                         (jobs_redacao.CONCLUIDO, job_id))
+        outro.fechar_todas()
+
+    thread = threading.Thread(target=concluir)
+    thread.start()
+    job = pool.aguardar(job_id, timeout=3)
+    thread.join()
+    assert job["estado"] == jobs_redacao.CONCLUIDO
+
+
+def test_expirar_encerra_orfaos_e_apaga_vencidos(conexoes):
+    pool = pool_de(conexoes, ttl=3600)
+    orfao = pool._registrar(TEMA, jobs_redacao.EXECUTANDO)
+    recente = pool._registrar(TEMA, jobs_redacao.PENDENTE)
+    vencido = pool._registrar(TEMA, jobs_redacao.CONCLUIDO, "{}")
+    agora = time.time()
+    with conexoes.obter() as conn:
+        conn.execute("UPDATE jobs_redacao SET criado_em = ? WHERE id = ?", (agora - jobs_redacao.PRAZO_ORFAO - 1, orfao))
+        conn.execute("UPDATE jobs_redacao SET criado_em = ? WHERE id = ?", (agora - 3601, vencido))
+
+    assert pool.expirar() == 1
+    assert pool.obter(vencido) is None
+    assert pool.obter(recente)["estado"] == jobs_redacao.PENDENTE
+    job = pool.obter(orfao)
+    assert job["estado"] == jobs_redacao.ERRO
+    assert job["erro"] == "Correção interrompida. Envie a redação novamente."
+
+
+def test_fila_cheia(conexoes):
+    pool = pool_de(conexoes, atraso=0.5, trabalhadores=1, capacidade=2)
+    primeiro, _ = pool.submeter(TEMA, TEXTO)
+    esperar_estado(pool, primeiro, jobs_redacao.EXECUTANDO)
+    pool.submeter(TEMA, TEXTO)
+    with pytest.raises(jobs_redacao.FilaCheia):
+        pool.submeter(TEMA, TEXTO)
+    metricas = pool.metricas()
+    assert metricas["rejeitados"] == 1
+    assert (metricas["em_execucao"], metricas["profundidade_fila"]) == (1, 1)
+    # Com a fila andando, há vaga de novo
+    limite = time.monotonic() + 3
+    while pool.metricas()["em_execucao"] + pool.metricas()["profundidade_fila"] >= 2:
+        assert time.monotonic() < limite
+        time.sleep(0.01)
+    pool.submeter(TEMA, TEXTO)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from json_incremental import AnalisadorIncremental
+
+CORRECAO = {
+    "nota_final": 72.5,
+    "analise_competencias": [
+        {"competencia": "Competência 1: Domínio da norma culta", "nota": 16, "comentario": "Bom uso da \"norma\"\\culta."},
+        {"competencia": "Competência 2: Compreensão do tema", "nota": 14, "comentario": "Linha 1\nLinha 2 é 😀"},
+    ],
+    "pontos_fortes": [],
+    "pontos_fracos": ["-1e3", True, False, None, -0.25],
+    "dicas_concursos": [{}],
+}
+TEXTO = "```json\n" + json.dumps(CORRECAO, indent=2, ensure_ascii=False) + "\n```"
+TEXTO_ASCII = json.dumps(CORRECAO)
+
+
+def analisar(pedacos):
+    analisador = AnalisadorIncremental()
+    completos = []
+    for pedaco in pedacos:
+        completos.extend(analisador.alimentar(pedaco))
+    return analisador.fim(), completos
+
+
+@pytest.mark.parametrize("texto", [TEXTO, TEXTO_ASCII])
+def test_qualquer_corte_da_o_mesmo_resultado(texto):
+    _, esperados = analisar([texto])
+    for corte in range(1, len(texto)):
+        valor, completos = analisar([texto[:corte], texto[corte:]])
+        assert valor == CORRECAO, corte
+        assert completos == esperados, corte
+
+
+@pytest.mark.parametrize("texto", [TEXTO, TEXTO_ASCII])
+def test_um_caractere_por_vez(texto):
+    valor, completos = analisar(list(texto))
+    assert valor == CORRECAO
+    assert completos == analisar([texto])[1]
+
+
+def test_competencias_saem_assim_que_fecham():
+    analisador = AnalisadorIncremental()
+    fim_primeira = TEXTO_ASCII.index("}") + 1
+    completos = analisador.alimentar(TEXTO_ASCII[:fim_primeira])
+    assert (("analise_competencias", 0), CORRECAO["analise_competencias"][0]) in completos
+    assert (("nota_final",), 72.5) in completos
+    assert not analisador.concluido
+
+
+def test_escalar_cortado_no_fim_do_pedaco():
+    analisador = AnalisadorIncremental()
+    assert analisador.alimentar('{"nota_final": 7') == []
+    assert analisador.alimentar('2.5, "x": tr') == [(("nota_final",), 72.5)]
+    assert analisador.alimentar('ue}') == [(("x",), True), ((), {"nota_final": 72.5, "x": True})]
+
+
+def test_json_incompleto():
+    analisador = AnalisadorIncremental()
+    analisador.alimentar('{"nota_final": 70, "analise_competencias": [')
+    with pytest.raises(ValueError):
+        analisador.fim()
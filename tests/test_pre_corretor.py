@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import pre_corretor
+
+
+def conectivos(texto):
+    return {categoria: n for categoria, n in pre_corretor.indicadores("tema", texto)["conectivos"].items() if n}
+
+
+def test_conectivo_mais_longo_consome_o_prefixo():
+    assert conectivos("Ainda que seja difícil, há esperança.") == {"oposicao": 1}
+    assert conectivos("Ainda que seja difícil, ainda há esperança.") == {"oposicao": 1, "adicao": 1}
+
+
+def test_conectivo_nao_atravessa_o_fim_da_frase():
+    assert conectivos("O tema segue atual ainda. Que fazer?") == {"adicao": 1}
+
+
+def test_avaliar_e_deterministico():
+    texto = "Além disso, o Estado deve investir em educação por meio de políticas públicas.\n" * 5
+    assert pre_corretor.avaliar("Educação no Brasil", texto) == pre_corretor.avaliar("Educação no Brasil", texto)
+
+
+def test_texto_abaixo_do_minimo_zera_as_notas():
+    curto = " ".join(["palavra"] * (pre_corretor.MINIMO_PALAVRAS - 1))
+    correcao = pre_corretor.avaliar("tema", curto)
+    assert correcao["nota_final"] == 0
+    assert all(c["nota"] == 0 for c in correcao["analise_competencias"])
+    assert correcao["pontos_fracos"] == ["Texto insuficiente para avaliação"]
+
+    no_limite = curto + " palavra"
+    correcao = pre_corretor.avaliar("tema", no_limite)
+    assert correcao["indicadores"]["palavras"] == pre_corretor.MINIMO_PALAVRAS
+    assert correcao["nota_final"] > 0
+
+
+def test_intervencao_conta_so_o_ultimo_paragrafo():
+    texto = pre_corretor.REDACAO_EXEMPLO.format(n=30)
+    ind = pre_corretor.indicadores("Educação financeira", texto)
+    assert ind["paragrafos"] == 4
+    assert all(ind["intervencao"].values())
+    assert ind["intervencao_paragrafo_final"] == 5
+    # Linhas em branco no fim não abrem um parágrafo vazio
+    assert pre_corretor.indicadores("Educação financeira", texto + "\n\n\n")["intervencao_paragrafo_final"] == 5
+
+    *desenvolvimento, conclusao = texto.split("\n\n")
+    invertido = "\n\n".join([conclusao] + desenvolvimento)
+    ind = pre_corretor.indicadores("Educação financeira", invertido)
+    assert all(ind["intervencao"].values())
+    assert ind["intervencao_paragrafo_final"] < 5
+
+
+def test_avaliar_lote_em_processos_mantem_a_ordem():
+    # Cada texto tem um número diferente de palavras, que identifica a posição
+    exemplo = pre_corretor.REDACAO_EXEMPLO.format(n=30)
+    itens = [{"tema": "Educação financeira", "texto": exemplo + " educação" * n} for n in range(12)]
+    itens.insert(5, {"tema": "tema", "texto": "curto demais"})
+    sequencial = list(pre_corretor.avaliar_lote(itens))
+    assert list(pre_corretor.avaliar_lote(itens, processos=2, tamanho_bloco=3)) == sequencial
+    palavras = [c["indicadores"]["palavras"] for c in sequencial]
+    assert palavras[5] == 2
+    del palavras[5]
+    assert palavras == sorted(set(palavras))
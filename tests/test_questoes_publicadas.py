@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+
+import banco_binario
+import questoes_publicadas
+from conftest import QUESTOES, registro
+from importar_questoes import sincronizar_registros
+
+
+def versao_banco(conn):
+    return conn.execute("SELECT versao FROM versao_banco WHERE id = 1").fetchone()[0]
+
+
+def test_publica_so_as_questoes_ativas(banco_trabalho, tmp_path):
+    banco_trabalho.execute("UPDATE questoes SET ativo = 0 WHERE banca = 'CESPE'")
+    banco_trabalho.commit()
+    destino = str(tmp_path / "questoes.db")
+    versao = questoes_publicadas.publicar(banco_trabalho, destino)
+    assert versao == versao_banco(banco_trabalho)
+
+    conn = questoes_publicadas.conectar(destino)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM questoes").fetchone()[0] == len(QUESTOES) - 1
+        assert conn.execute("SELECT COUNT(*) FROM questoes WHERE ativo = 0").fetchone()[0] == 0
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == questoes_publicadas.FORMATO
+    finally:
+        conn.close()
+    assert questoes_publicadas.versao_publicada(destino) == versao
+    # Nenhum temporário fica para trás
+    assert not [nome for nome in os.listdir(str(tmp_path)) if nome.endswith(".tmp")]
+    if banco_binario.SUPORTADO:
+        assert banco_binario.versao_compilada(questoes_publicadas.caminho_binario(destino)) == versao
+
+
+def test_versao_publicada_de_arquivo_ausente_ou_antigo(tmp_path):
+    assert questoes_publicadas.versao_publicada(str(tmp_path / "ausente.db")) is None
+    antigo = str(tmp_path / "antigo.db")
+    conn = sqlite3.connect(antigo)
+    conn.execute("CREATE TABLE versao_banco (id INTEGER PRIMARY KEY, versao INTEGER)")
+    conn.execute("INSERT INTO versao_banco VALUES (1, 3)")
+    conn.commit()
+    conn.close()
+    assert questoes_publicadas.versao_publicada(antigo) is None
+
+
+def test_publicar_se_desatualizado(banco_trabalho, publicado):
+    assert not questoes_publicadas.publicar_se_desatualizado(banco_trabalho, publicado)
+
+    nova = ("Matemática", "Juros", "FGV", "Calcule os juros simples.", "a")
+    sincronizar_registros(banco_trabalho, [registro(*questao) for questao in QUESTOES + (nova,)])
+    assert questoes_publicadas.versao_publicada(publicado) != versao_banco(banco_trabalho)
+    assert questoes_publicadas.publicar_se_desatualizado(banco_trabalho, publicado)
+    assert questoes_publicadas.versao_publicada(publicado) == versao_banco(banco_trabalho)
+    assert not questoes_publicadas.publicar_se_desatualizado(banco_trabalho, publicado)
+
+
+def test_republica_sem_o_binario(banco_trabalho, publicado):
+    if not banco_binario.SUPORTADO:
+        return
+    os.remove(questoes_publicadas.caminho_binario(publicado))
+    assert questoes_publicadas.publicar_se_desatualizado(banco_trabalho, publicado)
+    assert os.path.exists(questoes_publicadas.caminho_binario(publicado))
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from sessao_simulado import ArmazemMemoria, EstadoSimulado
+
+
+def test_estado_ida_e_volta():
+    estado = EstadoSimulado.novo({"disciplinas": ["Português"], "banca": "VUNESP"}, 7, 5)
+    estado.registrar(0, 'b', True)
+    estado.registrar(2, 'e', False)
+    estado.registrar(4, 'xyz', False)
+
+    copia = EstadoSimulado.de_bytes(estado.para_bytes())
+
+    assert (copia.filtro, copia.versao, copia.semente, copia.total) == \
+        (estado.filtro, estado.versao, estado.semente, estado.total)
+    assert copia.respostas == estado.respostas
+    assert copia.resposta(0) == {"alternativa_escolhida": 'b', "acertou": True}
+    assert copia.resposta(1) is None
+    assert copia.resposta(2) == {"alternativa_escolhida": 'e', "acertou": False}
+    assert copia.resposta(4) == {"alternativa_escolhida": '', "acertou": False}
+    assert not copia.respondida(3)
+
+
+def test_estado_sem_respostas():
+    estado = EstadoSimulado(None, 1, 2 ** 63 - 1, 0)
+    copia = EstadoSimulado.de_bytes(estado.para_bytes())
+    assert copia.semente == 2 ** 63 - 1
+    assert copia.total == 0 and copia.respostas == bytearray()
+
+
+def test_armazem_memoria_guarda_bytes():
+    armazem = ArmazemMemoria()
+    estado = EstadoSimulado.novo(None, 1, 3)
+    armazem.salvar("sid", estado.para_bytes())
+    assert EstadoSimulado.de_bytes(armazem.obter("sid")).semente == estado.semente
+    armazem.remover("sid")
+    assert armazem.obter("sid") is None
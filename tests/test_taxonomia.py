@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from conftest import registro
+from importar_questoes import sincronizar_registros
+import taxonomia
+
+
+def _area_das_questoes(conn, disciplina):
+    return {area for (area,) in conn.execute(
+        "SELECT a.nome FROM questoes q LEFT JOIN areas a ON a.id = q.area_id WHERE q.disciplina = ?",
+        (disciplina,))}
+
+
+def _versao(conn):
+    return conn.execute("SELECT versao FROM versao_banco WHERE id = 1").fetchone()[0]
+
+
+def test_questao_nova_recebe_a_area_da_disciplina(banco_trabalho):
+    assert _area_das_questoes(banco_trabalho, "Direito Civil") == {"Conhecimentos Jurídicos"}
+    assert _area_das_questoes(banco_trabalho, "Matemática") == {"Exatas e Raciocínio Lógico"}
+
+
+def test_disciplina_desconhecida_e_registrada_sem_area(banco_trabalho):
+    sincronizar_registros(banco_trabalho, [registro("Geografia", "Relevo", "FGV", "O que é um planalto?", "a")],
+                          desativar_ausentes=False)
+    assert _area_das_questoes(banco_trabalho, "Geografia") == {None}
+    assert banco_trabalho.execute("SELECT area_id FROM disciplinas WHERE nome = 'Geografia'").fetchone() == (None,)
+
+
+def test_mover_disciplina_propaga_e_muda_a_versao(banco_trabalho):
+    antes = _versao(banco_trabalho)
+    taxonomia.associar(banco_trabalho, "Direito Civil", "Direito Privado")
+    assert _area_das_questoes(banco_trabalho, "Direito Civil") == {"Direito Privado"}
+    assert _versao(banco_trabalho) > antes
+    assert "Direito Civil" in taxonomia.carregar_taxonomia(banco_trabalho).disciplinas("Direito Privado")
+
+    antes = _versao(banco_trabalho)
+    taxonomia.desassociar(banco_trabalho, "Direito Civil")
+    assert _area_das_questoes(banco_trabalho, "Direito Civil") == {None}
+    assert _versao(banco_trabalho) > antes
+
+
+def test_area_removida_solta_as_disciplinas(banco_trabalho):
+    with banco_trabalho:
+        banco_trabalho.execute("DELETE FROM areas WHERE nome = 'Exatas e Raciocínio Lógico'")
+    assert _area_das_questoes(banco_trabalho, "Matemática") == {None}
+    assert taxonomia.carregar_taxonomia(banco_trabalho).area("Matemática") == ''
+
+
+def test_sem_indice_por_area(banco_trabalho):
+    indices = {nome for (nome,) in banco_trabalho.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_questoes_area" not in indices